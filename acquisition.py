@@ -0,0 +1,311 @@
+#!/usr/bin/env python3
+"""Scan acquisition controller that streams raw files into reconstruction."""
+
+import os
+import queue
+import threading
+import time
+from pathlib import Path
+
+from dataprocessingpython import reconstruct_raw_file, expected_raw_size
+
+class LatencyStats:
+    """Running count, mean and max of one pipeline stage in seconds"""
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, seconds):
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+
+    def mean(self):
+        return self.total / self.count if self.count else 0.0
+
+class ReconstructionPipeline:
+    """
+    Bounded queue of raw files reconstructed by a pool of worker threads.
+
+    submit() blocks while the queue is full, so a producer that outruns
+    reconstruction is slowed down instead of piling up memory. Latency is
+    tracked per stage: detect (file written to queued), wait (queued to
+    picked up) and reconstruct.
+    """
+    def __init__(self, on_result=None, on_error=None, workers=2, max_queue=8):
+        self.on_result = on_result
+        self.on_error = on_error
+        self.max_queue = max_queue
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.stats_lock = threading.Lock()
+        self.latency = {"detect": LatencyStats(), "wait": LatencyStats(), "reconstruct": LatencyStats()}
+        self.completed = 0
+        self.failed = 0
+        self.blocked_seconds = 0.0
+        self.cancelled = threading.Event()
+        self.threads = [threading.Thread(target=self._work, name=f"recon-{i}", daemon=True)
+                        for i in range(workers)]
+        for thread in self.threads:
+            thread.start()
+
+    def submit(self, raw_file, timeout=None):
+        """
+        Queue a raw file for reconstruction, waiting while the queue is full.
+
+        Returns:
+            bool: False if the queue stayed full for the whole timeout
+        """
+        if self.cancelled.is_set():
+            return False
+        raw_file = Path(raw_file)
+        queued_at = time.time()
+        try:
+            landed_at = raw_file.stat().st_mtime
+        except OSError:
+            landed_at = queued_at
+
+        start = time.perf_counter()
+        try:
+            self.queue.put((raw_file, queued_at), timeout=timeout)
+        except queue.Full:
+            return False
+        finally:
+            with self.stats_lock:
+                self.blocked_seconds += time.perf_counter() - start
+        with self.stats_lock:
+            self.latency["detect"].add(max(0.0, queued_at - landed_at))
+        return True
+
+    def _work(self):
+        while True:
+            item = self.queue.get()
+            if item is None or self.cancelled.is_set():
+                self.queue.task_done()
+                return
+            raw_file, queued_at = item
+            with self.stats_lock:
+                self.latency["wait"].add(time.time() - queued_at)
+
+            start = time.perf_counter()
+            try:
+                kspace, image = reconstruct_raw_file(raw_file)
+            except Exception as e:
+                with self.stats_lock:
+                    self.failed += 1
+                if self.on_error is not None and not self.cancelled.is_set():
+                    self.on_error(raw_file, str(e))
+            else:
+                with self.stats_lock:
+                    self.latency["reconstruct"].add(time.perf_counter() - start)
+                    self.completed += 1
+                if self.on_result is not None and not self.cancelled.is_set():
+                    self.on_result(raw_file, kspace, image)
+            finally:
+                self.queue.task_done()
+
+    def join(self):
+        """Wait until every queued file has been reconstructed"""
+        self.queue.join()
+
+    def close(self):
+        """Finish queued work and stop the worker threads"""
+        for _ in self.threads:
+            self.queue.put(None)
+        for thread in self.threads:
+            thread.join()
+
+    def cancel(self):
+        """Drop queued work and let the workers exit without waiting for them"""
+        self.cancelled.set()
+        try:
+            while True:
+                self.queue.get_nowait()
+                self.queue.task_done()
+        except queue.Empty:
+            pass
+        for _ in self.threads:
+            try:
+                self.queue.put_nowait(None)
+            except queue.Full:
+                # Workers also stop at the next item they take
+                break
+
+    def stats(self):
+        """Snapshot of queue depth, throughput counters and stage latencies"""
+        with self.stats_lock:
+            return dict(
+                queue_depth=self.queue.qsize(),
+                max_queue=self.max_queue,
+                completed=self.completed,
+                failed=self.failed,
+                blocked_seconds=self.blocked_seconds,
+                latency={name: dict(mean=s.mean(), max=s.max, count=s.count)
+                         for name, s in self.latency.items()},
+            )
+
+class AcquisitionController:
+    """
+    Runs a scan and hands each raw file to a ReconstructionPipeline as it lands.
+
+    A background thread starts the scan with Run(), then polls
+    GetCurrentScanNo/ScanCompleted every poll_interval seconds. New files
+    come from the change events of a RawDirectoryWatcher when it watches the
+    output directory with inotify; otherwise the directory is listed at every
+    poll. Hardware calls are serialized through lock so they can share a
+    backend with a SpectrometerSession health monitor.
+    """
+    # Polls after ScanCompleted to wait for files still being flushed
+    FINAL_POLLS = 25
+
+    def __init__(self, backend, output_path, pipeline, prepare=None, lock=None,
+                 poll_interval=0.2, on_progress=None, on_finished=None, watcher=None):
+        self.backend = backend
+        self.output_path = Path(output_path)
+        self.pipeline = pipeline
+        self.prepare = prepare
+        self.lock = lock if lock is not None else threading.RLock()
+        self.poll_interval = poll_interval
+        self.on_progress = on_progress
+        self.on_finished = on_finished
+        # RawDirectoryWatcher to take new files from, or None to list the directory
+        self.watcher = watcher
+        self.use_events = False
+        # Files the watcher reported, not yet picked up by the acquisition thread
+        self.landed = queue.Queue()
+        self.reported = set()
+
+        self.seen = set()
+        # Sizes of files still being written, from the previous poll
+        self.pending_sizes = {}
+        self.abort_event = threading.Event()
+        self.thread = None
+
+    def start(self):
+        """Start the scan on a background thread"""
+        self.abort_event.clear()
+        self.thread = threading.Thread(target=self._run, name="acquisition", daemon=True)
+        self.thread.start()
+
+    def abort(self):
+        """Stop the scan; files already queued are still reconstructed"""
+        self.abort_event.set()
+
+    def is_running(self):
+        return self.thread is not None and self.thread.is_alive()
+
+    def _run(self):
+        status = "completed"
+        try:
+            if self.prepare is not None:
+                ret = self.prepare()
+                if ret != 0:
+                    raise RuntimeError(f"Hardware not ready (error code: {ret})")
+
+            # Files already in the output directory belong to earlier scans
+            self.output_path.mkdir(parents=True, exist_ok=True)
+            self.seen = set(self.output_path.glob("*.raw"))
+            # Listen before Run() so no file is written unreported
+            self.use_events = self.watcher is not None and self.watcher.watches(self.output_path)
+            if self.use_events:
+                self.watcher.add_listener(self._files_landed)
+
+            with self.lock:
+                self.backend.SetOutputPath(str(self.output_path))
+                ret = self.backend.Run()
+            if ret != 0:
+                raise RuntimeError(f"Run failed (error code: {ret})")
+
+            while True:
+                if self.abort_event.is_set():
+                    with self.lock:
+                        self.backend.Abort()
+                    status = "aborted"
+                    break
+
+                with self.lock:
+                    current = self.backend.GetCurrentScanNo()
+                    total = self.backend.GetTotalScanNo()
+                    completed = self.backend.ScanCompleted()
+                self._queue_new_files()
+                if self.on_progress is not None:
+                    self.on_progress(current, total)
+                if completed:
+                    break
+                time.sleep(self.poll_interval)
+
+            # Pick up files written between the last poll and completion; the
+            # hardware may still be flushing them, so give them a few polls.
+            # The directory is listed here even with a watcher, in case an event was lost
+            for _ in range(self.FINAL_POLLS):
+                incomplete = self._queue_new_files(listing=True)
+                if not incomplete or self.abort_event.is_set():
+                    break
+                time.sleep(self.poll_interval)
+            if incomplete:
+                print(f"{incomplete} raw file(s) were still incomplete after the scan finished")
+        except Exception as e:
+            status = f"error: {e}"
+        finally:
+            if self.use_events:
+                self.watcher.remove_listener(self._files_landed)
+
+        if self.on_finished is not None:
+            self.on_finished(status)
+
+    def is_complete(self, path):
+        """
+        True once a raw file is fully written.
+
+        The size must reach what the header declares. Files whose header
+        cannot say must keep the same size over two polls.
+        """
+        try:
+            size = path.stat().st_size
+            expected = expected_raw_size(path)
+        except OSError:
+            return False
+        if expected is not None:
+            return size >= expected
+        previous = self.pending_sizes.get(path)
+        self.pending_sizes[path] = size
+        return previous == size and size > 0
+
+    def _files_landed(self, paths):
+        """Watcher listener; runs on the watcher thread"""
+        for path in paths:
+            if path.parent == self.output_path.resolve():
+                # Same form as the paths listed from output_path, so seen matches either way
+                self.landed.put(self.output_path / path.name)
+
+    def _queue_new_files(self, listing=False):
+        """
+        Submit raw files that appeared since the last poll and are fully written, oldest first.
+
+        Args:
+            listing (bool): List the output directory even when the watcher reports new files
+
+        Returns:
+            int: Number of new files still being written
+        """
+        if self.use_events and not listing:
+            try:
+                while True:
+                    self.reported.add(self.landed.get_nowait())
+            except queue.Empty:
+                pass
+            candidates = self.reported
+        else:
+            candidates = self.output_path.glob("*.raw")
+        new_files = [path for path in candidates if path not in self.seen]
+        ready = [path for path in new_files if self.is_complete(path)]
+        ready.sort(key=lambda path: os.path.getmtime(path))
+        for path in ready:
+            # Blocks while the pipeline is saturated: this is the back-pressure point
+            while not self.pipeline.submit(path, timeout=self.poll_interval):
+                if self.abort_event.is_set():
+                    return 0
+            self.seen.add(path)
+            self.reported.discard(path)
+            self.pending_sizes.pop(path, None)
+        return len(new_files) - len(ready)
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""Line annotations stored per image of a saved scan, and their geometry."""
+
+import math
+import os
+from datetime import datetime
+
+ANNOTATION_FIELDS = ["angle", "spacing", "num_lines", "origin_x", "origin_y", "length"]
+
+def annotation_lines(annotation):
+    """
+    Endpoints of the parallel lines of one annotation, in image pixels.
+
+    Args:
+        annotation (dict): angle (degrees), spacing, num_lines, origin_x,
+            origin_y and length, as set in the line parameter controls
+
+    Returns:
+        list: ((x1, y1), (x2, y2)) per line
+    """
+    angle_rad = math.radians(annotation["angle"])
+    # Lines are offset perpendicular to their direction
+    perp_angle_rad = angle_rad + math.pi / 2
+    num_lines = int(annotation["num_lines"])
+    half_length = annotation["length"] / 2
+
+    lines = []
+    for i in range(num_lines):
+        offset = (i - (num_lines - 1) / 2) * annotation["spacing"]
+        center_x = annotation["origin_x"] + offset * math.cos(perp_angle_rad)
+        center_y = annotation["origin_y"] + offset * math.sin(perp_angle_rad)
+        lines.append(((center_x - half_length * math.cos(angle_rad), center_y - half_length * math.sin(angle_rad)),
+                      (center_x + half_length * math.cos(angle_rad), center_y + half_length * math.sin(angle_rad))))
+    return lines
+
+def find_saved_scan(conn, folder_path):
+    """Id of the latest scan saved from a folder, or None"""
+    row = conn.execute('SELECT id FROM mri_scans WHERE folder_path = ? ORDER BY id DESC LIMIT 1',
+                       (folder_path,)).fetchone()
+    return row[0] if row is not None else None
+
+def scan_annotations(conn, scan_id):
+    """
+    Images of a scan and their stored annotations.
+
+    Returns:
+        tuple: ({source file path: image id}, {image id: annotation dict})
+    """
+    image_ids = {
+        os.path.abspath(source): image_id for image_id, source in conn.execute(
+            'SELECT id, COALESCE(source_path, path) FROM scan_images WHERE scan_id = ?', (scan_id,))
+    }
+    annotations = {
+        row[0]: dict(zip(ANNOTATION_FIELDS, row[1:])) for row in conn.execute(
+            f"SELECT image_id, {', '.join(ANNOTATION_FIELDS)} FROM annotations WHERE scan_id = ?", (scan_id,))
+    }
+    return image_ids, annotations
+
+def save_annotations(conn, scan_id, image_ids, annotation):
+    """Store one annotation on each of the given images, replacing what they had"""
+    now = datetime.now().isoformat(timespec="seconds")
+    values = tuple(annotation[field] for field in ANNOTATION_FIELDS)
+    conn.executemany(
+        f"INSERT INTO annotations (image_id, scan_id, {', '.join(ANNOTATION_FIELDS)}, updated_at) "
+        f"VALUES (?, ?, {', '.join('?' * len(ANNOTATION_FIELDS))}, ?) "
+        f"ON CONFLICT(image_id) DO UPDATE SET "
+        f"{', '.join(f'{field} = excluded.{field}' for field in ANNOTATION_FIELDS)}, updated_at = excluded.updated_at",
+        [(image_id, scan_id) + values + (now,) for image_id in image_ids]
+    )
+    return len(image_ids)
@@ -0,0 +1,165 @@
+# -*- coding: utf-8 -*-
+"""
+Noise pre-whitening and SVD coil compression for multi-channel scans.
+
+A scan with SetTotalCh(16, 0) writes one raw file per channel. The channels
+are stacked into a (coils, views, samples) k-space, whitened with the
+inverse Cholesky factor of the noise covariance, and projected onto the
+strongest virtual coils. Whitening and projection are combined into a
+single (virtual, coils) matrix, so the whole k-space is transformed by one
+matrix multiply before any FFT is done.
+"""
+import sys
+from pathlib import Path
+
+import numpy as np
+
+from dataprocessingpython import read_raw_firtech, kspace_to_image
+from raw_catalog import parse_raw_filename
+
+def load_channels(raw_files):
+    """
+    Stack the first experiment/echo/slice of each channel file.
+
+    Args:
+        raw_files (list): Raw files of one scan, one per channel
+
+    Returns:
+        np.ndarray: Complex64 k-space shaped (coils, views, samples)
+    """
+    channels = []
+    for raw_file in raw_files:
+        data, _ = read_raw_firtech(Path(raw_file))
+        channels.append(data[0, 0, 0, 0])
+    return np.stack(channels).astype(np.complex64)
+
+def edge_noise_samples(kspace, fraction=0.05):
+    """
+    Take the outer edge of k-space as noise samples.
+
+    The acquired k-space has its centre in the middle of the array, so the
+    first and last views and the first and last samples of every view hold
+    the highest spatial frequencies, which carry almost no signal. Points
+    are chosen by position only. Choosing them by low energy would prefer
+    points where the noise happens to be small and bias the covariance.
+
+    Args:
+        kspace (np.ndarray): (coils, ..., views, samples) k-space
+        fraction (float): Share of each of the last two axes taken as edge,
+            split between both ends
+
+    Returns:
+        np.ndarray: (coils, samples) noise matrix
+    """
+    views, samples = kspace.shape[-2:]
+    edge_views = max(1, int(round(views * fraction / 2)))
+    edge_samples = max(1, int(round(samples * fraction / 2)))
+    edge = np.zeros((views, samples), dtype=bool)
+    edge[:edge_views] = edge[-edge_views:] = True
+    edge[:, :edge_samples] = edge[:, -edge_samples:] = True
+    return kspace[..., edge].reshape(kspace.shape[0], -1)
+
+def noise_covariance(noise):
+    """
+    Coil noise covariance from noise samples.
+
+    Args:
+        noise (np.ndarray): (coils, ...) noise-only samples, e.g. from a noise scan
+
+    Returns:
+        np.ndarray: (coils, coils) Hermitian covariance
+    """
+    flat = noise.reshape(noise.shape[0], -1)
+    flat = flat - flat.mean(axis=1, keepdims=True)
+    return (flat @ flat.conj().T) / max(1, flat.shape[1] - 1)
+
+def whitening_matrix(covariance):
+    """Inverse Cholesky factor, so whitened noise has identity covariance"""
+    # A small diagonal load keeps dead or duplicated channels from breaking the factorization
+    load = 1e-6 * np.real(np.trace(covariance)) / covariance.shape[0]
+    chol = np.linalg.cholesky(covariance + load * np.eye(covariance.shape[0]))
+    return np.linalg.inv(chol)
+
+def compression_matrix(kspace, virtual_coils, whitening=None):
+    """
+    Build the combined whitening and compression matrix.
+
+    Args:
+        kspace (np.ndarray): (coils, ...) k-space
+        virtual_coils (int): Number of virtual coils to keep
+        whitening (np.ndarray): (coils, coils) whitening matrix, or None to skip
+
+    Returns:
+        tuple: ((virtual_coils, coils) matrix, share of signal energy kept)
+    """
+    coils = kspace.shape[0]
+    flat = kspace.reshape(coils, -1)
+    transform = whitening if whitening is not None else np.eye(coils, dtype=np.complex64)
+
+    # The SVD of the (coils, coils) correlation gives the same coil basis as the
+    # SVD of the full data matrix, at a fraction of the cost
+    whitened_corr = transform @ (flat @ flat.conj().T) @ transform.conj().T
+    u, s, _ = np.linalg.svd(whitened_corr)
+    virtual_coils = min(virtual_coils, coils)
+    kept = float(s[:virtual_coils].sum() / s.sum()) if s.sum() > 0 else 1.0
+    return (u[:, :virtual_coils].conj().T @ transform).astype(np.complex64), kept
+
+def compress_coils(kspace, virtual_coils, noise=None, edge_fraction=0.05):
+    """
+    Pre-whiten and compress multi-channel k-space.
+
+    Args:
+        kspace (np.ndarray): (coils, views, samples) k-space
+        virtual_coils (int): Number of virtual coils to keep
+        noise (np.ndarray): (coils, ...) noise scan samples; if None, the
+            outer edge of k-space is used instead
+        edge_fraction (float): Share of k-space used when estimating noise from it
+
+    Returns:
+        tuple: (virtual k-space shaped (virtual_coils, views, samples),
+            combined matrix, share of signal energy kept)
+    """
+    if noise is None:
+        noise = edge_noise_samples(kspace, edge_fraction)
+    matrix, kept = compression_matrix(kspace, virtual_coils, whitening_matrix(noise_covariance(noise)))
+
+    # One batched multiply over every k-space point
+    compressed = matrix @ kspace.reshape(kspace.shape[0], -1)
+    return compressed.reshape((matrix.shape[0],) + kspace.shape[1:]), matrix, kept
+
+def reconstruct_compressed(raw_files, virtual_coils=4, noise=None):
+    """
+    Reconstruct a multi-channel scan through coil compression.
+
+    Args:
+        raw_files (list): Raw files of one scan, one per channel
+        virtual_coils (int): Number of virtual coils to reconstruct
+        noise (np.ndarray): Optional (coils, ...) noise scan samples, e.g.
+            load_channels() of a scan acquired without excitation
+
+    Returns:
+        tuple: ((virtual_coils, views, samples) virtual k-space,
+            root-sum-of-squares image, share of signal energy kept)
+    """
+    compressed, _, kept = compress_coils(load_channels(raw_files), virtual_coils, noise)
+    images = kspace_to_image(compressed)
+    return compressed, np.sqrt(np.sum(np.abs(images) ** 2, axis=0)), kept
+
+def group_by_scan(raw_files):
+    """Group channel files by their shared scan timestamp, channels in order"""
+    scans = {}
+    for raw_file in raw_files:
+        fields = parse_raw_filename(Path(raw_file).name)
+        if fields is None:
+            continue
+        scans.setdefault(fields["scan_key"], []).append((fields["board"], fields["channel"], Path(raw_file)))
+    return {key: [path for _, _, path in sorted(files)] for key, files in scans.items()}
+
+if __name__ == "__main__":
+    # Usage: python coil_compression.py <raw folder> [virtual coils]
+    folder = Path(sys.argv[1] if len(sys.argv) > 1 else "Raw Data")
+    virtual_coils = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+    for scan_key, files in sorted(group_by_scan(folder.glob("*.raw")).items()):
+        _, image, kept = reconstruct_compressed(files, virtual_coils)
+        print(f"{scan_key}: {len(files)} -> {min(virtual_coils, len(files))} coils, "
+              f"{kept:.1%} of signal energy kept, image {image.shape}")
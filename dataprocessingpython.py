@@ -5,6 +5,7 @@ import matplotlib.pyplot as plt
 import numpy as np
 import scipy.fft
 import os
+import time
 
 # 固定偏移（基于手册）
 OFF_NO_SAMPLES   = 0xFC00
@@ -92,6 +93,286 @@ def read_raw_firtech(path: Path):
 
         return data, params
 
+def expected_raw_size(path: Path):
+    """
+    Size in bytes a raw file has once its declared data is fully written.
+
+    Returns:
+        int: Expected size, or None if the header is not written yet or the
+            data type is unknown
+    """
+    with Path(path).open('rb') as f:
+        f.seek(0, 2)
+        if f.tell() < DATA_START:
+            return None
+        P = parse_params(f)
+    points = int(np.prod((P["noExperiments"], P["noEchoes"], P["noSlices"],
+                          P["noViewsSec"], P["noViews"], P["noSamples"]), dtype=np.int64))
+    if P["dataTypeCode"] in (0x00, 0x02):
+        return DATA_START + points * 8
+    if P["dataTypeCode"] == 0x01:
+        return DATA_START + points * 2
+    return None
+
+def iter_experiment_blocks(path: Path):
+    """
+    Read a raw file one experiment at a time.
+
+    Each block is read straight from its file offset, so only one
+    experiment is ever held in memory.
+
+    Yields:
+        tuple: (experiment index, block shaped (echoes, slices, viewsSec, views, samples))
+    """
+    with Path(path).open('rb') as f:
+        P = parse_params(f)
+        block_shape = (P["noEchoes"], P["noSlices"], P["noViewsSec"], P["noViews"], P["noSamples"])
+        block_points = int(np.prod(block_shape, dtype=np.int64))
+        dt = P["dataTypeCode"]
+        if dt in (0x00, 0x02):
+            word_dtype, words_per_point, bytes_per_word = '<u4', 2, 4
+        elif dt == 0x01:
+            word_dtype, words_per_point, bytes_per_word = '<i2', 1, 2
+        else:
+            raise ValueError(f"Unknown DataTypeCode: 0x{dt:02X}")
+        block_words = block_points * words_per_point
+
+        for exp in range(P["noExperiments"]):
+            f.seek(DATA_START + exp * block_words * bytes_per_word)
+            words = np.fromfile(f, dtype=word_dtype, count=block_words)
+            if words.size != block_words:
+                raise ValueError(f"File too short for experiment {exp}.")
+            if words_per_point == 2:
+                iq24 = sign_extend_24(words)
+                block = iq24[0::2].astype(np.float32) + 1j * iq24[1::2].astype(np.float32)
+            else:
+                block = words.astype(np.float32)
+            yield exp, block.reshape(block_shape)
+
+def kspace_to_image(kspace):
+    """Complex image of the last two k-space axes, matching reconstruct_raw_file"""
+    flipped = np.flip(kspace, axis=-2)
+    return np.fft.ifftshift(np.fft.ifft2(flipped, axes=(-2, -1)), axes=(-2, -1)).astype(np.complex64)
+
+class StreamingAverager:
+    """
+    Running complex mean and variance over repeated acquisitions (Welford).
+
+    Only the mean, the sum of squared deviations and the incoming block are
+    kept, so memory does not grow with the number of experiments.
+    """
+    def __init__(self, track_variance=True):
+        self.track_variance = track_variance
+        self.count = 0
+        self.mean = None
+        self.m2 = None
+
+    def update(self, block):
+        block = np.asarray(block, dtype=np.complex64)
+        self.count += 1
+        if self.mean is None:
+            self.mean = block.copy()
+            self.m2 = np.zeros(block.shape, dtype=np.float32) if self.track_variance else None
+            return
+        delta = block - self.mean
+        self.mean += delta / self.count
+        if self.track_variance:
+            # E|x - mu|^2 for complex samples
+            self.m2 += (delta * np.conj(block - self.mean)).real
+
+    def variance(self):
+        """Per-pixel variance of a single acquisition"""
+        if self.m2 is None or self.count < 2:
+            return None
+        return self.m2 / (self.count - 1)
+
+    def noise_map(self):
+        """Per-pixel standard error of the averaged result"""
+        variance = self.variance()
+        if variance is None:
+            return None
+        return np.sqrt(variance / self.count)
+
+def average_experiments(path: Path, domain="image"):
+    """
+    Average all experiments of a raw file block by block.
+
+    Args:
+        path (Path): FIRTECH raw file
+        domain (str): "image" to average reconstructed complex images (gives an
+            image-space noise map) or "kspace" to average raw k-space only
+
+    Returns:
+        dict: mean (complex64), noise_map (float32 or None), count
+    """
+    averager = StreamingAverager()
+    for _, block in iter_experiment_blocks(path):
+        averager.update(kspace_to_image(block) if domain == "image" else block)
+    return dict(mean=averager.mean, noise_map=averager.noise_map(), count=averager.count)
+
+class SlidingWindowReconstructor:
+    """
+    Incrementally updated image for a rolling k-space window.
+
+    The 2D inverse FFT is done in two passes: along samples for every view,
+    then along views. The first pass is cached per view, so new views cost
+    one 1D FFT each. For the second pass, a few changed views are folded in
+    as rank-1 updates (one small matrix multiply). Only when many views
+    change at once is the views-axis FFT re-run over the cached rows.
+    """
+    def __init__(self, noViews, noSamples):
+        self.noViews = noViews
+        self.noSamples = noSamples
+        self.kspace = np.zeros((noViews, noSamples), dtype=np.complex64)
+        # Rows are stored flipped, as in reconstruct_raw_file
+        self.partial = np.zeros((noViews, noSamples), dtype=np.complex64)
+        self.image = np.zeros((noViews, noSamples), dtype=np.complex64)
+        rows = np.arange(noViews)
+        # Column r maps a row of partial results into the image (numpy ifft convention)
+        self.basis = (np.exp(2j * np.pi * np.outer(rows, rows) / noViews) / noViews).astype(np.complex64)
+        # Rank-1 updates beat a full column FFT only for a handful of rows
+        self.max_incremental_rows = max(1, int(np.log2(max(noViews, 2))) // 2)
+        self.updates = 0
+
+    def update(self, view_indices, lines):
+        """
+        Replace k-space views with newly acquired lines.
+
+        Args:
+            view_indices (array-like): Views (k-space rows) that arrived
+            lines (np.ndarray): (len(view_indices), noSamples) complex lines
+        """
+        view_indices = np.asarray(view_indices)
+        lines = np.asarray(lines, dtype=np.complex64).reshape(len(view_indices), self.noSamples)
+        self.kspace[view_indices] = lines
+
+        rows = self.noViews - 1 - view_indices
+        new_partial = np.fft.ifft(lines, axis=-1).astype(np.complex64)
+        if len(rows) <= self.max_incremental_rows:
+            # Fold only the changed rows into the image: image += B[:, rows] @ (new - old)
+            self.image += self.basis[:, rows] @ (new_partial - self.partial[rows])
+            self.partial[rows] = new_partial
+        else:
+            self.partial[rows] = new_partial
+            self.image = np.fft.ifft(self.partial, axis=0).astype(np.complex64)
+        self.updates += 1
+
+    def frame(self):
+        """Magnitude image of the current window, oriented like reconstruct_raw_file"""
+        return np.abs(np.fft.ifftshift(self.image))
+
+def iter_view_updates(path: Path, lines_per_step):
+    """
+    Replay a raw file as a stream of k-space line updates.
+
+    Every (experiment, viewsSec) block is treated as one pass over the
+    noViews k-space lines, delivered lines_per_step at a time in
+    acquisition order.
+
+    Yields:
+        tuple: (experiment, segment, view indices, lines)
+    """
+    for exp, block in iter_experiment_blocks(path):
+        for seg in range(block.shape[2]):
+            lines = block[0, 0, seg]
+            for start in range(0, lines.shape[0], lines_per_step):
+                views = np.arange(start, min(start + lines_per_step, lines.shape[0]))
+                yield exp, seg, views, lines[views]
+
+def replay_sliding_window(path: Path, lines_per_frame, frame_interval, on_frame, stop_event=None):
+    """
+    Reconstruct a dynamic raw file as a sliding window at a fixed frame rate.
+
+    Args:
+        path (Path): FIRTECH raw file
+        lines_per_frame (int): New k-space lines folded in per frame
+        frame_interval (float): Seconds between frames
+        on_frame (callable): Called with (frame number, magnitude image, lateness in seconds)
+        stop_event (threading.Event): Optional; stops the replay when set
+
+    Returns:
+        int: Number of frames emitted
+    """
+    with Path(path).open('rb') as f:
+        P = parse_params(f)
+    recon = SlidingWindowReconstructor(P["noViews"], P["noSamples"])
+
+    frame_number = 0
+    next_tick = time.perf_counter()
+    for _, _, views, lines in iter_view_updates(path, lines_per_frame):
+        if stop_event is not None and stop_event.is_set():
+            break
+        recon.update(views, lines)
+
+        # Hold a fixed cadence; report how late each frame was so overload is visible
+        now = time.perf_counter()
+        if now < next_tick:
+            time.sleep(next_tick - now)
+        on_frame(frame_number, recon.frame(), max(0.0, now - next_tick))
+        frame_number += 1
+        next_tick += frame_interval
+    return frame_number
+
+def write_raw_firtech(path: Path, data, dataTypeCode=0x02):
+    """
+    Write complex k-space to a FIRTECH raw file (24-bit I/Q in 4-byte slots).
+
+    Args:
+        path (Path): Output file path
+        data (np.ndarray): Complex array shaped
+            (experiments, echoes, slices, viewsSec, views, samples)
+        dataTypeCode (int): Header data type code, 0x00 or 0x02
+    """
+    noExps, noEchoes, noSlices, noViewsSec, noViews, noSamples = data.shape
+    header = bytearray(DATA_START)
+    for off, value in ((OFF_NO_SAMPLES, noSamples), (OFF_NO_VIEWS, noViews),
+                       (OFF_NO_VIEWSSEC, noViewsSec), (OFF_NO_SLICES, noSlices),
+                       (OFF_NO_ECHOES, noEchoes), (OFF_NO_EXPS, noExps)):
+        header[off:off + 4] = int(value).to_bytes(4, 'little')
+    header[OFF_DATATYPE:OFF_DATATYPE + 2] = int(dataTypeCode).to_bytes(2, 'little')
+
+    # 交错 I/Q，截断到 24 位补码
+    iq = np.empty(data.size * 2, dtype=np.int32)
+    iq[0::2] = np.clip(np.round(data.real.ravel()), -0x800000, 0x7FFFFF)
+    iq[1::2] = np.clip(np.round(data.imag.ravel()), -0x800000, 0x7FFFFF)
+
+    with Path(path).open('wb') as f:
+        f.write(header)
+        # Values already fit in 24 bits, so the int32 top byte is the sign extension (0x00 or 0xFF),
+        # as the hardware writes it
+        f.write(iq.astype('<i4').tobytes())
+
+def reconstruct_raw_file(raw_file):
+    """
+    Reconstruct one raw file into an image.
+
+    Args:
+        raw_file (Path): Path to a FIRTECH raw file
+
+    Returns:
+        list: Pair [kspace, image] for the first experiment/echo/slice
+    """
+    # Read the raw file
+    data, params = read_raw_firtech(Path(raw_file))
+    print(f"Processing {Path(raw_file).name}, Params: {params}")
+
+    # Extract k-space data (typically take first experiment/echo/slice for a single image)
+    # Shape: (experiments, echoes, slices, viewsSec, views, samples)
+    kspace = data[0, 0, 0, 0, :, :]  # (noViews, noSamples)
+    print(f"K-space shape: {kspace.shape}, dtype: {kspace.dtype}")
+
+    # Flip the k-space vertically if needed
+    kspace_flipped = np.flipud(kspace)
+
+    # Perform inverse FFT to convert k-space to image space
+    image = abs(np.fft.ifftshift(np.fft.ifft2(kspace_flipped)))
+
+    return [kspace, image]
+
+def list_raw_files(folder):
+    """Return the raw files in a folder in a stable order"""
+    return sorted(Path(folder).glob("*.raw"))
+
 def kspace2Image(folder):
     """
     Convert k-space data from raw files in the specified folder to images.
@@ -103,28 +384,12 @@ def kspace2Image(folder):
         list: Array of pairs [kspace, image] converted from raw data
     """
     results = []
-    folder_path = Path(folder)
 
     # Process all raw files in the folder
-    for raw_file in folder_path.glob("*.raw"):
+    for raw_file in list_raw_files(folder):
         try:
-            # Read the raw file
-            data, params = read_raw_firtech(raw_file)
-            print(f"Processing {raw_file.name}, Params: {params}")
-
-            # Extract k-space data (typically take first experiment/echo/slice for a single image)
-            # Shape: (experiments, echoes, slices, viewsSec, views, samples)
-            kspace = data[0, 0, 0, 0, :, :]  # (noViews, noSamples)
-            print(f"K-space shape: {kspace.shape}, dtype: {kspace.dtype}")
-
-            # Flip the k-space vertically if needed
-            kspace_flipped = np.flipud(kspace)
-
-            # Perform inverse FFT to convert k-space to image space
-            image = abs(np.fft.ifftshift(np.fft.ifft2(kspace_flipped)))
-
             # Add the kspace-image pair to our results
-            results.append([kspace, image])
+            results.append(reconstruct_raw_file(raw_file))
 
         except Exception as e:
             print(f"Error processing {raw_file.name}: {str(e)}")
@@ -0,0 +1,246 @@
+#!/usr/bin/env python3
+"""
+Background backup and upkeep of the patient database.
+
+Backups use the SQLite online backup API a few pages at a time, so the
+database stays readable and writable while they run. ANALYZE and
+incremental vacuum run on the service's own connection in short steps
+with pauses between them. The GUI and the batching writer are never held
+up for long.
+"""
+
+import os
+import sqlite3
+import sys
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+
+from patient_db import DB_PATH, connect, create_patient_schema
+
+BACKUP_ENV_VAR = "MRIQT_BACKUP_DIR"
+DEFAULT_BACKUP_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "Backups")
+
+# Seconds between runs of each task
+MAINTENANCE_INTERVALS = dict(
+    backup=6 * 3600,
+    analyze=24 * 3600,
+    vacuum=24 * 3600,
+)
+
+class MaintenanceStopped(Exception):
+    """Raised inside a step loop when the service is stopping"""
+
+class BackupRestarted(Exception):
+    """The source kept changing, so the paged backup started over too often"""
+
+def backup_database(source, target_path, pages=256, pause=0.01, max_restarts=3, stop_event=None):
+    """
+    Copy a live database with the online backup API, pages at a time.
+
+    Every write from another connection restarts a paged backup. After
+    max_restarts the rest is copied in a single step instead. In WAL mode
+    that step only reads a snapshot, so writers are not blocked either.
+    The copy is written to a temporary file, checked with quick_check and
+    then renamed into place.
+
+    Args:
+        source (sqlite3.Connection): Connection to the live database
+        target_path (str): Backup file to create
+        pages (int): Pages copied per step
+        pause (float): Seconds to sleep between steps
+        max_restarts (int): Restarts tolerated before copying in one step
+        stop_event (threading.Event): Abandons the backup when set
+
+    Returns:
+        dict: pages, steps, restarts, seconds
+    """
+    target_path = Path(target_path)
+    tmp_path = target_path.with_name(target_path.name + ".tmp")
+    stats = dict(pages=0, steps=0, restarts=0, seconds=0.0)
+    start = time.perf_counter()
+    last_remaining = None
+
+    def progress(status, remaining, total):
+        nonlocal last_remaining
+        stats["pages"] = total
+        stats["steps"] += 1
+        if last_remaining is not None and remaining > last_remaining:
+            stats["restarts"] += 1
+            if stats["restarts"] > max_restarts:
+                raise BackupRestarted()
+        last_remaining = remaining
+        # Yield to clinical use between steps
+        if stop_event is not None and stop_event.wait(pause):
+            raise MaintenanceStopped()
+        if stop_event is None:
+            time.sleep(pause)
+
+    target = sqlite3.connect(tmp_path)
+    try:
+        try:
+            source.backup(target, pages=pages, progress=progress)
+        except BackupRestarted:
+            source.backup(target)
+        if target.execute('PRAGMA quick_check').fetchone()[0] != "ok":
+            raise sqlite3.DatabaseError(f"Backup {target_path.name} failed quick_check")
+    except BaseException:
+        target.close()
+        tmp_path.unlink(missing_ok=True)
+        raise
+    target.close()
+    os.replace(tmp_path, target_path)
+    stats["seconds"] = time.perf_counter() - start
+    return stats
+
+def prune_backups(backup_dir, stem, keep):
+    """Delete all but the newest keep backups of one database"""
+    backups = sorted(Path(backup_dir).glob(f"{stem}-*.db"))
+    for old in backups[:-keep] if keep > 0 else backups:
+        old.unlink()
+
+def incremental_vacuum(conn, step_pages=128, pause=0.05, stop_event=None):
+    """
+    Return free pages to the file system a few at a time.
+
+    Only databases created with auto_vacuum=INCREMENTAL can do this; others
+    need one full `python db_maintenance.py vacuum` first.
+
+    Returns:
+        int: Pages freed, or -1 if the database is not in incremental mode
+    """
+    if conn.execute('PRAGMA auto_vacuum').fetchone()[0] != 2:
+        return -1
+    freed = 0
+    while True:
+        free = conn.execute('PRAGMA freelist_count').fetchone()[0]
+        if free == 0:
+            return freed
+        # executescript steps the pragma to completion; execute would free a single page
+        conn.executescript(f'PRAGMA incremental_vacuum({int(min(free, step_pages))})')
+        freed += free - conn.execute('PRAGMA freelist_count').fetchone()[0]
+        if stop_event is not None and stop_event.wait(pause):
+            raise MaintenanceStopped()
+
+def analyze(conn, analysis_limit=1000):
+    """Refresh planner statistics, sampling at most analysis_limit rows per index"""
+    conn.execute(f'PRAGMA analysis_limit = {int(analysis_limit)}')
+    conn.execute('ANALYZE')
+    conn.execute('PRAGMA optimize')
+
+class MaintenanceService:
+    """
+    Background thread that backs up, analyzes and vacuums the patient database.
+
+    The time each task last ran is kept in maintenance_runs, so the schedule
+    carries over between sessions. Tasks run on the service's own
+    connection, never on the GUI thread or the writer thread.
+    """
+    def __init__(self, path=DB_PATH, backup_dir=None, keep=14, intervals=MAINTENANCE_INTERVALS,
+                 poll=60.0, pause=0.01):
+        self.path = os.path.abspath(path)
+        self.backup_dir = Path(backup_dir or os.environ.get(BACKUP_ENV_VAR) or DEFAULT_BACKUP_DIR)
+        self.keep = keep
+        self.intervals = dict(intervals)
+        self.poll = poll
+        self.pause = pause
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    def start(self):
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self._run, name="patient-db-maintenance", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+
+    def backup(self, conn):
+        self.backup_dir.mkdir(parents=True, exist_ok=True)
+        stem = Path(self.path).stem
+        target = self.backup_dir / f"{stem}-{datetime.now().strftime('%Y%m%d-%H%M%S')}.db"
+        stats = backup_database(conn, target, pause=self.pause, stop_event=self.stop_event)
+        prune_backups(self.backup_dir, stem, self.keep)
+        return f"{target.name}: {stats['pages']} pages in {stats['steps']} steps, {stats['restarts']} restarts"
+
+    def analyze(self, conn):
+        analyze(conn)
+        return "statistics updated"
+
+    def vacuum(self, conn):
+        freed = incremental_vacuum(conn, pause=self.pause * 5, stop_event=self.stop_event)
+        conn.execute('PRAGMA wal_checkpoint(PASSIVE)')
+        return "not in incremental mode" if freed < 0 else f"{freed} pages freed"
+
+    def due_tasks(self, conn):
+        """Tasks whose interval has passed since they last ran"""
+        last = dict(conn.execute('SELECT task, last_run FROM maintenance_runs').fetchall())
+        now = time.time()
+        return [task for task, interval in self.intervals.items() if now - last.get(task, 0) >= interval]
+
+    def run_task(self, conn, task):
+        """Run one task and record it in maintenance_runs"""
+        start = time.perf_counter()
+        detail = getattr(self, task)(conn)
+        conn.execute('''
+            INSERT INTO maintenance_runs (task, last_run, seconds, detail) VALUES (?, ?, ?, ?)
+            ON CONFLICT(task) DO UPDATE SET last_run = excluded.last_run, seconds = excluded.seconds,
+                detail = excluded.detail
+        ''', (task, time.time(), time.perf_counter() - start, detail))
+        return detail
+
+    def _run(self):
+        # The service may start before anything else opens the database; bring the schema up first
+        try:
+            schema_conn = connect(self.path)
+            try:
+                create_patient_schema(schema_conn)
+            finally:
+                schema_conn.close()
+        except sqlite3.Error as e:
+            print(f"Error preparing database for maintenance: {str(e)}")
+            return
+        conn = connect(self.path, autocommit=True)
+        try:
+            while not self.stop_event.is_set():
+                try:
+                    for task in self.due_tasks(conn):
+                        if self.stop_event.is_set():
+                            break
+                        print(f"Database {task}: {self.run_task(conn, task)}")
+                except MaintenanceStopped:
+                    break
+                except Exception as e:
+                    print(f"Error during database maintenance: {str(e)}")
+                self.stop_event.wait(self.poll)
+        finally:
+            conn.close()
+
+def convert_to_incremental(path=DB_PATH):
+    """One-off full VACUUM that switches an existing database to incremental auto-vacuum"""
+    conn = connect(path, autocommit=True)
+    try:
+        conn.execute('PRAGMA auto_vacuum = INCREMENTAL')
+        conn.execute('VACUUM')
+        return conn.execute('PRAGMA auto_vacuum').fetchone()[0] == 2
+    finally:
+        conn.close()
+
+if __name__ == "__main__":
+    # Usage: python db_maintenance.py [backup|analyze|vacuum]
+    task = sys.argv[1] if len(sys.argv) > 1 else "backup"
+    if task == "vacuum" and not convert_to_incremental():
+        print("Could not switch to incremental auto-vacuum")
+    # Builds the schema, including maintenance_runs, if needed
+    from patient_db import get_database
+    get_database()
+    service = MaintenanceService(pause=0)
+    conn = connect(service.path, autocommit=True)
+    try:
+        print(f"Database {task}: {service.run_task(conn, task)}")
+    finally:
+        conn.close()
@@ -0,0 +1,285 @@
+#!/usr/bin/env python3
+"""
+DICOM series from reconstructed images.
+
+Each scan's channel files are reconstructed for every slice and combined
+by root-sum-of-squares, optionally after coil compression, giving one
+series per scan. The volume is scaled
+to uint16 in one vectorized pass. The Rescale Slope and Intercept keep the
+original intensities. Slices are encoded and written concurrently in a
+thread pool. The series is then saved as a scan of the
+patient in one transaction through scan_index.save_scan, so it opens in
+the viewer like any loaded folder.
+"""
+
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+import pydicom
+from pydicom.dataset import Dataset, FileMetaDataset
+from pydicom.uid import ExplicitVRLittleEndian, generate_uid
+
+from coil_compression import compress_coils
+from dataprocessingpython import read_raw_firtech, kspace_to_image
+from raw_catalog import parse_raw_filename
+from scan_index import save_scan
+
+MR_IMAGE_STORAGE = "1.2.840.10008.5.1.4.1.1.4"
+# Used when the slice geometry is unknown; it needs no position or orientation
+SECONDARY_CAPTURE_STORAGE = "1.2.840.10008.5.1.4.1.1.7"
+DICOM_OUTPUT_FOLDER = "Processed Data"
+SEX_CODES = {"Male": "M", "Female": "F", "Other": "O"}
+
+def scan_groups(raw_files):
+    """
+    Group channel files by scan.
+
+    Returns:
+        dict: scan key -> channel files in (board, channel) order; files
+            whose name carries no scan timestamp form a scan of their own
+    """
+    scans = {}
+    for raw_file in map(Path, raw_files):
+        fields = parse_raw_filename(raw_file.name)
+        if fields is None:
+            scans[raw_file.stem] = [(0, 0, raw_file)]
+        else:
+            scans.setdefault(fields["scan_key"], []).append((fields["board"], fields["channel"], raw_file))
+    return {key: [path for _, _, path in sorted(files)] for key, files in scans.items()}
+
+def combine_channels(raw_files, virtual_coils=0):
+    """
+    Root-sum-of-squares image of every slice of one scan.
+
+    Without compression, channels are added one at a time, so only one
+    channel's data is held beside the running sum.
+
+    Args:
+        raw_files (list): Channel files of one scan
+        virtual_coils (int): If > 0 and the scan has more channels, the
+            channels are pre-whitened and compressed to this many virtual
+            coils first (coil_compression.py)
+
+    Returns:
+        np.ndarray: (slices, views, samples) float32 magnitude volume
+    """
+    if 0 < virtual_coils < len(raw_files):
+        # First experiment, echo and views segment; every slice of every channel
+        kspace = np.stack([read_raw_firtech(Path(raw_file))[0][0, 0, :, 0] for raw_file in raw_files])
+        compressed = compress_coils(kspace.astype(np.complex64), virtual_coils)[0]
+        return np.sqrt(np.sum(np.abs(kspace_to_image(compressed)) ** 2, axis=0))
+    total = None
+    for raw_file in raw_files:
+        data, _ = read_raw_firtech(Path(raw_file))
+        # First experiment, echo and views segment; every slice
+        power = np.abs(kspace_to_image(data[0, 0, :, 0])) ** 2
+        total = power if total is None else total + power
+    return np.sqrt(total)
+
+def scale_to_uint16(volume):
+    """
+    Map a volume onto the full uint16 range.
+
+    Args:
+        volume (np.ndarray): (slices, rows, cols) real or complex images
+
+    Returns:
+        tuple: (uint16 pixels, rescale slope, rescale intercept), such that
+            value = pixel * slope + intercept
+    """
+    volume = np.abs(volume) if np.iscomplexobj(volume) else np.asarray(volume)
+    low, high = float(volume.min()), float(volume.max())
+    slope = (high - low) / 65535.0 if high > low else 1.0
+    pixels = np.empty(volume.shape, dtype=np.float32)
+    # Single pass over the volume into one float buffer, then one cast
+    np.subtract(volume, low, out=pixels, casting="unsafe")
+    np.multiply(pixels, 1.0 / slope, out=pixels)
+    np.rint(pixels, out=pixels)
+    np.clip(pixels, 0, 65535, out=pixels)
+    return pixels.astype(np.uint16), slope, low
+
+def display_window(pixels, slope, intercept):
+    """Window center and width covering the 1st to 99th percentile, in rescaled units"""
+    # A strided sample is enough for percentiles and keeps this cheap on large volumes
+    sample = pixels.ravel()[::max(1, pixels.size // 65536)]
+    low, high = np.percentile(sample, [1, 99]) * slope + intercept
+    return (low + high) / 2, max(high - low, slope)
+
+def fetch_patient(db, patient_id):
+    """Patient row as a dict, or raise ValueError if it does not exist"""
+    rows = db.read('SELECT name, ic, dob, sex, height, weight FROM patients WHERE id = ?', (patient_id,))
+    if not rows:
+        raise ValueError(f"No patient with id {patient_id}")
+    return dict(zip(["name", "ic", "dob", "sex", "height", "weight"], rows[0]))
+
+def _dicom_date(text):
+    return text.replace("-", "") if text else ""
+
+def build_dataset(pixels, index, series, patient):
+    """
+    One image of the series: MR with known geometry, Secondary Capture without.
+
+    Args:
+        pixels (np.ndarray): (rows, cols) uint16 slice
+        index (int): Slice index, 0-based
+        series (dict): Values shared by every slice (UIDs, dates, scaling,
+            geometry or None)
+        patient (dict): Row from the patients table
+
+    Returns:
+        Dataset: Ready to write
+    """
+    geometry = series["geometry"]
+    sop_class = MR_IMAGE_STORAGE if geometry is not None else SECONDARY_CAPTURE_STORAGE
+    meta = FileMetaDataset()
+    meta.MediaStorageSOPClassUID = sop_class
+    meta.MediaStorageSOPInstanceUID = generate_uid()
+    meta.TransferSyntaxUID = ExplicitVRLittleEndian
+
+    ds = Dataset()
+    ds.file_meta = meta
+    ds.SOPClassUID = sop_class
+    ds.SOPInstanceUID = meta.MediaStorageSOPInstanceUID
+    ds.Modality = "MR"
+
+    ds.PatientName = patient["name"]
+    ds.PatientID = patient["ic"]
+    ds.PatientBirthDate = _dicom_date(patient["dob"])
+    ds.PatientSex = SEX_CODES.get(patient["sex"], "O")
+    if patient["height"]:
+        ds.PatientSize = f"{patient['height'] / 100:.2f}"  # metres
+    if patient["weight"]:
+        ds.PatientWeight = f"{patient['weight']:.1f}"
+
+    ds.StudyInstanceUID = series["study_uid"]
+    ds.SeriesInstanceUID = series["series_uid"]
+    ds.StudyDate = ds.SeriesDate = ds.ContentDate = series["date"]
+    ds.StudyTime = ds.SeriesTime = ds.ContentTime = series["time"]
+    ds.SeriesDescription = series["description"]
+    ds.SeriesNumber = 1
+    ds.InstanceNumber = index + 1
+
+    if geometry is not None:
+        ds.FrameOfReferenceUID = series["frame_uid"]
+        ds.PixelSpacing = list(geometry["pixel_spacing"])
+        ds.SliceThickness = geometry["slice_thickness"]
+        ds.ImageOrientationPatient = list(geometry["orientation"])
+        ds.ImagePositionPatient = list(geometry["positions"][index])
+    else:
+        # The raw header carries the matrix but no field of view or slice
+        # position, so none is made up
+        ds.ConversionType = "WSD"
+
+    ds.Rows, ds.Columns = pixels.shape
+    ds.SamplesPerPixel = 1
+    ds.PhotometricInterpretation = "MONOCHROME2"
+    ds.BitsAllocated = 16
+    ds.BitsStored = 16
+    ds.HighBit = 15
+    ds.PixelRepresentation = 0
+    ds.RescaleSlope = f"{series['slope']:.6g}"
+    ds.RescaleIntercept = f"{series['intercept']:.6g}"
+    ds.WindowCenter = f"{series['window_center']:.6g}"
+    ds.WindowWidth = f"{series['window_width']:.6g}"
+    ds.PixelData = np.ascontiguousarray(pixels).tobytes()
+    return ds
+
+def write_dataset(ds, path):
+    """Write a dataset as a DICOM file with a preamble, for pydicom 2 and 3"""
+    if int(pydicom.__version__.split(".")[0]) < 3:
+        ds.is_little_endian = True
+        ds.is_implicit_VR = False
+        ds.save_as(path, write_like_original=False)
+    else:
+        ds.save_as(path, enforce_file_format=True)
+
+def write_series(volume, patient_id, db, folder=None, description="Reconstruction", geometry=None,
+                 notes="", workers=4, store=None):
+    """
+    Write a reconstructed volume as a DICOM series and save it as a scan of a patient.
+
+    Blocks while files are written, so call it off the GUI thread.
+
+    Args:
+        volume (np.ndarray or list): (slices, rows, cols) images, or a list of equally sized 2D images
+        patient_id (int): patients.id the series belongs to
+        db (PatientDatabase): Database for the patient details and the scan record
+        folder (str): Output folder; defaults to Processed Data/dicom_<IC>_<time>
+        description (str): Series description
+        geometry (dict): Known slice geometry: pixel_spacing (row, col mm),
+            slice_thickness (mm), orientation (6 direction cosines) and
+            positions (one xyz per slice). Without it the series is written
+            as Secondary Capture with no spatial information.
+        notes (str): Notes on the mri_scans row
+        workers (int): Slices encoded and written in parallel
+        store (ScanStore): Content-addressed store to ingest the files into, or None
+
+    Returns:
+        tuple: (scan id, folder, number of files written)
+    """
+    volume = np.asarray(volume)
+    if volume.ndim == 2:
+        volume = volume[np.newaxis]
+    if volume.ndim != 3:
+        raise ValueError(f"Expected (slices, rows, cols) images, got shape {volume.shape}")
+    # Checked after promotion, so a single 2D image takes one position rather than one per row
+    if geometry is not None and len(geometry["positions"]) != len(volume):
+        raise ValueError("geometry needs one position per slice")
+    patient = fetch_patient(db, patient_id)
+
+    now = datetime.now()
+    folder = folder or os.path.join(DICOM_OUTPUT_FOLDER, f"dicom_{patient['ic']}_{now.strftime('%Y%m%d_%H%M%S_%f')}")
+    os.makedirs(folder, exist_ok=True)
+
+    pixels, slope, intercept = scale_to_uint16(volume)
+    window_center, window_width = display_window(pixels, slope, intercept)
+    series = dict(
+        study_uid=generate_uid(), series_uid=generate_uid(), frame_uid=generate_uid(),
+        date=now.strftime("%Y%m%d"), time=now.strftime("%H%M%S"), description=description,
+        geometry=geometry,
+        slope=slope, intercept=intercept, window_center=window_center, window_width=window_width,
+    )
+
+    def write(index):
+        path = os.path.join(folder, f"IM{index + 1:04d}.dcm")
+        write_dataset(build_dataset(pixels[index], index, series, patient), path)
+        return path
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="dicom-write") as pool:
+        files = list(pool.map(write, range(len(pixels))))
+
+    # The scan row and every image row are committed together
+    scan_id = save_scan(db, patient_id, now.strftime("%Y-%m-%d"), os.path.abspath(folder), notes, files, store)[0]
+    return scan_id, folder, len(files)
+
+def write_raw_scans(raw_files, patient_id, db, store=None, workers=4, virtual_coils=0):
+    """
+    Write one DICOM series per scan found among raw channel files.
+
+    Args:
+        virtual_coils (int): Compress each scan's channels to this many
+            virtual coils before combining them; 0 combines all channels
+
+    Returns:
+        list: (scan id, folder, number of files) per scan
+    """
+    written = []
+    for scan_key, files in sorted(scan_groups(raw_files).items()):
+        volume = combine_channels(files, virtual_coils)
+        combination = f"{virtual_coils} virtual coils, RSS" if 0 < virtual_coils < len(files) else "RSS"
+        description = f"Reconstruction {scan_key} ({len(files)} channel{'s' if len(files) > 1 else ''}, {combination})"
+        written.append(write_series(volume, patient_id, db, description=description,
+                                    notes=f"Reconstructed from raw scan {scan_key}", workers=workers, store=store))
+    return written
+
+if __name__ == "__main__":
+    # Usage: python dicom_writer.py <patient id> [raw folder]
+    from dataprocessingpython import list_raw_files
+    from patient_db import get_database
+    for scan_id, folder, count in write_raw_scans(list_raw_files(sys.argv[2] if len(sys.argv) > 2 else "Raw Data"),
+                                                  int(sys.argv[1]), get_database()):
+        print(f"Wrote {count} slices to {folder} as scan {scan_id}")
@@ -0,0 +1,267 @@
+#!/usr/bin/env python3
+"""Hardware-access layer: a backend interface, the mricpp backend and a simulator."""
+
+import abc
+import importlib
+import importlib.util
+import os
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+
+from dataprocessingpython import write_raw_firtech
+
+# Functions every backend provides, named after the mricpp API
+HARDWARE_FUNCTIONS = [
+    'GetDLLVersion', 'GetDLLPath', 'SetSystemSel', 'GetSystemSel', 'SetVerboseLevel',
+    'Init', 'ConfigFile', 'CloseSys', 'Run', 'Abort', 'SetParameterFile',
+    'SetTotalCh', 'GetTotalCh', 'SetChSel', 'SetSaveMode', 'SetOutputPath',
+    'GetCurrentScanNo', 'ScanCompleted', 'GetTotalScanNo'
+]
+
+BACKEND_ENV_VAR = "MRIQT_HARDWARE_BACKEND"
+
+class HardwareBackend(abc.ABC):
+    """Interface for spectrometer backends; method names follow mricpp"""
+    name = "abstract"
+    # True for backends that do not drive a real scanner
+    simulated = False
+
+    @abc.abstractmethod
+    def GetDLLVersion(self): ...
+    @abc.abstractmethod
+    def GetDLLPath(self): ...
+    @abc.abstractmethod
+    def SetSystemSel(self, system): ...
+    @abc.abstractmethod
+    def GetSystemSel(self): ...
+    @abc.abstractmethod
+    def SetVerboseLevel(self, level): ...
+    @abc.abstractmethod
+    def Init(self, init_file): ...
+    @abc.abstractmethod
+    def ConfigFile(self, config_file): ...
+    @abc.abstractmethod
+    def CloseSys(self): ...
+    @abc.abstractmethod
+    def Run(self): ...
+    @abc.abstractmethod
+    def Abort(self): ...
+    @abc.abstractmethod
+    def SetParameterFile(self, parameter_file): ...
+    @abc.abstractmethod
+    def SetTotalCh(self, total, board): ...
+    @abc.abstractmethod
+    def GetTotalCh(self, board): ...
+    @abc.abstractmethod
+    def SetChSel(self, selection, board): ...
+    @abc.abstractmethod
+    def SetSaveMode(self, mode): ...
+    @abc.abstractmethod
+    def SetOutputPath(self, path): ...
+    @abc.abstractmethod
+    def GetCurrentScanNo(self): ...
+    @abc.abstractmethod
+    def ScanCompleted(self): ...
+    @abc.abstractmethod
+    def GetTotalScanNo(self): ...
+
+@HardwareBackend.register
+class MricppBackend:
+    """
+    The real spectrometer, loaded from the mricpp extension on first use.
+
+    Every call is forwarded to the extension, so it is registered as a
+    HardwareBackend rather than subclassing it.
+    """
+    name = "mricpp"
+    simulated = False
+
+    def __init__(self):
+        self._module = None
+
+    @property
+    def module(self):
+        # Importing mricpp loads the vendor DLL, so defer it until a call is made
+        if self._module is None:
+            self._module = importlib.import_module("mricpp")
+        return self._module
+
+    def __getattr__(self, name):
+        # Only called for names not found on the class: the whole mricpp API
+        if name.startswith('_'):
+            raise AttributeError(name)
+        return getattr(self.module, name)
+
+def make_phantom(size=128):
+    """Disc phantom with an inner insert, used for synthetic scans"""
+    y, x = np.mgrid[-1:1:size * 1j, -1:1:size * 1j]
+    image = np.where(x ** 2 + y ** 2 < 0.7 ** 2, 1.0, 0.0)
+    image += np.where((x - 0.2) ** 2 + y ** 2 < 0.2 ** 2, 0.5, 0.0)
+    return image
+
+class SimulatorBackend(HardwareBackend):
+    """
+    Pure-Python spectrometer that writes synthetic raw files.
+
+    Run() starts a background scan that produces total_scans scans, each
+    taking scan_latency seconds and writing one FIRTECH raw file per channel
+    into the output path. Init latency and return code are configurable so
+    slow or failing hardware can be simulated.
+    """
+    name = "simulator"
+    simulated = True
+
+    def __init__(self, init_latency=0.5, run_latency=0.05, scan_latency=1.0,
+                 init_result=0, total_scans=1, matrix_size=128, noise_level=50.0):
+        self.init_latency = init_latency
+        self.run_latency = run_latency
+        self.scan_latency = scan_latency
+        self.init_result = init_result
+        self.total_scans = total_scans
+        self.matrix_size = matrix_size
+        self.noise_level = noise_level
+
+        self.system_sel = 0
+        self.total_ch = 1
+        self.channel_selection = "1"
+        self.save_mode = 1
+        self.output_path = Path("./output")
+        self.parameter_file = None
+        self.initialized = False
+
+        self.current_scan = 0
+        self.scan_thread = None
+        self.abort_event = threading.Event()
+        self.lock = threading.Lock()
+
+    def GetDLLVersion(self):
+        return "simulator"
+
+    def GetDLLPath(self):
+        return __file__
+
+    def SetSystemSel(self, system):
+        self.system_sel = system
+
+    def GetSystemSel(self):
+        return self.system_sel
+
+    def SetVerboseLevel(self, level):
+        pass
+
+    def Init(self, init_file):
+        time.sleep(self.init_latency)
+        self.initialized = self.init_result == 0
+        return self.init_result
+
+    def ConfigFile(self, config_file):
+        return 0 if self.initialized else -1
+
+    def CloseSys(self):
+        self.Abort()
+        self.initialized = False
+
+    def SetParameterFile(self, parameter_file):
+        self.parameter_file = parameter_file
+
+    def SetTotalCh(self, total, board):
+        self.total_ch = total
+
+    def GetTotalCh(self, board):
+        if not self.initialized:
+            raise RuntimeError("System not initialized")
+        return self.total_ch
+
+    def SetChSel(self, selection, board):
+        self.channel_selection = selection
+
+    def SetSaveMode(self, mode):
+        self.save_mode = mode
+
+    def SetOutputPath(self, path):
+        self.output_path = Path(path)
+
+    def Run(self):
+        if not self.initialized:
+            return -1
+        if self.scan_thread is not None and self.scan_thread.is_alive():
+            return -2
+        time.sleep(self.run_latency)
+        with self.lock:
+            self.current_scan = 0
+        self.abort_event.clear()
+        self.scan_thread = threading.Thread(target=self._scan, name="simulator-scan", daemon=True)
+        self.scan_thread.start()
+        return 0
+
+    def Abort(self):
+        self.abort_event.set()
+        if self.scan_thread is not None:
+            self.scan_thread.join()
+            self.scan_thread = None
+        return 0
+
+    def GetCurrentScanNo(self):
+        with self.lock:
+            return self.current_scan
+
+    def GetTotalScanNo(self):
+        return self.total_scans
+
+    def ScanCompleted(self):
+        with self.lock:
+            return int(self.current_scan >= self.total_scans)
+
+    def _scan(self):
+        self.output_path.mkdir(parents=True, exist_ok=True)
+        # Centre of k-space in the middle of the array, as in scanner files; reconstruct_raw_file
+        # (flipud, ifft2, ifftshift) then returns the phantom, up to a sign pattern its magnitude drops
+        phantom_kspace = np.flipud(np.fft.fftshift(np.fft.fft2(np.fft.fftshift(make_phantom(self.matrix_size)))))
+        phantom_kspace *= 1e5 / np.abs(phantom_kspace).max()
+        rng = np.random.default_rng()
+
+        for scan in range(self.total_scans):
+            if self.abort_event.wait(self.scan_latency):
+                return
+            stamp = datetime.now()
+            timestamp = (f"{stamp.year}.{stamp.month}.{stamp.day}.{stamp.hour}."
+                         f"{stamp.minute}.{stamp.second}.{stamp.microsecond // 1000}")
+            for channel in range(1, self.total_ch + 1):
+                noise = rng.normal(0, self.noise_level, (2,) + phantom_kspace.shape)
+                kspace = phantom_kspace + noise[0] + 1j * noise[1]
+                name = f"M_board0_ch{channel}_{timestamp}.raw"
+                # Write under a temporary name so watchers never see a partial file
+                tmp_path = self.output_path / (name + ".part")
+                write_raw_firtech(tmp_path, kspace.reshape((1, 1, 1, 1) + kspace.shape))
+                os.replace(tmp_path, self.output_path / name)
+            with self.lock:
+                self.current_scan = scan + 1
+
+def load_backend(name=None, **options):
+    """
+    Create a hardware backend.
+
+    Args:
+        name (str): "mricpp" or "simulator"; defaults to the MRIQT_HARDWARE_BACKEND
+            environment variable, then to mricpp if it is installed, else the simulator
+        **options: Keyword arguments for the backend constructor
+
+    Returns:
+        HardwareBackend: The selected backend
+    """
+    if name is None:
+        name = os.environ.get(BACKEND_ENV_VAR)
+    if name is None:
+        name = "mricpp" if importlib.util.find_spec("mricpp") is not None else "simulator"
+        if name == "simulator":
+            print("mricpp not found, using the simulator backend")
+
+    if name == "mricpp":
+        return MricppBackend(**options)
+    if name == "simulator":
+        return SimulatorBackend(**options)
+    raise ValueError(f"Unknown hardware backend: {name}")
@@ -4,29 +4,137 @@ import numpy as np
 import pydicom
 import sqlite3
 from datetime import datetime
+from pathlib import Path
 from PyQt5.QtWidgets import (QApplication, QWidget, QLabel, QVBoxLayout,
                              QPushButton, QSlider, QHBoxLayout, QFileDialog,
                              QGroupBox, QSpinBox, QFormLayout, QLineEdit,
                              QComboBox, QDateEdit, QMessageBox, QTableWidget,
                              QTableWidgetItem, QDialog, QVBoxLayout as QVBoxLayoutDialog,
-                             QHeaderView, QInputDialog, QTextEdit, QDesktopWidget)
+                             QHeaderView, QInputDialog, QTextEdit, QDesktopWidget,
+                             QListWidget, QListWidgetItem, QListView, QProgressBar,
+                             QTableView)
 from PyQt5.QtGui import QPixmap, QPainter, QPen, QImage, QIcon, QColor
-from PyQt5.QtCore import Qt, QPointF, QDate, QSize, QTimer
+from PyQt5.QtCore import (Qt, QPointF, QRectF, QDate, QSize, QTimer, QThread, pyqtSignal,
+                          QAbstractTableModel, QModelIndex, QObject)
 import math
+import multiprocessing
+import threading
+import time
+from collections import deque, OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed, wait
+from concurrent.futures.process import BrokenProcessPool
+
+from dataprocessingpython import reconstruct_raw_file, list_raw_files
+from thumbnail_cache import ThumbnailCache, make_thumbnail, THUMBNAIL_SIZE
+
+from spectrometer_session import SpectrometerSession
+from hardware import load_backend
+from acquisition import AcquisitionController, ReconstructionPipeline
+from raw_catalog import RawCatalog, RawDirectoryWatcher
+from shared_volume import SharedVolumeRegistry, reconstruct_to_shared, cleanup_stale_segments
+from qa_checks import QAStore, run_phantom_qa
+from patient_db import get_database, connect as connect_patient_db, search_patients
+from scan_index import save_scan, scan_images, is_stale
+from scan_store import ScanStore, StoreVerifier
+from db_maintenance import MaintenanceService
+from annotations import annotation_lines, find_saved_scan, scan_annotations, save_annotations
+from dicom_writer import write_raw_scans
+from coil_compression import group_by_scan, reconstruct_compressed
+
+class DatabaseResults(QObject):
+    """Delivers database futures to callbacks on the GUI thread"""
+    delivered = pyqtSignal(object, object, object)  # future, on_result, on_error
 
-from dataprocessingpython import kspace2Image
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.delivered.connect(self.deliver)
+
+    def watch(self, future, on_result, on_error=None):
+        # The done callback runs on a database thread; the signal queues it to the GUI
+        future.add_done_callback(lambda f: self.delivered.emit(f, on_result, on_error))
+
+    def deliver(self, future, on_result, on_error):
+        error = future.exception()
+        if error is None:
+            on_result(future.result())
+        elif on_error is not None:
+            on_error(error)
+        else:
+            print(f"Database error: {str(error)}")
 
-# Import checkConnection function from test_basic
-try:
-    from test_basic import checkConnection
-except ImportError:
-    # Fallback if test_basic is not available
-    def checkConnection():
-        return 0  # Default to success for testing
+class PatientTableModel(QAbstractTableModel):
+    """Patient records read from SQLite one page at a time, newest first"""
+    HEADERS = ["ID", "Name", "IC", "Date of Birth", "Sex", "Height (cm)", "Weight (kg)", "Created At"]
+    PAGE_SIZE = 200
+    first_page_loaded = pyqtSignal()
+    load_failed = pyqtSignal(str)
+
+    def __init__(self, db, results, parent=None):
+        super().__init__(parent)
+        self.db = db
+        self.results = results
+        self.rows = []
+        self.exhausted = False
+        self.loading = False
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.rows)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.HEADERS)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if role != Qt.DisplayRole or not index.isValid():
+            return None
+        value = self.rows[index.row()][index.column()]
+        return str(value) if value is not None else ""
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return self.HEADERS[section]
+        return None
+
+    def canFetchMore(self, parent=QModelIndex()):
+        return not parent.isValid() and not self.exhausted and not self.loading
+
+    def fetchMore(self, parent=QModelIndex()):
+        """Request the next page, continuing below the last id seen (keyset pagination)"""
+        if parent.isValid() or self.loading or self.exhausted:
+            return
+        self.loading = True
+        if self.rows:
+            future = self.db.read_async('''
+                SELECT id, name, ic, dob, sex, height, weight, created_at
+                FROM patients WHERE id < ? ORDER BY id DESC LIMIT ?
+            ''', (self.rows[-1][0], self.PAGE_SIZE))
+        else:
+            future = self.db.read_async('''
+                SELECT id, name, ic, dob, sex, height, weight, created_at
+                FROM patients ORDER BY id DESC LIMIT ?
+            ''', (self.PAGE_SIZE,))
+        self.results.watch(future, self.page_loaded, self.page_failed)
+
+    def page_loaded(self, page):
+        first = not self.rows
+        self.loading = False
+        self.exhausted = len(page) < self.PAGE_SIZE
+        if page:
+            self.beginInsertRows(QModelIndex(), len(self.rows), len(self.rows) + len(page) - 1)
+            self.rows.extend(page)
+            self.endInsertRows()
+        if first:
+            self.first_page_loaded.emit()
+
+    def page_failed(self, error):
+        self.loading = False
+        self.exhausted = True
+        self.load_failed.emit(str(error))
 
 class PatientDatabaseDialog(QDialog):
     """Dialog to display patient database records"""
-    def __init__(self, parent=None):
+    SIZE_SAMPLE_ROWS = 50
+
+    def __init__(self, model, parent=None):
         super().__init__(parent)
         self.setWindowTitle("Patient Database")
         self.setGeometry(200, 200, 700, 500)
@@ -38,7 +146,7 @@ class PatientDatabaseDialog(QDialog):
                 color: #ffffff;
                 font-size: 10pt;
             }
-            QTableWidget {
+            QTableView {
                 background-color: #3a3a3a;
                 alternate-background-color: #404040;
                 color: #ffffff;
@@ -71,18 +179,14 @@ class PatientDatabaseDialog(QDialog):
 
         layout = QVBoxLayoutDialog()
 
-        # Create table widget
-        self.table = QTableWidget()
-        self.table.setColumnCount(8)
-        self.table.setHorizontalHeaderLabels(["ID", "Name", "IC", "Date of Birth", "Sex", "Height (cm)", "Weight (kg)", "Created At"])
-
-        # Make table read-only
-        self.table.setEditTriggers(QTableWidget.NoEditTriggers)
-
-        # Set column resize mode
+        # Table view over the lazily filled model (read-only by default)
+        self.model = model
+        self.table = QTableView()
+        self.table.setModel(model)
+        self.table.verticalHeader().setDefaultSectionSize(self.table.fontMetrics().height() + 6)
         header = self.table.horizontalHeader()
-        header.setSectionResizeMode(QHeaderView.ResizeToContents)
         header.setStretchLastSection(True)
+        self.size_columns()
 
         layout.addWidget(self.table)
 
@@ -93,34 +197,350 @@ class PatientDatabaseDialog(QDialog):
 
         self.setLayout(layout)
 
-    def load_data(self, data):
-        """Load data into the table"""
-        self.table.setRowCount(len(data))
+    def size_columns(self):
+        """Size columns from the header and a sample of loaded rows instead of every row"""
+        metrics = self.table.fontMetrics()
+        sample = self.model.rows[:self.SIZE_SAMPLE_ROWS]
+        for column, title in enumerate(self.model.HEADERS):
+            texts = [title] + [str(row[column]) if row[column] is not None else "" for row in sample]
+            width = max(metrics.horizontalAdvance(text) for text in texts) + 24
+            self.table.horizontalHeader().resizeSection(column, min(width, 300))
+
+class PatientSearchWorker(QThread):
+    """Background thread that runs one patient search and streams the matches"""
+    results_ready = pyqtSignal(int, object)  # search generation, list of (id, name, ic)
+    search_done = pyqtSignal(int, int)  # search generation, total matches shown
+
+    BATCH_SIZE = 50
+
+    def __init__(self, generation, text, parent=None):
+        super().__init__(parent)
+        self.generation = generation
+        self.text = text
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
 
-        for row_idx, row_data in enumerate(data):
-            for col_idx, value in enumerate(row_data):
-                item = QTableWidgetItem(str(value) if value is not None else "")
-                self.table.setItem(row_idx, col_idx, item)
+    def run(self):
+        # SQLite connections belong to one thread, so each search opens its own read-only one
+        conn = connect_patient_db(readonly=True)
+        total = 0
+        try:
+            cursor = search_patients(conn, self.text)
+            while not self.cancelled:
+                batch = cursor.fetchmany(self.BATCH_SIZE)
+                if not batch:
+                    break
+                total += len(batch)
+                self.results_ready.emit(self.generation, batch)
+        except sqlite3.Error as e:
+            print(f"Patient search failed: {str(e)}")
+        finally:
+            conn.close()
+        self.search_done.emit(self.generation, total)
+
+class PatientSearchDialog(QDialog):
+    """Search-as-you-type patient picker over the FTS patient index"""
+    DEBOUNCE_MS = 150
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Select Patient")
+        self.setGeometry(250, 250, 420, 460)
+        self.setStyleSheet("""
+            QDialog {
+                background-color: #2b2b2b;
+                color: #ffffff;
+                font-size: 10pt;
+            }
+            QLineEdit, QListWidget {
+                background-color: #404040;
+                border: 1px solid #666666;
+                border-radius: 3px;
+                padding: 3px;
+                color: #ffffff;
+            }
+            QListWidget::item:selected {
+                background-color: #5a5a5a;
+            }
+            QPushButton {
+                background-color: #4a4a4a;
+                border: 1px solid #666666;
+                border-radius: 3px;
+                padding: 3px;
+                color: #ffffff;
+            }
+            QPushButton:hover {
+                background-color: #5a5a5a;
+            }
+            QLabel {
+                color: #ffffff;
+            }
+        """)
+        self.selected_patient = None
+        self.generation = 0
+        self.workers = []
+
+        layout = QVBoxLayoutDialog()
+        layout.addWidget(QLabel("Choose patient for this MRI scan:"))
+        self.search_input = QLineEdit()
+        self.search_input.setPlaceholderText("Type a name or IC")
+        self.search_input.textChanged.connect(self.schedule_search)
+        layout.addWidget(self.search_input)
+
+        self.results_list = QListWidget()
+        self.results_list.itemDoubleClicked.connect(self.accept)
+        layout.addWidget(self.results_list)
+
+        self.status_label = QLabel("")
+        layout.addWidget(self.status_label)
+
+        button_layout = QHBoxLayout()
+        ok_btn = QPushButton("Select")
+        ok_btn.clicked.connect(self.accept)
+        cancel_btn = QPushButton("Cancel")
+        cancel_btn.clicked.connect(self.reject)
+        button_layout.addStretch()
+        button_layout.addWidget(ok_btn)
+        button_layout.addWidget(cancel_btn)
+        layout.addLayout(button_layout)
+        self.setLayout(layout)
+
+        # Keystrokes restart the timer; only a pause in typing runs a search
+        self.debounce_timer = QTimer(self)
+        self.debounce_timer.setSingleShot(True)
+        self.debounce_timer.timeout.connect(self.run_search)
+        self.run_search()
+
+    def schedule_search(self):
+        self.debounce_timer.start(self.DEBOUNCE_MS)
+
+    def run_search(self):
+        # Results of earlier searches are ignored once a new one starts
+        for worker in self.workers:
+            worker.cancel()
+        self.generation += 1
+        self.results_list.clear()
+        self.status_label.setText("Searching...")
+        worker = PatientSearchWorker(self.generation, self.search_input.text())
+        worker.results_ready.connect(self.add_results)
+        worker.search_done.connect(self.search_done)
+        worker.finished.connect(lambda: self.workers.remove(worker))
+        self.workers.append(worker)
+        worker.start()
+
+    def add_results(self, generation, rows):
+        if generation != self.generation:
+            return
+        for patient_id, name, ic in rows:
+            item = QListWidgetItem(f"{name} (IC: {ic})")
+            item.setData(Qt.UserRole, (patient_id, name, ic))
+            self.results_list.addItem(item)
+        if self.results_list.currentRow() < 0:
+            self.results_list.setCurrentRow(0)
+
+    def search_done(self, generation, total):
+        if generation == self.generation:
+            self.status_label.setText(f"{total} patient(s) shown" if total else "No matching patients")
+
+    def accept(self, *args):
+        item = self.results_list.currentItem()
+        if item is None:
+            return
+        self.selected_patient = item.data(Qt.UserRole)
+        super().accept()
+
+    def done(self, result):
+        for worker in self.workers:
+            worker.cancel()
+            worker.wait()
+        super().done(result)
+
+class ImagePyramid:
+    """
+    Half-resolution copies of an image, cut into lazily rendered tiles.
+
+    The levels are QImages, so a pyramid can be built off the GUI thread;
+    tiles become QPixmaps on first paint.
+    """
+    TILE_SIZE = 256
+
+    def __init__(self, image, max_cached_tiles=256):
+        # Level 0 is full resolution; each further level halves both sides
+        self.levels = [image]
+        while max(self.levels[-1].width(), self.levels[-1].height()) > self.TILE_SIZE:
+            previous = self.levels[-1]
+            self.levels.append(previous.scaled(max(1, previous.width() // 2),
+                                               max(1, previous.height() // 2),
+                                               Qt.IgnoreAspectRatio, Qt.SmoothTransformation))
+        self.max_cached_tiles = max_cached_tiles
+        self.tiles = OrderedDict()
+
+    def width(self):
+        return self.levels[0].width()
+
+    def height(self):
+        return self.levels[0].height()
+
+    def level_for_scale(self, scale):
+        """Coarsest level that still has at least one source pixel per screen pixel"""
+        if scale >= 1.0:
+            return 0
+        return min(int(math.floor(math.log2(1.0 / scale))), len(self.levels) - 1)
+
+    def tile(self, level, tx, ty):
+        """Return the pixmap for one tile, rendering and caching it on first use"""
+        key = (level, tx, ty)
+        pixmap = self.tiles.get(key)
+        if pixmap is not None:
+            self.tiles.move_to_end(key)
+            return pixmap
+
+        # Edge tiles are clipped to the image so they carry no padding
+        size = self.TILE_SIZE
+        image = self.levels[level]
+        x, y = tx * size, ty * size
+        pixmap = QPixmap.fromImage(image.copy(x, y, min(size, image.width() - x), min(size, image.height() - y)))
+        self.tiles[key] = pixmap
+        if len(self.tiles) > self.max_cached_tiles:
+            self.tiles.popitem(last=False)
+        return pixmap
 
 class ImageLabel(QLabel):
-    """Custom QLabel that draws lines on top of the image"""
-    def __init__(self, text, parent):
+    """Custom QLabel that draws a zoomable, pannable image with lines on top"""
+    MIN_ZOOM = 1.0
+    MAX_ZOOM = 32.0
+
+    def __init__(self, text, parent, show_lines=True):
         super().__init__(text)
         self.parent_widget = parent
+        # Annotation lines read their settings from the parent's controls
+        self.show_lines = show_lines
         self.loading_angle = 0  # For animation
         self.timer = QTimer()
         self.timer.timeout.connect(self.update_animation)
         self.timer.start(200)  # Update every 200ms for slower rotation
 
+        # Zoom is relative to fitting the whole image; pan is in label pixels
+        self.image = None
+        self.pyramid = None
+        self.zoom = 1.0
+        self.pan = QPointF(0, 0)
+        self._pan_start = None
+
+    def set_image(self, frame):
+        """
+        Show a new image, keeping the current zoom and pan if the size is unchanged.
+
+        Args:
+            frame (QImage or ImagePyramid): The image, or a pyramid already
+                built off the GUI thread. A plain image only gets a pyramid
+                once it is painted zoomed in.
+        """
+        image = frame.levels[0] if isinstance(frame, ImagePyramid) else frame
+        if self.image is None or self.image.size() != image.size():
+            self.reset_view()
+        self.image = image
+        self.pyramid = frame if isinstance(frame, ImagePyramid) else None
+        self.update()
+
+    def has_image(self):
+        return self.image is not None and not self.image.isNull()
+
+    def clear(self):
+        self.image = None
+        self.pyramid = None
+        super().clear()
+
+    def setText(self, text):
+        # Replaces the image, as it does on a plain QLabel
+        self.image = None
+        self.pyramid = None
+        super().setText(text)
+
+    def reset_view(self):
+        """Return to fitting the whole image inside the label"""
+        self.zoom = 1.0
+        self.pan = QPointF(0, 0)
+        self.update()
+
+    def view_scale(self):
+        """Screen pixels per image pixel at the current zoom"""
+        fit_scale = min(self.width() / self.image.width(), self.height() / self.image.height())
+        return fit_scale * self.zoom
+
+    def image_origin(self):
+        """Label position of the image's top-left corner"""
+        scale = self.view_scale()
+        return QPointF((self.width() - self.image.width() * scale) / 2 + self.pan.x(),
+                       (self.height() - self.image.height() * scale) / 2 + self.pan.y())
+
+    def widget_to_image(self, point):
+        """Map a label position to image pixel coordinates"""
+        origin = self.image_origin()
+        scale = self.view_scale()
+        return QPointF((point.x() - origin.x()) / scale, (point.y() - origin.y()) / scale)
+
+    def wheelEvent(self, event):
+        """Zoom about the cursor position"""
+        if not self.has_image():
+            return
+        steps = event.angleDelta().y() / 120.0
+        new_zoom = min(max(self.zoom * (1.25 ** steps), self.MIN_ZOOM), self.MAX_ZOOM)
+        if new_zoom == self.zoom:
+            return
+
+        # Keep the image point under the cursor fixed while zooming
+        cursor = QPointF(event.pos())
+        anchor = self.widget_to_image(cursor)
+        self.zoom = new_zoom
+        self.pan = QPointF(0, 0)
+        origin = self.image_origin()
+        scale = self.view_scale()
+        self.pan = QPointF(cursor.x() - (origin.x() + anchor.x() * scale),
+                           cursor.y() - (origin.y() + anchor.y() * scale))
+        self.update()
+
+    def mousePressEvent(self, event):
+        if event.button() == Qt.LeftButton and self.zoom > 1.0:
+            self._pan_start = QPointF(event.pos()) - self.pan
+            event.accept()
+        else:
+            # Let the window handle dragging when not zoomed in
+            event.ignore()
+
+    def mouseMoveEvent(self, event):
+        if self._pan_start is not None and event.buttons() == Qt.LeftButton:
+            self.pan = QPointF(event.pos()) - self._pan_start
+            self.update()
+            event.accept()
+        else:
+            event.ignore()
+
+    def mouseReleaseEvent(self, event):
+        if self._pan_start is not None:
+            self._pan_start = None
+            event.accept()
+        else:
+            event.ignore()
+
+    def mouseDoubleClickEvent(self, event):
+        self.reset_view()
+
     def update_animation(self):
         """Update loading animation angle"""
-        if not self.pixmap() or self.pixmap().isNull():
+        if not self.has_image():
             self.loading_angle = (self.loading_angle + 3) % 360
             self.update()
 
+    def draw_lines(self, painter):
+        """Draw the parallel annotation lines set up in the parent's controls"""
+        draw_annotation(painter, self.parent_widget.current_annotation())
+
     def paintEvent(self, event):
         # If no pixmap, draw loading animation
-        if not self.pixmap() or self.pixmap().isNull():
+        if not self.has_image():
             painter = QPainter(self)
             painter.fillRect(event.rect(), self.palette().color(self.backgroundRole()))
             
@@ -153,78 +573,587 @@ class ImageLabel(QLabel):
             painter.setFont(self.font())
             painter.drawText(event.rect(), Qt.AlignHCenter | Qt.AlignBottom, "Loading DICOM images...")
         else:
-            # First draw the label (image) itself
-            super().paintEvent(event)
-
-            # Then draw lines on top if we have a pixmap
-            if self.pixmap() and not self.pixmap().isNull():
-                painter = QPainter(self)
-                painter.setRenderHint(QPainter.Antialiasing)
-
-                # Get the actual pixmap size within the label
-                label_width = self.width()
-                label_height = self.height()
-
-                scaled_pixmap = self.pixmap().scaled(label_width, label_height, Qt.KeepAspectRatio, Qt.SmoothTransformation)
-                pixmap_width = scaled_pixmap.width()
-                pixmap_height = scaled_pixmap.height()
-
-                # Calculate the offset to center the pixmap within the label
-                pixmap_x = (label_width - pixmap_width) // 2
-                pixmap_y = (label_height - pixmap_height) // 2
-
-                # Set clipping region to the pixmap area only
-                painter.setClipRect(pixmap_x, pixmap_y, pixmap_width, pixmap_height)
-
-                # Dotted line pen
-                pen = QPen(Qt.red, 2, Qt.DotLine)
-                painter.setPen(pen)
-
-                # Get parameters from parent widget
-                angle = self.parent_widget.degree_slider.value() / 10.0  # Convert from tenths to degrees
-                spacing = self.parent_widget.thickness_spinbox.value()
-                num_lines = self.parent_widget.num_lines_spinbox.value()
-                origin_x = self.parent_widget.origin_x_spinbox.value()
-                origin_y = self.parent_widget.origin_y_spinbox.value()
-                line_length = self.parent_widget.line_length_spinbox.value()
-
-                # Convert angle to radians
-                angle_rad = math.radians(angle)
+            painter = QPainter(self)
+            painter.fillRect(event.rect(), QColor(26, 26, 26))
+            painter.setRenderHint(QPainter.SmoothPixmapTransform)
+
+            scale = self.view_scale()
+            origin = self.image_origin()
+
+            if self.zoom <= self.MIN_ZOOM:
+                # Fitted: draw the whole frame, or its pyramid level nearest the screen size, in one call.
+                # No pixmaps are made, so cine playback does no conversions on the GUI thread
+                image = self.image
+                if self.pyramid is not None:
+                    image = self.pyramid.levels[self.pyramid.level_for_scale(scale)]
+                painter.drawImage(QRectF(origin.x(), origin.y(), self.image.width() * scale,
+                                         self.image.height() * scale), image, QRectF(image.rect()))
+            else:
+                if self.pyramid is None:
+                    # Zoomed in on a frame shown without a prebuilt pyramid; build it once
+                    self.pyramid = ImagePyramid(self.image)
+                # Pick the pyramid level matching the zoom, then draw only the visible tiles
+                level = self.pyramid.level_for_scale(scale)
+                level_image = self.pyramid.levels[level]
+                level_scale_x = scale * self.pyramid.width() / level_image.width()
+                level_scale_y = scale * self.pyramid.height() / level_image.height()
+                tile_size = ImagePyramid.TILE_SIZE
+
+                visible = event.rect()
+                first_tx = max(0, int((visible.left() - origin.x()) / level_scale_x) // tile_size)
+                first_ty = max(0, int((visible.top() - origin.y()) / level_scale_y) // tile_size)
+                last_tx = min((level_image.width() - 1) // tile_size,
+                              int((visible.right() - origin.x()) / level_scale_x) // tile_size)
+                last_ty = min((level_image.height() - 1) // tile_size,
+                              int((visible.bottom() - origin.y()) / level_scale_y) // tile_size)
+
+                for ty in range(first_ty, last_ty + 1):
+                    for tx in range(first_tx, last_tx + 1):
+                        tile = self.pyramid.tile(level, tx, ty)
+                        target = QRectF(origin.x() + tx * tile_size * level_scale_x,
+                                        origin.y() + ty * tile_size * level_scale_y,
+                                        tile.width() * level_scale_x,
+                                        tile.height() * level_scale_y)
+                        painter.drawPixmap(target, tile, QRectF(tile.rect()))
+
+            # Then draw lines on top, in image pixel coordinates
+            painter.setRenderHint(QPainter.Antialiasing)
+            painter.translate(origin)
+            painter.scale(scale, scale)
+
+            # Set clipping region to the image area only
+            painter.setClipRect(QRectF(0, 0, self.image.width(), self.image.height()))
+
+            if self.show_lines:
+                self.draw_lines(painter)
+
+            # Draw the stylesheet border over the image
+            painter.resetTransform()
+            painter.setClipping(False)
+            self.drawFrame(painter)
+
+def list_dicom_files(folder_path):
+    """Return the DICOM files in a folder in slice order"""
+    return [os.path.join(folder_path, file) for file in sorted(os.listdir(folder_path))
+            if file.endswith('.dcm')]
+
+def normalize_to_uint8(pixel_array):
+    """Scale a pixel array to the 0-255 range as uint8"""
+    pixel_array = pixel_array.astype(np.float32)
+    pixel_min = pixel_array.min()
+    pixel_range = pixel_array.max() - pixel_min
+    if pixel_range == 0:
+        return np.zeros(pixel_array.shape, dtype=np.uint8)
+    pixel_array = (pixel_array - pixel_min) / pixel_range * 255
+    return pixel_array.astype(np.uint8)
+
+def array_to_qimage(pixel_array):
+    """Wrap a 2D uint8 array as a grayscale QImage that owns its pixel data"""
+    pixel_array = np.ascontiguousarray(pixel_array)
+    height, width = pixel_array.shape
+    q_image = QImage(pixel_array.data, width, height, width, QImage.Format_Grayscale8)
+    # Detach from the numpy buffer so the image outlives the array
+    return q_image.copy()
+
+def dicom_to_qimage(path):
+    """Decode a DICOM file into a grayscale QImage that owns its pixel data"""
+    dicom_data = pydicom.dcmread(path)
+    return array_to_qimage(normalize_to_uint8(dicom_data.pixel_array))
+
+def draw_annotation(painter, annotation):
+    """Draw an annotation's dotted red lines; the painter maps image pixels"""
+    # Dotted line pen, kept at 2 device pixels regardless of zoom
+    pen = QPen(Qt.red, 2, Qt.DotLine)
+    pen.setCosmetic(True)
+    painter.setPen(pen)
+    for (x1, y1), (x2, y2) in annotation_lines(annotation):
+        painter.drawLine(QPointF(x1, y1), QPointF(x2, y2))
+
+def render_annotated_image(path, annotation, output_path):
+    """Decode a slice, draw its annotation offscreen and save it as an image file"""
+    image = dicom_to_qimage(path).convertToFormat(QImage.Format_RGB32)
+    if annotation is not None:
+        # QPainter on a QImage is safe outside the GUI thread
+        painter = QPainter(image)
+        painter.setRenderHint(QPainter.Antialiasing)
+        draw_annotation(painter, annotation)
+        painter.end()
+    if not image.save(output_path):
+        raise OSError(f"Could not write {output_path}")
+
+class FramePrefetcher(QThread):
+    """Background thread that keeps a window of decoded frames ahead of the playhead"""
+    def __init__(self, files, capacity=32, parent=None):
+        super().__init__(parent)
+        self.files = list(files)
+        self.capacity = max(1, min(capacity, len(self.files)))
+        # Decoded frames inside the window, frame index -> ImagePyramid. Keyed by index rather than
+        # index % capacity, so a window that wraps past the last slice never puts two frames in one slot
+        self.frames = {}
+        self.playhead = 0
+        self.running = True
+        self.condition = threading.Condition()
+
+    def window(self):
+        """Frame indices from the playhead onwards, capacity of them, wrapping at the end of the series"""
+        return [(self.playhead + offset) % len(self.files) for offset in range(self.capacity)]
+
+    def set_playhead(self, index):
+        """Move the playhead; frames that leave the window are dropped to make room for the producer"""
+        with self.condition:
+            self.playhead = index % len(self.files)
+            window = set(self.window())
+            for stale in [frame for frame in self.frames if frame not in window]:
+                del self.frames[stale]
+            self.condition.notify()
+
+    def get_frame(self, index):
+        """Return the decoded frame's ImagePyramid for index, or None if it is not buffered yet"""
+        with self.condition:
+            return self.frames.get(index)
+
+    def buffered_count(self):
+        """Number of frames ready from the playhead onwards"""
+        with self.condition:
+            count = 0
+            for index in self.window():
+                if index not in self.frames:
+                    break
+                count += 1
+            return count
+
+    def stop(self):
+        """Stop the producer thread and wait for it to exit"""
+        with self.condition:
+            self.running = False
+            self.condition.notify()
+        self.wait()
+
+    def _next_missing(self):
+        """Find the nearest frame ahead of the playhead that is not buffered"""
+        for index in self.window():
+            if index not in self.frames:
+                return index
+        return None
+
+    def run(self):
+        while True:
+            with self.condition:
+                index = self._next_missing()
+                # A full window leaves the producer waiting for the playhead to move
+                while self.running and index is None:
+                    self.condition.wait()
+                    index = self._next_missing()
+                if not self.running:
+                    return
+
+            # Decode and downsample outside the lock so the GUI thread is never blocked on disk
+            try:
+                image = dicom_to_qimage(self.files[index])
+            except Exception as e:
+                print(f"Error decoding {self.files[index]}: {str(e)}")
+                image = QImage()
+            image = ImagePyramid(image)
+
+            with self.condition:
+                # Only store the frame if it is still inside the window ahead of the playhead
+                if (index - self.playhead) % len(self.files) < self.capacity:
+                    self.frames[index] = image
+
+class ThumbnailWorker(QThread):
+    """Background thread that produces slice thumbnails, serving cached ones first"""
+    thumbnail_ready = pyqtSignal(int, QImage)
+
+    def __init__(self, files, parent=None):
+        super().__init__(parent)
+        self.files = list(files)
+        self.cancelled = False
 
-                # Calculate perpendicular direction for spacing
-                perp_angle_rad = angle_rad + math.pi / 2
+    def cancel(self):
+        self.cancelled = True
 
-                # Draw multiple parallel lines
-                for i in range(num_lines):
-                    # Calculate offset from origin for this line
-                    offset = (i - (num_lines - 1) / 2) * spacing
+    def run(self):
+        cache = ThumbnailCache()
+        try:
+            # Cached previews need no pixel decoding, so they appear immediately
+            cached = cache.get_many(self.files)
+            for index, path in enumerate(self.files):
+                if self.cancelled:
+                    return
+                if path in cached:
+                    self.thumbnail_ready.emit(index, array_to_qimage(cached[path]))
+
+            pending = []
+            for index, path in enumerate(self.files):
+                if self.cancelled:
+                    break
+                if path in cached or not path:
+                    continue
+                try:
+                    mtime = os.path.getmtime(path)
+                    thumb = make_thumbnail(pydicom.dcmread(path).pixel_array)
+                except Exception as e:
+                    print(f"Error creating thumbnail for {path}: {str(e)}")
+                    continue
+                self.thumbnail_ready.emit(index, array_to_qimage(thumb))
+                pending.append((path, mtime, thumb))
+
+                # Commit in batches so an interrupted run still keeps its work
+                if len(pending) >= 32:
+                    cache.put_many(pending)
+                    pending = []
+
+            if pending:
+                cache.put_many(pending)
+        finally:
+            cache.close()
+
+class ScanPreviewWorker(ThumbnailWorker):
+    """Thumbnails of the middle slice of each scan folder, served from the thumbnail cache"""
+    def __init__(self, folders, parent=None):
+        super().__init__([], parent)
+        self.folders = list(folders)
+
+    def run(self):
+        # Listing the folders touches the disk, so it happens here instead of on the GUI thread
+        self.files = []
+        for folder in self.folders:
+            try:
+                files = list_dicom_files(folder)
+            except OSError:
+                files = []
+            # Keep indexes aligned with the folders; empty paths are skipped
+            self.files.append(files[len(files) // 2] if files else "")
+        super().run()
+
+class SeriesLoader(QThread):
+    """Background thread that decodes every slice of one scan folder"""
+    slice_ready = pyqtSignal(str, int, int, QImage)  # folder, index, total, image
+    series_loaded = pyqtSignal(str, object)  # folder, list of QImages
+    series_failed = pyqtSignal(str, str)  # folder, error message
+    stale_images = pyqtSignal(str, int)  # folder, images changed or missing since the scan was saved
+
+    def __init__(self, folder, images=None, parent=None):
+        super().__init__(parent)
+        self.folder = folder
+        # Stored scan_images rows; without them the folder is listed
+        self.images = images
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+    def run(self):
+        if self.images:
+            files = [image["path"] for image in self.images]
+            # One stat per file, no listing or header reads
+            stale = sum(1 for image in self.images if is_stale(image))
+            if stale:
+                self.stale_images.emit(self.folder, stale)
+        else:
+            try:
+                files = list_dicom_files(self.folder)
+            except OSError as e:
+                self.series_failed.emit(self.folder, str(e))
+                return
+        if not files:
+            self.series_failed.emit(self.folder, "No DICOM files found")
+            return
+
+        images = []
+        for index, path in enumerate(files):
+            if self.cancelled:
+                return
+            try:
+                image = dicom_to_qimage(path)
+            except Exception as e:
+                print(f"Error decoding {path}: {str(e)}")
+                image = QImage()
+            images.append(image)
+            self.slice_ready.emit(self.folder, index, len(files), image)
+        self.series_loaded.emit(self.folder, images)
+
+class SeriesCache:
+    """LRU of decoded series, bounded by the bytes of pixel data held"""
+    def __init__(self, max_bytes=512 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.series = OrderedDict()
+        self.total_bytes = 0
+
+    @staticmethod
+    def _size(images):
+        return sum(image.sizeInBytes() for image in images)
+
+    def get(self, folder):
+        images = self.series.get(folder)
+        if images is not None:
+            self.series.move_to_end(folder)
+        return images
+
+    def put(self, folder, images):
+        if folder in self.series:
+            self.total_bytes -= self._size(self.series.pop(folder))
+        self.series[folder] = images
+        self.total_bytes += self._size(images)
+        # Always keep the newest series, even if it alone exceeds the budget
+        while self.total_bytes > self.max_bytes and len(self.series) > 1:
+            _, evicted = self.series.popitem(last=False)
+            self.total_bytes -= self._size(evicted)
+
+def make_reconstruction_pool(processes):
+    """Process pool for reconstruction into shared memory"""
+    # Forking from a QThread copies Qt and database locks held by other threads; start clean processes instead
+    return ProcessPoolExecutor(max_workers=processes, mp_context=multiprocessing.get_context("spawn"))
+
+class ReconstructionWorker(QThread):
+    """Background thread that reconstructs every raw file in a folder"""
+    # index, total, name, kspace, image, preview (a shared uint8 SharedVolume in process mode, else None)
+    file_done = pyqtSignal(int, int, str, object, object, object)
+    # With coil compression: scan index, scans, channel file paths, virtual k-space, combined image
+    scan_done = pyqtSignal(int, int, object, object, object)
+    file_failed = pyqtSignal(str, str)  # name, error message
+    progress = pyqtSignal(int, int, float, float)  # done, total, files/s, MB/s
+    batch_finished = pyqtSignal(int, int, bool, float)  # succeeded, failed, cancelled, elapsed s
+
+    def __init__(self, folder=None, files=None, processes=0, registry=None, virtual_coils=0, executor=None,
+                 parent=None):
+        super().__init__(parent)
+        # Either an explicit file list (e.g. from the raw catalog) or a folder to glob
+        self.folder = folder
+        self.files = files
+        # With processes > 0, files are reconstructed in a process pool into shared memory
+        self.processes = processes
+        self.registry = registry
+        # A long-lived pool owned by the caller; without one, a pool is started for this batch only
+        self.executor = executor
+        self.pool_broken = False
+        # With virtual_coils > 0, the channels of each scan are compressed and combined instead
+        self.virtual_coils = virtual_coils
+        self.shared_names = []
+        self.cancelled = False
+
+    def cancel(self):
+        """Request cancellation; the current file finishes first"""
+        self.cancelled = True
+
+    def run(self):
+        raw_files = [Path(f) for f in self.files] if self.files is not None else list_raw_files(self.folder)
+        self.total = len(raw_files)
+        self.succeeded = self.failed = 0
+        self.bytes_read = 0
+        self.start_time = time.perf_counter()
+
+        if self.virtual_coils > 0:
+            self.run_compressed(raw_files)
+        elif self.processes > 0 and self.registry is not None:
+            self.run_processes(raw_files)
+        else:
+            for index, raw_file in enumerate(raw_files):
+                if self.cancelled:
+                    break
+                try:
+                    kspace, image = reconstruct_raw_file(raw_file)
+                    self.file_succeeded(index, raw_file, kspace, image, None)
+                except Exception as e:
+                    self.failed += 1
+                    self.file_failed.emit(raw_file.name, str(e))
+                self.report_progress()
+
+        self.batch_finished.emit(self.succeeded, self.failed, self.cancelled, time.perf_counter() - self.start_time)
+
+    def run_processes(self, raw_files):
+        """Reconstruct in worker processes; results arrive as shared-memory descriptors"""
+        executor = self.executor or make_reconstruction_pool(self.processes)
+        futures = {executor.submit(reconstruct_to_shared, str(raw_file), os.getpid()): (index, raw_file)
+                   for index, raw_file in enumerate(raw_files)}
+        try:
+            for future in as_completed(futures):
+                index, raw_file = futures.pop(future)
+                try:
+                    volumes = self.adopt(future.result())
+                    self.file_succeeded(index, raw_file, volumes["kspace"].array,
+                                        volumes["image"].array, volumes["preview"])
+                except Exception as e:
+                    # A crashed worker process leaves the pool unusable for later batches
+                    self.pool_broken = self.pool_broken or isinstance(e, BrokenProcessPool)
+                    self.failed += 1
+                    self.file_failed.emit(raw_file.name, str(e))
+                self.report_progress()
+                if self.cancelled:
+                    break
+        finally:
+            if executor is self.executor:
+                # Leave the shared pool running; drop queued files and let running ones finish
+                for future in futures:
+                    future.cancel()
+                wait(futures)
+            else:
+                executor.shutdown(wait=True, cancel_futures=True)
+            # Files that were mid-flight when cancelled still produced segments; free them
+            for future in futures:
+                if future.done() and not future.cancelled() and future.exception() is None:
+                    for volume in self.adopt(future.result()).values():
+                        self.registry.release(volume.name)
+                        self.shared_names.remove(volume.name)
+
+    def run_compressed(self, raw_files):
+        """Reconstruct each multi-channel scan through coil compression, one scan at a time"""
+        scans = group_by_scan(raw_files)
+        grouped = {path for files in scans.values() for path in files}
+        # Files whose name carries no scan timestamp are reconstructed on their own
+        batches = [files for _, files in sorted(scans.items())] + [[path] for path in raw_files if path not in grouped]
+        for index, files in enumerate(batches):
+            if self.cancelled:
+                break
+            try:
+                if len(files) > 1:
+                    kspace, image, _ = reconstruct_compressed(files, self.virtual_coils)
+                else:
+                    kspace, image = reconstruct_raw_file(files[0])
+                self.bytes_read += sum(path.stat().st_size for path in files)
+                self.succeeded += len(files)
+                self.scan_done.emit(index, len(batches), [str(path) for path in files], kspace, image)
+            except Exception as e:
+                self.failed += len(files)
+                self.file_failed.emit(files[0].name, str(e))
+            self.report_progress()
+
+    def adopt(self, descriptors):
+        """Take ownership of the segments a worker process produced"""
+        volumes = {key: self.registry.adopt(descriptor) for key, descriptor in descriptors.items()}
+        self.shared_names.extend(volume.name for volume in volumes.values())
+        return volumes
+
+    def file_succeeded(self, index, raw_file, kspace, image, preview):
+        self.bytes_read += raw_file.stat().st_size
+        self.succeeded += 1
+        self.file_done.emit(index, self.total, raw_file.name, kspace, image, preview)
+
+    def report_progress(self):
+        done = self.succeeded + self.failed
+        elapsed = time.perf_counter() - self.start_time
+        files_per_sec = done / elapsed if elapsed > 0 else 0.0
+        mb_per_sec = self.bytes_read / 1e6 / elapsed if elapsed > 0 else 0.0
+        self.progress.emit(done, self.total, files_per_sec, mb_per_sec)
+
+class ConnectionWorker(QThread):
+    """Background thread that runs one hardware connection check"""
+    state_changed = pyqtSignal(str)
+    check_finished = pyqtSignal(int)  # return code of the check
+    check_failed = pyqtSignal(str)  # exception message
+
+    def __init__(self, check_connection, parent=None):
+        super().__init__(parent)
+        self.check_connection = check_connection
+
+    def run(self):
+        self.state_changed.emit("connecting")
+        try:
+            result = self.check_connection()
+        except Exception as e:
+            self.state_changed.emit("error")
+            self.check_failed.emit(str(e))
+            return
+        self.state_changed.emit("connected" if result == 0 else "failed")
+        self.check_finished.emit(result)
+
+class AnnotationExportWorker(QThread):
+    """Background thread that renders annotated slices to files in a thread pool"""
+    progress = pyqtSignal(int, int)  # done, total
+    export_finished = pyqtSignal(str, int, float)  # folder, images written, seconds
+    export_failed = pyqtSignal(str)  # error message
+
+    def __init__(self, items, folder, workers=None, parent=None):
+        """
+        Args:
+            items (list): (DICOM path, annotation dict or None) per slice, in order
+            folder (str): Output folder, created if needed
+            workers (int): Render threads; defaults to the CPU count
+        """
+        super().__init__(parent)
+        self.items = list(items)
+        self.folder = folder
+        self.workers = workers or max(1, os.cpu_count() or 1)
+        self.cancelled = False
 
-                    # Calculate the center point of this line (offset perpendicular to line direction)
-                    center_x = origin_x + offset * math.cos(perp_angle_rad)
-                    center_y = origin_y + offset * math.sin(perp_angle_rad)
+    def cancel(self):
+        self.cancelled = True
+
+    def run(self):
+        start = time.perf_counter()
+        try:
+            os.makedirs(self.folder, exist_ok=True)
+        except OSError as e:
+            self.export_failed.emit(str(e))
+            return
 
-                    # Calculate line endpoints using the specified line length
-                    half_length = line_length / 2
+        def render(index):
+            if self.cancelled:
+                return False
+            path, annotation = self.items[index]
+            render_annotated_image(path, annotation, os.path.join(self.folder, f"slice_{index + 1:04d}.png"))
+            return True
+
+        written, errors = 0, []
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="annotation-export") as pool:
+            futures = [pool.submit(render, index) for index in range(len(self.items))]
+            for done, future in enumerate(futures, start=1):
+                try:
+                    written += bool(future.result())
+                except Exception as e:
+                    errors.append(str(e))
+                self.progress.emit(done, len(futures))
+        if errors and not written:
+            self.export_failed.emit(errors[0])
+            return
+        self.export_finished.emit(self.folder, written, time.perf_counter() - start)
 
-                    # Start and end points along the line direction
-                    x1 = center_x - half_length * math.cos(angle_rad)
-                    y1 = center_y - half_length * math.sin(angle_rad)
-                    x2 = center_x + half_length * math.cos(angle_rad)
-                    y2 = center_y + half_length * math.sin(angle_rad)
+class QAWorker(QThread):
+    """Background thread that runs phantom QA on the latest scan of a folder"""
+    qa_finished = pyqtSignal(object, object)  # raw files, result dict
+    qa_failed = pyqtSignal(str)  # error message
 
-                    # Translate to pixmap coordinates
-                    x1 += pixmap_x
-                    y1 += pixmap_y
-                    x2 += pixmap_x
-                    y2 += pixmap_y
+    def __init__(self, folder, catalog, store, parent=None):
+        super().__init__(parent)
+        self.folder = folder
+        self.catalog = catalog
+        self.store = store
 
-                # Draw the line
-                painter.drawLine(QPointF(x1, y1), QPointF(x2, y2))
+    def run(self):
+        try:
+            self.catalog.sync_directory(self.folder)
+            files = [Path(row["path"]) for row in self.catalog.latest_scan(self.folder)]
+            if not files:
+                # Names without a timestamp cannot be grouped into scans
+                files = list_raw_files(self.folder)
+            if not files:
+                raise RuntimeError(f"No raw files in {self.folder}")
+            self.qa_finished.emit(files, run_phantom_qa(files, self.store))
+        except Exception as e:
+            self.qa_failed.emit(str(e))
 
 class FrontPage(QWidget):
     """Front page with 4 main buttons"""
-    def __init__(self):
+    CONNECTION_TIMEOUT = 15.0  # seconds
+    session_state_changed = pyqtSignal(str)
+
+    def __init__(self, check_connection=None, connection_timeout=None):
         super().__init__()
+        # Keep the spectrometer initialized between checks
+        self.session = None
+        self.simulated = False
+        if check_connection is None:
+            # Health-monitor callbacks arrive on a background thread; the signal queues them to the GUI
+            self.session = SpectrometerSession(load_backend(), on_state_change=self.session_state_changed.emit)
+            check_connection = self.session.connect
+            self.simulated = self.session.module.simulated
+
+        # Connection check callable and its timeout; injectable for testing
+        self.check_connection = check_connection
+        self.connection_timeout = connection_timeout if connection_timeout is not None else self.CONNECTION_TIMEOUT
+        # Backups, ANALYZE and vacuum of the patient database run on their own thread and connection
+        self.maintenance = MaintenanceService()
+        self.maintenance.start()
         self.setWindowTitle("MRI DICOM System")
         self.setFixedSize(450, 100)  # Compact size to fit title bar and buttons
         # Center on screen
@@ -302,6 +1231,14 @@ class FrontPage(QWidget):
             }
         """)
         close_btn.clicked.connect(self.close)
+        if self.simulated:
+            # No scanner library was found (or the simulator was chosen); say so before anyone scans
+            self.setWindowTitle("MRI DICOM System (SIMULATOR)")
+            simulator_label = QLabel("SIMULATOR - no scanner connected")
+            simulator_label.setStyleSheet("color: #ff9900; font-size: 10pt; font-weight: bold; padding-left: 8px;")
+            simulator_label.setToolTip("Scans produce synthetic phantom data, not patient images.\n"
+                                       "Install mricpp or unset MRIQT_HARDWARE_BACKEND to use the scanner.")
+            title_bar.addWidget(simulator_label)
         title_bar.addStretch()
         title_bar.addWidget(close_btn)
         
@@ -463,8 +1400,18 @@ class FrontPage(QWidget):
 
         self.setLayout(layout)
 
-        # Reference to operation window
+        # Reference to operation, checking and viewing windows
         self.operation_window = None
+        self.checking_window = None
+        self.viewing_window = None
+
+        # Connection check state
+        self.connection_worker = None
+        self.abandoned_connection_workers = []
+        self.connection_timer = QTimer()
+        self.connection_timer.setSingleShot(True)
+        self.connection_timer.timeout.connect(self.connection_timed_out)
+        self.session_state_changed.connect(self.set_connection_state)
 
         # For window dragging
         self._drag_pos = None
@@ -480,33 +1427,84 @@ class FrontPage(QWidget):
     def mouseReleaseEvent(self, event):
         self._drag_pos = None
 
-    def open_connection(self):
-        """Open connection interface and check connection status"""
-        # Show connecting icon (yellow) while checking
-        if os.path.exists(self.connection_icon_connecting):
-            self.connection_btn.setIcon(QIcon(self.connection_icon_connecting))
-        QApplication.processEvents()  # Update UI immediately
+    def closeEvent(self, event):
+        """Release the spectrometer and stop database maintenance when the application closes"""
+        if self.session is not None:
+            self.session.close()
+        self.maintenance.stop()
+        event.accept()
 
-        try:
-            # Call checkConnection function
-            result = checkConnection()
-
-            if result == 0:
-                # Success - show connected icon (green)
-                if os.path.exists(self.connection_icon_connected):
-                    self.connection_btn.setIcon(QIcon(self.connection_icon_connected))
-                self.show_auto_close_message("Connection", f"Connection successful!\nReturn code: {result}")
-            else:
-                # Failure - revert to default disconnected icon
-                if os.path.exists(self.connection_icon_default):
-                    self.connection_btn.setIcon(QIcon(self.connection_icon_default))
-                self.show_auto_close_message("Connection", f"Connection failed!\nReturn code: {result}")
+    def open_connection(self):
+        """Start a connection check off the GUI thread, or cancel the running one"""
+        if self.connection_worker is not None:
+            self.abandon_connection_check()
+            self.set_connection_state("cancelled")
+            self.show_auto_close_message("Connection", "Connection check cancelled.")
+            return
 
-        except Exception as e:
-            # Error - revert to default disconnected icon
-            if os.path.exists(self.connection_icon_default):
-                self.connection_btn.setIcon(QIcon(self.connection_icon_default))
-            self.show_auto_close_message("Connection Error", f"Error during connection:\n{str(e)}")
+        self.connection_worker = ConnectionWorker(self.check_connection)
+        self.connection_worker.state_changed.connect(self.set_connection_state)
+        self.connection_worker.check_finished.connect(self.connection_check_finished)
+        self.connection_worker.check_failed.connect(self.connection_check_failed)
+        self.connection_worker.start()
+        self.connection_timer.start(int(self.connection_timeout * 1000))
+
+    def abandon_connection_check(self):
+        """Stop listening to the running check; the thread is kept alive until it returns"""
+        self.connection_timer.stop()
+        worker = self.connection_worker
+        self.connection_worker = None
+        if worker is None:
+            return
+        worker.state_changed.disconnect(self.set_connection_state)
+        worker.check_finished.disconnect(self.connection_check_finished)
+        worker.check_failed.disconnect(self.connection_check_failed)
+        # A native Init call cannot be interrupted, so hold a reference until it exits
+        self.abandoned_connection_workers.append(worker)
+        worker.finished.connect(lambda: self.abandoned_connection_workers.remove(worker))
+
+    def set_connection_state(self, state):
+        """Update the connection button icon for a connection state"""
+        icons = {
+            "connecting": self.connection_icon_connecting,
+            "connected": self.connection_icon_connected,
+        }
+        # Every other state (failed, error, timeout, cancelled) reverts to disconnected
+        icon_path = icons.get(state, self.connection_icon_default)
+        if os.path.exists(icon_path):
+            self.connection_btn.setIcon(QIcon(icon_path))
+        self.connection_btn.setToolTip(f"Connection ({state})")
+
+    def connection_check_finished(self, result):
+        """Report the return code of a completed connection check"""
+        self.connection_timer.stop()
+        self.connection_worker.wait()
+        self.connection_worker = None
+        if result == 0 and self.simulated:
+            self.show_auto_close_message("Connection", "Connected to the SIMULATOR, not a scanner.\n"
+                                                       "Scans will produce synthetic data.")
+        elif result == 0:
+            self.show_auto_close_message("Connection", f"Connection successful!\nReturn code: {result}")
+        else:
+            self.show_auto_close_message("Connection", f"Connection failed!\nReturn code: {result}")
+
+    def connection_check_failed(self, error):
+        """Report an exception raised by the connection check"""
+        self.connection_timer.stop()
+        self.connection_worker.wait()
+        self.connection_worker = None
+        self.show_auto_close_message("Connection Error", f"Error during connection:\n{error}")
+
+    def connection_timed_out(self):
+        """Give up on a connection check that exceeded the timeout"""
+        if self.connection_worker is None:
+            return
+        self.abandon_connection_check()
+        self.set_connection_state("timeout")
+        self.show_auto_close_message(
+            "Connection",
+            f"Connection timed out after {self.connection_timeout:.0f} s"
+        )
 
     def show_auto_close_message(self, title, text, duration=5000):
         """Show a message dialog that auto-closes after duration (ms)"""
@@ -537,13 +1535,25 @@ class FrontPage(QWidget):
 
     def open_checking(self):
         """Open checking interface"""
-        self.show_auto_close_message("Checking", "Checking module - Coming soon!")
+        if self.checking_window is None:
+            self.checking_window = CheckingWindow(parent=self)
+        self.checking_window.show()
+        self.hide()
 
     def open_viewing(self):
         """Open viewing interface"""
-        self.show_auto_close_message("Viewing", "Viewing module - Coming soon!")
+        if self.viewing_window is None:
+            self.viewing_window = ViewingWindow(parent=self)
+        self.viewing_window.show()
+        self.hide()
 
 class ImageWithLine(QWidget):
+    # Acquisition callbacks arrive on background threads; signals queue them to the GUI
+    acquisition_progress = pyqtSignal(int, int)  # current scan, total scans
+    acquisition_image_ready = pyqtSignal(str, object, object)  # raw file, kspace, image
+    acquisition_error = pyqtSignal(str, str)  # raw file, error message
+    acquisition_finished = pyqtSignal(str)  # completed, aborted or error message
+
     def __init__(self, parent=None):
         super().__init__()
         self.parent_window = parent
@@ -630,12 +1640,34 @@ class ImageWithLine(QWidget):
         # Initialize variables
         self.dicom_files = []
         self.current_index = 0
-        self.pixmap = None
         self.current_folder_path = None
 
+        # Annotations of the loaded series, once it has been saved as a scan
+        self.scan_id = None
+        self.image_ids = {}  # source file path -> scan_images id
+        self.annotations = {}  # scan_images id -> annotation dict
+        self.annotation_export_worker = None
+        self.processed_data_folder = "Processed Data"
+        # Control changes are stored once they settle, on the slice they were made on
+        self.pending_annotation_image_id = None
+        self.annotation_save_timer = QTimer(self)
+        self.annotation_save_timer.setSingleShot(True)
+        self.annotation_save_timer.setInterval(500)
+        self.annotation_save_timer.timeout.connect(self.save_current_annotation)
+
         # Initialize database
         self.init_database()
 
+        # Catalog raw data folders so reconstruction looks files up instead of walking directories
+        self.raw_data_folder = "Raw Data"
+        self.raw_catalog = RawCatalog()
+        raw_folders = [self.raw_data_folder]
+        session = getattr(self.parent_window, "session", None)
+        if session is not None:
+            raw_folders.append(session.output_path)
+        self.raw_watcher = RawDirectoryWatcher(self.raw_catalog, raw_folders)
+        self.raw_watcher.start()
+
         # Create main layout
         main_layout = QVBoxLayout()
         main_layout.setContentsMargins(5, 5, 5, 5)  # Reduce margins
@@ -934,11 +1966,58 @@ class ImageWithLine(QWidget):
         self.slider_label.setAlignment(Qt.AlignCenter)
         self.slider_label.setStyleSheet("font-size: 10pt; padding: 0px;")
 
+        # Thumbnail strip showing every slice of the loaded series
+        self.thumbnail_strip = QListWidget()
+        self.thumbnail_strip.setViewMode(QListView.IconMode)
+        self.thumbnail_strip.setFlow(QListView.LeftToRight)
+        self.thumbnail_strip.setWrapping(False)
+        self.thumbnail_strip.setMovement(QListView.Static)
+        self.thumbnail_strip.setUniformItemSizes(True)
+        self.thumbnail_strip.setIconSize(QSize(64, 64))
+        self.thumbnail_strip.setFixedHeight(96)
+        self.thumbnail_strip.setHorizontalScrollMode(QListView.ScrollPerPixel)
+        self.thumbnail_strip.setStyleSheet("border: 1px solid #555555; background-color: #1a1a1a; font-size: 8pt;")
+        self.thumbnail_strip.currentRowChanged.connect(self.thumbnail_selected)
+        self.thumbnail_worker = None
+
+        # Cine playback controls
+        cine_layout = QHBoxLayout()
+        cine_layout.setSpacing(5)
+
+        self.play_button = QPushButton("Play")
+        self.play_button.setEnabled(False)
+        self.play_button.clicked.connect(self.toggle_playback)
+        self.play_button.setStyleSheet("padding: 3px; font-size: 10pt;")
+        cine_layout.addWidget(self.play_button)
+
+        self.fps_spinbox = QSpinBox()
+        self.fps_spinbox.setRange(1, 60)
+        self.fps_spinbox.setValue(10)
+        self.fps_spinbox.setSuffix(" fps")
+        self.fps_spinbox.valueChanged.connect(self.fps_changed)
+        self.fps_spinbox.setStyleSheet("padding: 2px; font-size: 10pt;")
+        cine_layout.addWidget(self.fps_spinbox)
+
+        self.fps_label = QLabel("Achieved: - fps")
+        self.fps_label.setStyleSheet("font-size: 10pt; padding: 0px;")
+        cine_layout.addWidget(self.fps_label)
+        cine_layout.addStretch()
+
+        # Playback state
+        self.cine_timer = QTimer()
+        self.cine_timer.setTimerType(Qt.PreciseTimer)
+        self.cine_timer.timeout.connect(self.advance_cine_frame)
+        self.frame_prefetcher = None
+        self.frame_times = deque(maxlen=30)
+        self.stalled_ticks = 0
+
         center_layout.addWidget(self.label)
         center_layout.addWidget(self.load_button)
         center_layout.addWidget(self.save_scan_button)
         center_layout.addWidget(self.slider_label)
         center_layout.addWidget(self.slider)
+        center_layout.addLayout(cine_layout)
+        center_layout.addWidget(self.thumbnail_strip)
 
         # Right side - Line parameters
         right_layout = QVBoxLayout()
@@ -1059,6 +2138,38 @@ class ImageWithLine(QWidget):
 
         params_vlayout.addLayout(form_layout)
 
+        # Annotation buttons; they need the series saved as a scan
+        self.apply_all_btn = QPushButton("Apply Lines to All Slices")
+        self.apply_all_btn.clicked.connect(self.apply_annotation_to_all)
+        self.apply_all_btn.setEnabled(False)
+        params_vlayout.addWidget(self.apply_all_btn)
+
+        self.export_annotated_btn = QPushButton("Export Annotated Series")
+        self.export_annotated_btn.clicked.connect(self.export_annotated_series)
+        self.export_annotated_btn.setEnabled(False)
+        params_vlayout.addWidget(self.export_annotated_btn)
+
+        self.annotation_status = QLabel("")
+        self.annotation_status.setWordWrap(True)
+        self.annotation_status.setStyleSheet("font-size: 9pt;")
+        params_vlayout.addWidget(self.annotation_status)
+
+        # Coil compression for multi-channel scans; 0 reconstructs every channel file on its own
+        coil_layout = QHBoxLayout()
+        coil_label = QLabel("Virtual coils:")
+        coil_label.setStyleSheet("font-size: 10pt;")
+        coil_layout.addWidget(coil_label)
+        self.virtual_coils_spinbox = QSpinBox()
+        self.virtual_coils_spinbox.setRange(0, 32)
+        self.virtual_coils_spinbox.setValue(0)
+        self.virtual_coils_spinbox.setSpecialValueText("Off")
+        self.virtual_coils_spinbox.setToolTip("Pre-whiten and compress each scan's channels to this many "
+                                              "virtual coils, then combine them")
+        self.virtual_coils_spinbox.setStyleSheet("padding: 2px; font-size: 10pt;")
+        coil_layout.addWidget(self.virtual_coils_spinbox)
+        coil_layout.addStretch()
+        params_vlayout.addLayout(coil_layout)
+
         # Post Processing button
         self.post_processing_btn = QPushButton("Post Processing")
         self.post_processing_btn.clicked.connect(self.post_processing)
@@ -1079,6 +2190,66 @@ class ImageWithLine(QWidget):
             }
         """)
         params_vlayout.addWidget(self.post_processing_btn)
+        self.apply_all_btn.setStyleSheet(self.post_processing_btn.styleSheet())
+        self.export_annotated_btn.setStyleSheet(self.post_processing_btn.styleSheet())
+
+        # Post processing progress
+        self.post_processing_progress = QProgressBar()
+        self.post_processing_progress.setTextVisible(True)
+        self.post_processing_progress.setStyleSheet("font-size: 9pt;")
+        self.post_processing_progress.hide()
+        params_vlayout.addWidget(self.post_processing_progress)
+
+        self.post_processing_status = QLabel("")
+        self.post_processing_status.setWordWrap(True)
+        self.post_processing_status.setStyleSheet("font-size: 9pt;")
+        params_vlayout.addWidget(self.post_processing_status)
+
+        # Reconstructions become a DICOM series of a patient
+        self.save_dicom_btn = QPushButton("Save Reconstruction as DICOM")
+        self.save_dicom_btn.clicked.connect(self.save_reconstruction_as_dicom)
+        self.save_dicom_btn.setEnabled(False)
+        self.save_dicom_btn.setStyleSheet(self.post_processing_btn.styleSheet())
+        params_vlayout.addWidget(self.save_dicom_btn)
+
+        self.reconstruction_worker = None
+        self.reconstruction_results = []
+        # Raw files behind the results, so a series can be written from all their slices and channels
+        self.reconstructed_files = []
+        # Virtual coils the results were reconstructed with, so the DICOM series matches the preview
+        self.reconstruction_virtual_coils = 0
+        self.reconstruction_errors = []
+
+        # Reconstruction processes hand results over in shared memory
+        cleanup_stale_segments()
+        self.shared_volumes = SharedVolumeRegistry()
+        self.reconstruction_processes = max(1, min(4, (os.cpu_count() or 2) - 1))
+        # One pool for the window's lifetime, so each batch does not pay for spawning interpreters again
+        self.reconstruction_executor = None
+        self.reconstruction_shared_names = []
+        self.displayed_shared_name = None
+
+        # Acquisition button: runs a scan and reconstructs files as they land
+        self.acquisition_btn = QPushButton("Start Scan")
+        self.acquisition_btn.clicked.connect(self.toggle_acquisition)
+        self.acquisition_btn.setStyleSheet(self.post_processing_btn.styleSheet())
+        params_vlayout.addWidget(self.acquisition_btn)
+
+        self.acquisition_status = QLabel("")
+        self.acquisition_status.setWordWrap(True)
+        self.acquisition_status.setStyleSheet("font-size: 9pt;")
+        params_vlayout.addWidget(self.acquisition_status)
+
+        self.acquisition = None
+        self.acquisition_pipeline = None
+        self.acquisition_scan_text = ""
+        self.acquisition_simulated = False
+        self.acquisition_stats_timer = QTimer()
+        self.acquisition_stats_timer.timeout.connect(self.update_acquisition_stats)
+        self.acquisition_progress.connect(self.acquisition_progress_changed)
+        self.acquisition_image_ready.connect(self.acquisition_file_done)
+        self.acquisition_error.connect(self.reconstruction_file_failed)
+        self.acquisition_finished.connect(self.acquisition_done)
 
         # Add form layout to container
         line_container_layout.addLayout(params_vlayout)
@@ -1111,37 +2282,14 @@ class ImageWithLine(QWidget):
         self._drag_pos = None
 
     def init_database(self):
-        """Initialize SQLite database for patient information"""
-        self.conn = sqlite3.connect('patient_data.db')
-        self.cursor = self.conn.cursor()
-
-        # Create patients table if it doesn't exist
-        self.cursor.execute('''
-            CREATE TABLE IF NOT EXISTS patients (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                name TEXT NOT NULL,
-                ic TEXT UNIQUE NOT NULL,
-                dob TEXT NOT NULL,
-                sex TEXT NOT NULL,
-                height REAL,
-                weight REAL,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-
-        # Create MRI scans table to store image paths
-        self.cursor.execute('''
-            CREATE TABLE IF NOT EXISTS mri_scans (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                patient_id INTEGER NOT NULL,
-                scan_date TEXT NOT NULL,
-                folder_path TEXT NOT NULL,
-                notes TEXT,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (patient_id) REFERENCES patients(id)
-            )
-        ''')
-        self.conn.commit()
+        """Open the shared patient database; writes are queued, reads run off the GUI thread"""
+        self.db = get_database()
+        self.db_results = DatabaseResults(self)
+        self.scan_save_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="scan-save")
+        # Saved scans are copied into the shared content-addressed store and re-checked in the background
+        self.scan_store = ScanStore()
+        self.store_verifier = StoreVerifier(self.db, self.scan_store)
+        self.store_verifier.start()
 
     def save_patient_info(self):
         """Save patient information to database"""
@@ -1166,21 +2314,22 @@ class ImageWithLine(QWidget):
             QMessageBox.warning(self, "Validation Error", "Height and Weight must be valid numbers!")
             return
 
-        try:
-            # Insert patient data
-            self.cursor.execute('''
-                INSERT INTO patients (name, ic, dob, sex, height, weight)
-                VALUES (?, ?, ?, ?, ?, ?)
-            ''', (name, ic, dob, sex, height_val, weight_val))
-            self.conn.commit()
+        # Insert patient data on the writer thread
+        future = self.db.write('''
+            INSERT INTO patients (name, ic, dob, sex, height, weight)
+            VALUES (?, ?, ?, ?, ?, ?)
+        ''', (name, ic, dob, sex, height_val, weight_val))
+        self.db_results.watch(future, self.patient_saved, self.patient_save_failed)
 
-            QMessageBox.information(self, "Success", f"Patient information saved successfully!\nPatient ID: {self.cursor.lastrowid}")
-            self.clear_patient_form()
+    def patient_saved(self, patient_id):
+        QMessageBox.information(self, "Success", f"Patient information saved successfully!\nPatient ID: {patient_id}")
+        self.clear_patient_form()
 
-        except sqlite3.IntegrityError:
+    def patient_save_failed(self, error):
+        if isinstance(error, sqlite3.IntegrityError):
             QMessageBox.warning(self, "Error", "A patient with this IC number already exists!")
-        except Exception as e:
-            QMessageBox.critical(self, "Error", f"Failed to save patient information:\n{str(e)}")
+        else:
+            QMessageBox.critical(self, "Error", f"Failed to save patient information:\n{str(error)}")
 
     def clear_patient_form(self):
         """Clear all patient form fields"""
@@ -1193,26 +2342,21 @@ class ImageWithLine(QWidget):
 
     def view_database(self):
         """Open a dialog to view all patient records"""
-        try:
-            # Query all patients
-            self.cursor.execute('''
-                SELECT id, name, ic, dob, sex, height, weight, created_at
-                FROM patients
-                ORDER BY id DESC
-            ''')
-            records = self.cursor.fetchall()
-
-            if not records:
-                QMessageBox.information(self, "Database", "No patient records found in the database.")
-                return
-
-            # Create and show dialog
-            dialog = PatientDatabaseDialog(self)
-            dialog.load_data(records)
-            dialog.exec_()
+        # Rows are fetched a page at a time as the table scrolls
+        model = PatientTableModel(self.db, self.db_results)
+        model.first_page_loaded.connect(lambda: self.show_database_dialog(model))
+        model.load_failed.connect(lambda error: QMessageBox.critical(
+            self, "Error", f"Failed to retrieve patient records:\n{error}"))
+        model.fetchMore()
+
+    def show_database_dialog(self, model):
+        if model.rowCount() == 0:
+            QMessageBox.information(self, "Database", "No patient records found in the database.")
+            return
 
-        except Exception as e:
-            QMessageBox.critical(self, "Error", f"Failed to retrieve patient records:\n{str(e)}")
+        # Create and show dialog
+        dialog = PatientDatabaseDialog(model, self)
+        dialog.exec_()
 
     def toggle_maximize(self):
         """Toggle between maximized and normal window state"""
@@ -1223,27 +2367,51 @@ class ImageWithLine(QWidget):
 
     def go_back(self):
         """Return to front page"""
+        self.stop_playback()
         if self.parent_window:
             self.parent_window.show()
         self.hide()
 
     def closeEvent(self, event):
         """Close database connection when application closes"""
-        if hasattr(self, 'conn'):
-            self.conn.close()
+        self.stop_playback()
+        self.stop_thumbnail_worker()
+        if self.reconstruction_worker is not None:
+            self.reconstruction_worker.cancel()
+            self.reconstruction_worker.wait()
+        if self.reconstruction_executor is not None:
+            self.reconstruction_executor.shutdown(wait=True, cancel_futures=True)
+        if self.acquisition is not None:
+            self.acquisition.abort()
+        if self.acquisition_pipeline is not None:
+            # Joining the workers here would hold the GUI thread until reconstruction finished
+            self.acquisition_pipeline.cancel()
+        self.raw_watcher.stop()
+        self.raw_catalog.close()
+        self.flush_pending_annotation()
+        if self.annotation_export_worker is not None:
+            self.annotation_export_worker.cancel()
+            self.annotation_export_worker.wait()
+        # Queued writes must land before the shared database is closed at exit
+        self.scan_save_pool.shutdown(wait=True)
+        self.store_verifier.stop()
+        self.db.flush()
         event.accept()
 
     def load_images(self):
         """Load DICOM images from a directory"""
         folder_path = QFileDialog.getExistingDirectory(self, "Select DICOM Images Folder")
+        self.open_folder(folder_path)
 
+    def open_folder(self, folder_path):
+        """Show the DICOM series in a folder"""
         if folder_path:
+            self.stop_playback()
+
             # Get all DICOM files from the folder
-            self.dicom_files = []
             self.current_folder_path = folder_path
-            for file in sorted(os.listdir(folder_path)):
-                if file.endswith('.dcm'):
-                    self.dicom_files.append(os.path.join(folder_path, file))
+            self.dicom_files = list_dicom_files(folder_path)
+            self.load_scan_annotations()
 
             if self.dicom_files:
                 self.slider.setEnabled(True)
@@ -1252,153 +2420,1127 @@ class ImageWithLine(QWidget):
                 self.slider.setValue(0)
                 self.display_image(0)
                 self.save_scan_button.setEnabled(True)
+                self.play_button.setEnabled(len(self.dicom_files) > 1)
             else:
                 self.label.setText("No DICOM files found in selected folder")
                 self.save_scan_button.setEnabled(False)
+                self.play_button.setEnabled(False)
+
+            self.load_thumbnails()
+
+    def load_thumbnails(self):
+        """Fill the thumbnail strip for the loaded series in the background"""
+        self.stop_thumbnail_worker()
+
+        self.thumbnail_strip.blockSignals(True)
+        self.thumbnail_strip.clear()
+        placeholder = QPixmap(THUMBNAIL_SIZE, THUMBNAIL_SIZE)
+        placeholder.fill(QColor(40, 40, 40))
+        for index in range(len(self.dicom_files)):
+            self.thumbnail_strip.addItem(QListWidgetItem(QIcon(placeholder), str(index + 1)))
+        self.thumbnail_strip.setCurrentRow(self.current_index if self.dicom_files else -1)
+        self.thumbnail_strip.blockSignals(False)
+
+        if self.dicom_files:
+            self.thumbnail_worker = ThumbnailWorker(self.dicom_files)
+            self.thumbnail_worker.thumbnail_ready.connect(self.set_thumbnail)
+            self.thumbnail_worker.start()
+
+    def stop_thumbnail_worker(self):
+        """Cancel any running thumbnail worker"""
+        if self.thumbnail_worker is not None:
+            self.thumbnail_worker.thumbnail_ready.disconnect(self.set_thumbnail)
+            self.thumbnail_worker.cancel()
+            self.thumbnail_worker.wait()
+            self.thumbnail_worker = None
+
+    def set_thumbnail(self, index, q_image):
+        """Replace the placeholder icon of one slice with its thumbnail"""
+        item = self.thumbnail_strip.item(index)
+        if item is not None:
+            item.setIcon(QIcon(QPixmap.fromImage(q_image)))
+
+    def thumbnail_selected(self, row):
+        """Jump to the slice picked in the thumbnail strip"""
+        if 0 <= row < len(self.dicom_files) and row != self.slider.value():
+            self.slider.setValue(row)
 
     def display_image(self, index):
         """Display the DICOM image at the given index"""
         if 0 <= index < len(self.dicom_files):
             try:
-                # Read DICOM file
-                dicom_data = pydicom.dcmread(self.dicom_files[index])
-
-                # Get pixel array
-                pixel_array = dicom_data.pixel_array
+                # Read DICOM file and convert to QImage
+                q_image = dicom_to_qimage(self.dicom_files[index])
+                self.show_frame(index, q_image)
 
-                # Normalize to 0-255 range
-                pixel_array = pixel_array.astype(np.float32)
-                pixel_array = (pixel_array - pixel_array.min()) / (pixel_array.max() - pixel_array.min()) * 255
-                pixel_array = pixel_array.astype(np.uint8)
+            except Exception as e:
+                self.label.setText(f"Error loading image: {str(e)}")
 
-                # Convert to QImage
-                height, width = pixel_array.shape
-                bytes_per_line = width
-                q_image = QImage(pixel_array.data, width, height, bytes_per_line, QImage.Format_Grayscale8)
+    def show_frame(self, index, frame):
+        """Show an already decoded frame and update the slice indicator"""
+        # An edit still waiting to be saved belongs to the slice being left
+        self.flush_pending_annotation()
+        # A QImage, or a pyramid the prefetcher already built
+        self.label.set_image(frame)
+        self.hold_displayed_volume(None)
 
-                # Convert to QPixmap
-                self.pixmap = QPixmap.fromImage(q_image)
-                self.label.setPixmap(self.pixmap)
+        # Update label
+        self.slider_label.setText(f"Image: {index + 1} / {len(self.dicom_files)}")
+        self.current_index = index
+        self.show_stored_annotation(index)
 
-                # Update label
-                self.slider_label.setText(f"Image: {index + 1} / {len(self.dicom_files)}")
-                self.current_index = index
+        # Keep the thumbnail strip in sync without re-triggering navigation
+        self.thumbnail_strip.blockSignals(True)
+        self.thumbnail_strip.setCurrentRow(index)
+        self.thumbnail_strip.blockSignals(False)
 
-                # Trigger repaint to draw the line
-                self.update()
-
-            except Exception as e:
-                self.label.setText(f"Error loading image: {str(e)}")
+        # Trigger repaint to draw the line
+        self.update()
 
     def slider_changed(self, value):
         """Handle slider value change"""
+        if self.cine_timer.isActive():
+            # Scrubbing during playback moves the playhead instead of decoding here
+            self.current_index = value
+            self.frame_prefetcher.set_playhead(value)
+            return
         self.display_image(value)
 
+    def toggle_playback(self):
+        """Start or stop cine playback of the loaded series"""
+        if self.cine_timer.isActive():
+            self.stop_playback()
+            return
+        if len(self.dicom_files) < 2:
+            return
+
+        # Start filling the ring buffer ahead of the current slice
+        self.frame_prefetcher = FramePrefetcher(self.dicom_files, capacity=32)
+        self.frame_prefetcher.set_playhead(self.current_index)
+        self.frame_prefetcher.start()
+
+        self.frame_times.clear()
+        self.stalled_ticks = 0
+        self.cine_timer.start(int(1000 / self.fps_spinbox.value()))
+        self.play_button.setText("Stop")
+
+    def stop_playback(self):
+        """Stop cine playback and release the prefetch thread"""
+        self.cine_timer.stop()
+        if self.frame_prefetcher is not None:
+            self.frame_prefetcher.stop()
+            self.frame_prefetcher = None
+        self.play_button.setText("Play")
+
+    def fps_changed(self, value):
+        """Apply a new target frame rate to running playback"""
+        if self.cine_timer.isActive():
+            self.frame_times.clear()
+            self.cine_timer.setInterval(int(1000 / value))
+
+    def advance_cine_frame(self):
+        """Show the next buffered frame; stall if the decoder has not caught up"""
+        next_index = (self.current_index + 1) % len(self.dicom_files)
+        frame = self.frame_prefetcher.get_frame(next_index)
+
+        if frame is None:
+            # The ring buffer ran dry: disk or decoder is slower than the target rate
+            self.stalled_ticks += 1
+        else:
+            if not frame.levels[0].isNull():
+                self.show_frame(next_index, frame)
+            else:
+                self.current_index = next_index
+            self.slider.blockSignals(True)
+            self.slider.setValue(next_index)
+            self.slider.blockSignals(False)
+            self.frame_prefetcher.set_playhead(next_index)
+            self.frame_times.append(time.perf_counter())
+
+        self.update_fps_label()
+
+    def update_fps_label(self):
+        """Report achieved versus target frame rate and ring buffer fill"""
+        target = self.fps_spinbox.value()
+        if len(self.frame_times) > 1:
+            elapsed = self.frame_times[-1] - self.frame_times[0]
+            achieved = (len(self.frame_times) - 1) / elapsed if elapsed > 0 else 0.0
+            achieved_text = f"{achieved:.1f}"
+        else:
+            achieved_text = "-"
+        buffered = self.frame_prefetcher.buffered_count()
+        self.fps_label.setText(
+            f"Achieved: {achieved_text} / {target} fps  "
+            f"Buffer: {buffered}/{self.frame_prefetcher.capacity}  "
+            f"Stalls: {self.stalled_ticks}"
+        )
+
     def angle_slider_changed(self, value):
         """Handle angle slider value change"""
         angle = value / 10.0  # Convert from tenths to degrees
         self.angle_label.setText(f"Angle: {angle:.1f}°")
-        self.label.update()
+        self.update_lines()
 
     def update_lines(self):
         """Update the display when line parameters change"""
         self.label.update()
+        image_id = self.current_image_id()
+        if image_id is not None:
+            self.pending_annotation_image_id = image_id
+            self.annotation_save_timer.start()
+
+    def current_annotation(self):
+        """Line parameters as set in the controls"""
+        return dict(
+            angle=self.degree_slider.value() / 10.0,  # Convert from tenths to degrees
+            spacing=self.thickness_spinbox.value(),
+            num_lines=self.num_lines_spinbox.value(),
+            origin_x=self.origin_x_spinbox.value(),
+            origin_y=self.origin_y_spinbox.value(),
+            length=self.line_length_spinbox.value(),
+        )
+
+    def annotation_controls(self):
+        return [self.degree_slider, self.thickness_spinbox, self.num_lines_spinbox,
+                self.origin_x_spinbox, self.origin_y_spinbox, self.line_length_spinbox]
+
+    def current_image_id(self):
+        """scan_images id of the slice on screen, if the series is a saved scan"""
+        if not self.image_ids or not 0 <= self.current_index < len(self.dicom_files):
+            return None
+        return self.image_ids.get(os.path.abspath(self.dicom_files[self.current_index]))
+
+    def load_scan_annotations(self):
+        """Look up the saved scan of the loaded folder and its annotations off the GUI thread"""
+        self.flush_pending_annotation()
+        self.scan_id, self.image_ids, self.annotations = None, {}, {}
+        self.apply_all_btn.setEnabled(False)
+        self.export_annotated_btn.setEnabled(False)
+        folder_path = self.current_folder_path
+
+        def load(conn):
+            scan_id = find_saved_scan(conn, folder_path)
+            return (folder_path, scan_id) + (scan_annotations(conn, scan_id) if scan_id is not None else ({}, {}))
+
+        self.db_results.watch(self.db.submit_read(load), self.set_scan_annotations,
+                              lambda error: print(f"Error loading annotations: {str(error)}"))
+
+    def set_scan_annotations(self, result):
+        folder_path, scan_id, image_ids, annotations = result
+        if folder_path != self.current_folder_path:
+            # Another folder was loaded while the query ran
+            return
+        self.scan_id, self.image_ids, self.annotations = scan_id, image_ids, annotations
+        saved = scan_id is not None
+        self.apply_all_btn.setEnabled(saved)
+        self.export_annotated_btn.setEnabled(saved and self.annotation_export_worker is None)
+        self.annotation_status.setText(f"Scan {scan_id}: {len(annotations)} annotated slices" if saved
+                                       else "Save the scan to keep annotations")
+        self.show_stored_annotation(self.current_index)
+
+    def show_stored_annotation(self, index):
+        """Put a slice's stored annotation into the controls without saving it again"""
+        if not self.image_ids or not 0 <= index < len(self.dicom_files):
+            return
+        annotation = self.annotations.get(self.image_ids.get(os.path.abspath(self.dicom_files[index])))
+        if annotation is None or annotation == self.current_annotation():
+            return
+        for control in self.annotation_controls():
+            control.blockSignals(True)
+        self.degree_slider.setValue(int(round(annotation["angle"] * 10)))
+        self.thickness_spinbox.setValue(int(annotation["spacing"]))
+        self.num_lines_spinbox.setValue(int(annotation["num_lines"]))
+        self.origin_x_spinbox.setValue(int(annotation["origin_x"]))
+        self.origin_y_spinbox.setValue(int(annotation["origin_y"]))
+        self.line_length_spinbox.setValue(int(annotation["length"]))
+        for control in self.annotation_controls():
+            control.blockSignals(False)
+        self.angle_label.setText(f"Angle: {annotation['angle']:.1f}°")
+        self.label.update()
+
+    def save_current_annotation(self):
+        """Store the controls as the annotation of the slice they were edited on"""
+        image_id, self.pending_annotation_image_id = self.pending_annotation_image_id, None
+        if image_id is None:
+            return
+        self.store_annotations([image_id], self.current_annotation())
+
+    def flush_pending_annotation(self):
+        """Save an edit still waiting on the debounce timer before the slice or series changes"""
+        if self.annotation_save_timer.isActive():
+            self.annotation_save_timer.stop()
+            self.save_current_annotation()
+
+    def apply_annotation_to_all(self):
+        """Store the current lines on every slice of the scan in one transaction"""
+        image_ids = [self.image_ids[key] for key in map(os.path.abspath, self.dicom_files) if key in self.image_ids]
+        if image_ids:
+            self.annotation_save_timer.stop()
+            self.pending_annotation_image_id = None
+            self.store_annotations(image_ids, self.current_annotation())
+
+    def store_annotations(self, image_ids, annotation):
+        scan_id = self.scan_id
+        for image_id in image_ids:
+            self.annotations[image_id] = dict(annotation)
+        self.db_results.watch(
+            self.db.transaction(lambda conn: save_annotations(conn, scan_id, image_ids, annotation)),
+            lambda count: self.annotation_status.setText(
+                f"Scan {scan_id}: {len(self.annotations)} annotated slices"),
+            lambda error: self.annotation_status.setText(f"Failed to save annotation: {str(error)}")
+        )
+
+    def export_annotated_series(self):
+        """Render every slice with its stored lines into Processed Data in the background"""
+        if self.scan_id is None or self.annotation_export_worker is not None:
+            return
+        # Pending control changes belong to the export
+        self.flush_pending_annotation()
+        items = [(path, self.annotations.get(self.image_ids.get(os.path.abspath(path))))
+                 for path in self.dicom_files]
+        folder = os.path.join(self.processed_data_folder, f"scan_{self.scan_id}_annotated")
+        self.annotation_export_worker = AnnotationExportWorker(items, folder)
+        self.annotation_export_worker.progress.connect(
+            lambda done, total: self.annotation_status.setText(f"Exporting {done} / {total}..."))
+        self.annotation_export_worker.export_finished.connect(self.annotation_export_finished)
+        self.annotation_export_worker.export_failed.connect(self.annotation_export_failed)
+        self.export_annotated_btn.setEnabled(False)
+        self.annotation_export_worker.start()
+
+    def annotation_export_finished(self, folder, count, seconds):
+        self.annotation_export_worker = None
+        self.export_annotated_btn.setEnabled(self.scan_id is not None)
+        self.annotation_status.setText(f"Exported {count} slices to {folder} in {seconds:.1f} s")
+
+    def annotation_export_failed(self, message):
+        self.annotation_export_worker = None
+        self.export_annotated_btn.setEnabled(self.scan_id is not None)
+        self.annotation_status.setText(f"Export failed: {message}")
 
     def post_processing(self):
-        """Call kspace2Image function to convert k-space data to image"""
-        try:
-            # Call the kspace2image function with "Raw Data" as default folder
-            kspace2Image("Raw Data")
+        """Start k-space to image conversion in the background, or cancel a running one"""
+        if self.reconstruction_worker is not None:
+            self.reconstruction_worker.cancel()
+            self.post_processing_btn.setEnabled(False)
+            self.post_processing_status.setText("Cancelling after the current file...")
+            return
 
-            # Show success alert popup
+        self.reconstruction_results = []
+        self.reconstructed_files = []
+        self.reconstruction_errors = []
+        self.release_shared_results()
+        self.save_dicom_btn.setEnabled(False)
+
+        # Reconstruct the "Raw Data" folder without blocking the viewer
+        self.reconstruction_virtual_coils = self.virtual_coils_spinbox.value()
+        pool_options = dict(processes=self.reconstruction_processes, registry=self.shared_volumes,
+                            virtual_coils=self.reconstruction_virtual_coils, executor=self.reconstruction_pool())
+        if self.raw_watcher.synced.is_set():
+            raw_files = [row["path"] for row in self.raw_catalog.files_in_directory(self.raw_data_folder)]
+            self.reconstruction_worker = ReconstructionWorker(files=raw_files, **pool_options)
+        else:
+            # The catalog is still being built; fall back to listing the folder
+            self.reconstruction_worker = ReconstructionWorker(folder=self.raw_data_folder, **pool_options)
+        self.reconstruction_worker.file_done.connect(self.reconstruction_file_done)
+        self.reconstruction_worker.scan_done.connect(self.reconstruction_scan_done)
+        self.reconstruction_worker.file_failed.connect(self.reconstruction_file_failed)
+        self.reconstruction_worker.progress.connect(self.reconstruction_progress)
+        self.reconstruction_worker.batch_finished.connect(self.reconstruction_finished)
+
+        self.post_processing_progress.setValue(0)
+        self.post_processing_progress.show()
+        self.post_processing_status.setText("Starting...")
+        self.post_processing_btn.setText("Cancel Processing")
+        self.reconstruction_worker.start()
+
+    def reconstruction_file_done(self, index, total, name, kspace, image, preview):
+        """Collect a partial result; preview it when no DICOM series is loaded"""
+        self.reconstruction_results.append([kspace, image])
+        self.reconstructed_files.append(os.path.join(self.raw_data_folder, name))
+        self.preview_reconstruction(name, image, preview)
+
+    def reconstruction_scan_done(self, index, total, files, kspace, image):
+        """Collect a coil-compressed scan; every channel file is kept for the DICOM series"""
+        self.reconstruction_results.append([kspace, image])
+        self.reconstructed_files.extend(files)
+        name = Path(files[0]).name
+        self.preview_reconstruction(name if len(files) == 1 else f"{name} and {len(files) - 1} more channel(s)", image)
+
+    def preview_reconstruction(self, name, image, preview=None):
+        """Show a reconstructed image unless a DICOM series is being viewed"""
+        if self.dicom_files:
+            return
+        if preview is not None:
+            # Wrap the shared uint8 buffer directly and hold a reference while it is shown
+            height, width = preview.shape
+            q_image = QImage(preview.array.data, width, height, width, QImage.Format_Grayscale8)
+            self.label.set_image(q_image)
+            self.hold_displayed_volume(preview.name)
+        else:
+            self.label.set_image(array_to_qimage(normalize_to_uint8(image)))
+            self.hold_displayed_volume(None)
+        self.slider_label.setText(f"Reconstructed: {name}")
+
+    def hold_displayed_volume(self, name):
+        """Keep the shared volume behind the displayed image alive, releasing the previous one"""
+        if name is not None:
+            self.shared_volumes.acquire(name)
+        if self.displayed_shared_name is not None:
+            self.shared_volumes.release(self.displayed_shared_name)
+        self.displayed_shared_name = name
+
+    def reconstruction_pool(self):
+        """The window's reconstruction process pool, started on first use"""
+        if self.reconstruction_executor is None:
+            self.reconstruction_executor = make_reconstruction_pool(self.reconstruction_processes)
+        return self.reconstruction_executor
+
+    def release_shared_results(self):
+        """Drop the viewer's references to the previous batch's shared volumes"""
+        for name in self.reconstruction_shared_names:
+            self.shared_volumes.release(name)
+        self.reconstruction_shared_names = []
+
+    def reconstruction_file_failed(self, name, error):
+        """Remember files that could not be reconstructed"""
+        print(f"Error processing {name}: {error}")
+        self.reconstruction_errors.append(f"{name}: {error}")
+
+    def reconstruction_progress(self, done, total, files_per_sec, mb_per_sec):
+        """Show per-file progress and throughput"""
+        self.post_processing_progress.setMaximum(max(total, 1))
+        self.post_processing_progress.setValue(done)
+        self.post_processing_status.setText(
+            f"{done} / {total} files  {files_per_sec:.1f} files/s  {mb_per_sec:.1f} MB/s"
+        )
+
+    def reconstruction_finished(self, succeeded, failed, cancelled, elapsed):
+        """Report the outcome of a reconstruction batch"""
+        self.reconstruction_worker.wait()
+        self.reconstruction_shared_names = list(self.reconstruction_worker.shared_names)
+        if self.reconstruction_worker.pool_broken:
+            # Start a fresh pool for the next batch
+            self.reconstruction_executor.shutdown(wait=False, cancel_futures=True)
+            self.reconstruction_executor = None
+        self.reconstruction_worker = None
+        self.post_processing_btn.setText("Post Processing")
+        self.post_processing_btn.setEnabled(True)
+        self.post_processing_progress.hide()
+        self.post_processing_status.setText(
+            f"{succeeded} converted, {failed} failed in {elapsed:.1f} s"
+        )
+        self.save_dicom_btn.setEnabled(bool(self.reconstructed_files))
+
+        if cancelled:
             QMessageBox.information(
                 self,
-                "Post Processing Complete",
-                "K-space to image conversion has been completed successfully!"
+                "Post Processing Cancelled",
+                f"K-space to image conversion was cancelled.\n{succeeded} file(s) converted."
             )
-        except Exception as e:
-            # Show error alert if conversion fails
+        elif failed:
+            # Show error alert if any conversion failed
             QMessageBox.critical(
                 self,
                 "Post Processing Error",
-                f"An error occurred during k-space to image conversion:\n{str(e)}"
+                "An error occurred during k-space to image conversion:\n" + "\n".join(self.reconstruction_errors)
+            )
+        else:
+            # Show success alert popup
+            QMessageBox.information(
+                self,
+                "Post Processing Complete",
+                "K-space to image conversion has been completed successfully!"
             )
 
+    def save_reconstruction_as_dicom(self):
+        """Write each reconstructed scan as a DICOM series of a patient and open it"""
+        raw_files = list(self.reconstructed_files)
+        if not raw_files:
+            return
+
+        dialog = PatientSearchDialog(self)
+        if dialog.exec_() != QDialog.Accepted or dialog.selected_patient is None:
+            return
+        patient_id, patient_name, _ = dialog.selected_patient
+
+        # Channels are combined per scan; reading, scaling, encoding and the scan records all happen off the GUI thread
+        future = self.scan_save_pool.submit(write_raw_scans, raw_files, patient_id, self.db, store=self.scan_store,
+                                            virtual_coils=self.reconstruction_virtual_coils)
+        self.save_dicom_btn.setEnabled(False)
+        self.post_processing_status.setText(f"Writing {len(raw_files)} raw file(s) as DICOM...")
+        self.db_results.watch(future, lambda written: self.reconstruction_saved(patient_name, written),
+                              self.reconstruction_save_failed)
+
+    def reconstruction_saved(self, patient_name, written):
+        self.save_dicom_btn.setEnabled(bool(self.reconstructed_files))
+        if not written:
+            return
+        self.post_processing_status.setText(
+            f"Saved {len(written)} series ({sum(count for _, _, count in written)} slices) "
+            f"as scan(s) {', '.join(str(scan_id) for scan_id, _, _ in written)} of {patient_name}"
+        )
+        self.open_folder(os.path.abspath(written[-1][1]))
+
+    def reconstruction_save_failed(self, error):
+        self.save_dicom_btn.setEnabled(bool(self.reconstructed_files))
+        QMessageBox.critical(self, "Error", f"Failed to save reconstruction as DICOM:\n{str(error)}")
+
+    def toggle_acquisition(self):
+        """Start a scan whose raw files are reconstructed as they arrive, or abort it"""
+        if self.acquisition is not None and self.acquisition.is_running():
+            self.acquisition.abort()
+            self.acquisition_btn.setEnabled(False)
+            self.acquisition_status.setText("Aborting scan...")
+            return
+
+        session = getattr(self.parent_window, "session", None)
+        if session is None:
+            QMessageBox.warning(self, "Acquisition", "No spectrometer session is available.")
+            return
+
+        # The previous pipeline is idle once its scan has been reported finished
+        if self.acquisition_pipeline is not None:
+            self.acquisition_pipeline.close()
+
+        self.reconstruction_results = []
+        self.reconstructed_files = []
+        self.reconstruction_errors = []
+        self.release_shared_results()
+        # Files are previewed one by one as they land; the saved series combines channels as chosen
+        self.reconstruction_virtual_coils = self.virtual_coils_spinbox.value()
+        self.save_dicom_btn.setEnabled(False)
+        self.acquisition_scan_text = "Preparing scan..."
+        # Simulated images must never be mistaken for a patient scan
+        self.acquisition_simulated = getattr(session.module, "simulated", False)
+        self.acquisition_pipeline = ReconstructionPipeline(
+            on_result=lambda path, kspace, image: self.acquisition_image_ready.emit(str(path), kspace, image),
+            on_error=lambda path, error: self.acquisition_error.emit(Path(path).name, error)
+        )
+        self.acquisition = AcquisitionController(
+            session.module, session.output_path, self.acquisition_pipeline,
+            prepare=session.connect, lock=session.lock,
+            on_progress=self.acquisition_progress.emit,
+            on_finished=self.acquisition_finished.emit,
+            # The catalog's watcher already sees the output path; its events replace listing it every poll
+            watcher=self.raw_watcher
+        )
+        self.acquisition.start()
+        self.acquisition_btn.setText("Abort Scan")
+        self.acquisition_stats_timer.start(500)
+        self.update_acquisition_stats()
+
+    def acquisition_progress_changed(self, current, total):
+        """Track the scan counter reported by the hardware"""
+        self.acquisition_scan_text = f"Scan {current} / {total}"
+
+    def acquisition_file_done(self, raw_file, kspace, image):
+        """Collect an image reconstructed during acquisition"""
+        self.reconstruction_results.append([kspace, image])
+        self.reconstructed_files.append(raw_file)
+        self.preview_reconstruction(Path(raw_file).name, image)
+        self.save_dicom_btn.setEnabled(True)
+
+    def acquisition_done(self, status):
+        """Reset the scan button once the hardware has finished"""
+        self.acquisition_btn.setText("Start Scan")
+        self.acquisition_btn.setEnabled(True)
+        self.acquisition_scan_text = f"Scan {status}"
+        self.update_acquisition_stats()
+
+    def update_acquisition_stats(self):
+        """Show queue depth, back-pressure and per-stage latency"""
+        if self.acquisition_pipeline is None:
+            return
+        stats = self.acquisition_pipeline.stats()
+        latency = stats["latency"]
+        self.acquisition_status.setText(
+            ("SIMULATED SCAN - no scanner connected\n" if self.acquisition_simulated else "") +
+            f"{self.acquisition_scan_text}\n"
+            f"Queue: {stats['queue_depth']}/{stats['max_queue']}  "
+            f"Done: {stats['completed']}  Failed: {stats['failed']}\n"
+            f"Detect: {latency['detect']['mean'] * 1000:.0f} ms  "
+            f"Wait: {latency['wait']['mean'] * 1000:.0f} ms  "
+            f"Recon: {latency['reconstruct']['mean'] * 1000:.0f} ms\n"
+            f"Back-pressure: {stats['blocked_seconds']:.1f} s"
+        )
+        # Stop refreshing once the scan is over and the queue has drained
+        if not self.acquisition.is_running() and stats["queue_depth"] == 0:
+            self.acquisition_stats_timer.stop()
+
     def save_scan_to_patient(self):
         """Save the currently loaded MRI scan to a patient record"""
         if not self.current_folder_path or not self.dicom_files:
             QMessageBox.warning(self, "No Images", "Please load DICOM images first!")
             return
 
-        # Get list of all patients
-        try:
-            self.cursor.execute('SELECT id, name, ic FROM patients ORDER BY name')
-            patients = self.cursor.fetchall()
+        self.db_results.watch(self.db.read_async('SELECT 1 FROM patients LIMIT 1'), self.choose_scan_patient,
+                              lambda error: QMessageBox.critical(self, "Error", f"Failed to retrieve patients:\n{str(error)}"))
 
-            if not patients:
-                QMessageBox.warning(self, "No Patients", "No patients found in database. Please add a patient first!")
-                return
+    def choose_scan_patient(self, rows):
+        """Pick the patient and scan details, then queue the scan record"""
+        if not rows:
+            QMessageBox.warning(self, "No Patients", "No patients found in database. Please add a patient first!")
+            return
 
-            # Create a list of patient names with IC for selection
-            patient_list = [f"{name} (IC: {ic})" for _, name, ic in patients]
+        # Search-as-you-type picker instead of listing every patient
+        dialog = PatientSearchDialog(self)
+        if dialog.exec_() != QDialog.Accepted or dialog.selected_patient is None:
+            return
+        patient_id, patient_name, _ = dialog.selected_patient
+
+        # Get scan date
+        scan_date, ok = QInputDialog.getText(
+            self,
+            "Scan Date",
+            "Enter scan date (YYYY-MM-DD):",
+            QLineEdit.Normal,
+            datetime.now().strftime("%Y-%m-%d")
+        )
+        if not ok or not scan_date:
+            return
 
-            # Show dialog to select patient
-            patient_name, ok = QInputDialog.getItem(
-                self,
-                "Select Patient",
-                "Choose patient for this MRI scan:",
-                patient_list,
-                0,
-                False
-            )
+        # Get optional notes
+        notes, ok = QInputDialog.getText(
+            self,
+            "Scan Notes",
+            "Enter notes (optional):",
+            QLineEdit.Normal,
+            ""
+        )
+        if not ok:
+            return
 
-            if ok and patient_name:
-                # Get the selected patient ID
-                selected_index = patient_list.index(patient_name)
-                patient_id = patients[selected_index][0]
-
-                # Get scan date
-                scan_date, ok = QInputDialog.getText(
-                    self,
-                    "Scan Date",
-                    "Enter scan date (YYYY-MM-DD):",
-                    QLineEdit.Normal,
-                    datetime.now().strftime("%Y-%m-%d")
-                )
-
-                if ok and scan_date:
-                    # Get optional notes
-                    notes, ok = QInputDialog.getText(
-                        self,
-                        "Scan Notes",
-                        "Enter notes (optional):",
-                        QLineEdit.Normal,
-                        ""
-                    )
-
-                    if ok:
-                        # Save scan information
-                        try:
-                            self.cursor.execute('''
-                                INSERT INTO mri_scans (patient_id, scan_date, folder_path, notes)
-                                VALUES (?, ?, ?, ?)
-                            ''', (patient_id, scan_date, self.current_folder_path, notes))
-                            self.conn.commit()
-
-                            QMessageBox.information(
-                                self,
-                                "Success",
-                                f"MRI scan saved successfully!\n"
-                                f"Scan ID: {self.cursor.lastrowid}\n"
-                                f"Patient: {patients[selected_index][1]}\n"
-                                f"Images: {len(self.dicom_files)} files"
-                            )
-
-                        except Exception as e:
-                            QMessageBox.critical(self, "Error", f"Failed to save scan:\n{str(e)}")
+        # Store and read every image off the GUI thread, then record the scan and its images together
+        future = self.scan_save_pool.submit(save_scan, self.db, patient_id, scan_date,
+                                            self.current_folder_path, notes, list(self.dicom_files),
+                                            self.scan_store)
+        self.db_results.watch(
+            future,
+            lambda saved: self.scan_saved(patient_name, saved),
+            lambda error: QMessageBox.critical(self, "Error", f"Failed to save scan:\n{str(error)}")
+        )
+
+    def scan_saved(self, patient_name, saved):
+        # The saved images can now carry annotations
+        self.load_scan_annotations()
+        QMessageBox.information(
+            self,
+            "Success",
+            f"MRI scan saved successfully!\n"
+            f"Scan ID: {saved[0]}\n"
+            f"Patient: {patient_name}\n"
+            f"Images: {saved[1]} files ({saved[2]} already stored)"
+        )
+
+def format_metric(value, spec, scale=1):
+    """Format a QA metric for a table cell; NULL becomes an empty cell"""
+    return format(value * scale, spec) if value is not None else ""
+
+class CheckingWindow(QWidget):
+    """Phantom QA: runs the checks on the latest scan and shows results and trends"""
+    def __init__(self, parent=None):
+        super().__init__()
+        self.parent_window = parent
+        self.setWindowTitle("MRI QA - Checking")
+        self.setGeometry(150, 150, 900, 600)
+        self.setWindowFlags(Qt.FramelessWindowHint)
+        self.setStyleSheet("""
+            QWidget {
+                background-color: #2b2b2b;
+                color: #ffffff;
+                font-size: 11pt;
+            }
+            QTableWidget {
+                background-color: #3a3a3a;
+                color: #ffffff;
+                gridline-color: #555555;
+                border: 1px solid #666666;
+            }
+            QHeaderView::section {
+                background-color: #4a4a4a;
+                color: #ffffff;
+                padding: 3px;
+                border: 1px solid #666666;
+                font-weight: bold;
+            }
+            QPushButton {
+                background-color: #4a4a4a;
+                border: 1px solid #666666;
+                border-radius: 3px;
+                padding: 5px;
+                color: #ffffff;
+            }
+            QPushButton:hover {
+                background-color: #5a5a5a;
+            }
+            QPushButton:pressed {
+                background-color: #3a3a3a;
+            }
+        """)
 
-        except Exception as e:
-            QMessageBox.critical(self, "Error", f"Failed to retrieve patients:\n{str(e)}")
+        icons_dir = os.path.join(os.path.dirname(__file__), "icons")
+        self.pass_icon = QIcon(os.path.join(icons_dir, "check_pass.svg"))
+        self.fail_icon = QIcon(os.path.join(icons_dir, "check_fail.svg"))
+
+        # Phantom scans are looked up through the raw catalog; results go to the QA history
+        self.qa_folder = "Raw Data"
+        session = getattr(self.parent_window, "session", None)
+        if session is not None:
+            self.qa_folder = session.output_path
+        self.raw_catalog = RawCatalog()
+        self.qa_store = QAStore()
+        self.qa_worker = None
+
+        main_layout = QVBoxLayout()
+        main_layout.setContentsMargins(5, 5, 5, 5)
+
+        # Top bar with close button (returns to main menu)
+        top_bar = QHBoxLayout()
+        top_bar.addStretch()
+        close_btn = QPushButton()
+        close_btn.setFixedSize(30, 30)
+        close_pixmap = QPixmap(16, 16)
+        close_pixmap.fill(Qt.transparent)
+        painter = QPainter(close_pixmap)
+        painter.setPen(QPen(Qt.white, 2))
+        painter.drawLine(2, 2, 13, 13)
+        painter.drawLine(13, 2, 2, 13)
+        painter.end()
+        close_btn.setIcon(QIcon(close_pixmap))
+        close_btn.setIconSize(QSize(16, 16))
+        close_btn.setStyleSheet("""
+            QPushButton { background-color: transparent; border: none; padding: 0px; }
+            QPushButton:hover { background-color: #ff0000; }
+            QPushButton:pressed { background-color: #cc0000; }
+        """)
+        close_btn.clicked.connect(self.go_back)
+        top_bar.addWidget(close_btn)
+        main_layout.addLayout(top_bar)
+
+        # Run controls and overall verdict
+        run_layout = QHBoxLayout()
+        self.run_qa_btn = QPushButton("Run Phantom QA")
+        self.run_qa_btn.clicked.connect(self.run_qa)
+        run_layout.addWidget(self.run_qa_btn)
+        self.choose_folder_btn = QPushButton("Folder...")
+        self.choose_folder_btn.clicked.connect(self.choose_folder)
+        run_layout.addWidget(self.choose_folder_btn)
+        self.verdict_icon = QLabel()
+        self.verdict_icon.setFixedSize(36, 36)
+        run_layout.addWidget(self.verdict_icon)
+        self.qa_status = QLabel(f"Folder: {self.qa_folder}")
+        run_layout.addWidget(self.qa_status, 1)
+        main_layout.addLayout(run_layout)
+
+        # Per channel and slice results of the last run
+        self.results_table = QTableWidget()
+        self.results_table.setColumnCount(7)
+        self.results_table.setHorizontalHeaderLabels(
+            ["Channel", "Slice", "SNR", "Ghosting (%)", "Uniformity (%)", "Drift (Hz)", "Result"])
+        self.results_table.setEditTriggers(QTableWidget.NoEditTriggers)
+        self.results_table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
+        main_layout.addWidget(self.results_table, 3)
+
+        # History of earlier runs for trending
+        main_layout.addWidget(QLabel("Recent runs"))
+        self.trend_table = QTableWidget()
+        self.trend_table.setColumnCount(6)
+        self.trend_table.setHorizontalHeaderLabels(
+            ["Run at", "Mean SNR", "Max ghosting (%)", "Min uniformity (%)", "Max drift (Hz)", "Result"])
+        self.trend_table.setEditTriggers(QTableWidget.NoEditTriggers)
+        self.trend_table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
+        main_layout.addWidget(self.trend_table, 2)
+
+        self.setLayout(main_layout)
+        self.load_trend()
+
+    def choose_folder(self):
+        folder = QFileDialog.getExistingDirectory(self, "Select Phantom Scan Folder", str(self.qa_folder))
+        if folder:
+            self.qa_folder = folder
+            self.qa_status.setText(f"Folder: {folder}")
+
+    def run_qa(self):
+        """Check the latest scan in the QA folder on a background thread"""
+        if self.qa_worker is not None:
+            return
+        self.run_qa_btn.setEnabled(False)
+        self.verdict_icon.clear()
+        self.qa_status.setText(f"Checking latest scan in {self.qa_folder}...")
+        self.qa_start = time.perf_counter()
+        self.qa_worker = QAWorker(self.qa_folder, self.raw_catalog, self.qa_store)
+        self.qa_worker.qa_finished.connect(self.qa_finished)
+        self.qa_worker.qa_failed.connect(self.qa_failed)
+        self.qa_worker.start()
+
+    def qa_done(self):
+        self.qa_worker.wait()
+        self.qa_worker = None
+        self.run_qa_btn.setEnabled(True)
+
+    def set_result_icon(self, table, row, column, passed):
+        item = QTableWidgetItem("Pass" if passed else "Fail")
+        item.setIcon(self.pass_icon if passed else self.fail_icon)
+        table.setItem(row, column, item)
+
+    def qa_finished(self, files, result):
+        """Show the per-image results and overall verdict of a QA run"""
+        self.qa_done()
+        metrics = result["metrics"]
+        drift = result["drift"]
+        self.results_table.setRowCount(len(result["labels"]))
+        for row, (channel, slc) in enumerate(result["labels"]):
+            values = [str(channel), str(slc), f"{metrics['snr'][row]:.1f}",
+                      f"{metrics['ghosting'][row] * 100:.2f}", f"{metrics['uniformity'][row]:.1f}",
+                      f"{drift[row]:.1f}" if drift is not None else ""]
+            for column, value in enumerate(values):
+                self.results_table.setItem(row, column, QTableWidgetItem(value))
+            self.set_result_icon(self.results_table, row, 6, bool(result["passed"][row]))
+
+        icon = self.pass_icon if result["all_passed"] else self.fail_icon
+        self.verdict_icon.setPixmap(icon.pixmap(QSize(32, 32)))
+        self.qa_status.setText(
+            f"{'PASS' if result['all_passed'] else 'FAIL'}: {len(files)} channel file(s), "
+            f"{len(result['labels'])} image(s) checked in {time.perf_counter() - self.qa_start:.1f} s"
+        )
+        self.load_trend()
+
+    def qa_failed(self, error):
+        self.qa_done()
+        self.verdict_icon.setPixmap(self.fail_icon.pixmap(QSize(32, 32)))
+        self.qa_status.setText(f"QA failed: {error}")
+
+    def load_trend(self):
+        """Fill the history table from the QA store"""
+        runs = self.qa_store.trend()
+        self.trend_table.setRowCount(len(runs))
+        for row, run in enumerate(runs):
+            # Metrics that could not be computed are stored as NULL and shown blank
+            values = [run["run_at"], format_metric(run["snr"], ".1f"), format_metric(run["ghosting"], ".2f", 100),
+                      format_metric(run["uniformity"], ".1f"), format_metric(run["drift"], ".1f")]
+            for column, value in enumerate(values):
+                self.trend_table.setItem(row, column, QTableWidgetItem(value))
+            self.set_result_icon(self.trend_table, row, 5, bool(run["passed"]))
+
+    def go_back(self):
+        """Return to front page"""
+        if self.parent_window:
+            self.parent_window.show()
+        self.hide()
+
+    def closeEvent(self, event):
+        if self.qa_worker is not None:
+            self.qa_worker.wait()
+        self.raw_catalog.close()
+        self.qa_store.close()
+        event.accept()
+
+class ViewingWindow(QWidget):
+    """Patient history browser: patients, their scans and the selected series"""
+    # Patients listed at once; typing in the search box narrows the list
+    PATIENT_LIMIT = 200
+    DEBOUNCE_MS = 150
+
+    def __init__(self, parent=None):
+        super().__init__()
+        self.parent_window = parent
+        self.setWindowTitle("MRI DICOM Viewer - Viewing")
+        self.setGeometry(120, 120, 1100, 650)
+        self.setWindowFlags(Qt.FramelessWindowHint)
+        self.setStyleSheet("""
+            QWidget {
+                background-color: #2b2b2b;
+                color: #ffffff;
+                font-size: 11pt;
+            }
+            QListWidget {
+                background-color: #1a1a1a;
+                border: 1px solid #555555;
+            }
+            QListWidget::item:selected {
+                background-color: #505050;
+            }
+            QPushButton {
+                background-color: #4a4a4a;
+                border: 1px solid #666666;
+                border-radius: 3px;
+                padding: 5px;
+                color: #ffffff;
+            }
+            QPushButton:hover {
+                background-color: #5a5a5a;
+            }
+            QSlider::groove:horizontal {
+                background: #404040;
+                height: 8px;
+                border-radius: 4px;
+            }
+            QSlider::handle:horizontal {
+                background: #6a6a6a;
+                border: 1px solid #888888;
+                width: 18px;
+                margin: -5px 0;
+                border-radius: 9px;
+            }
+        """)
+
+        self.db = get_database()
+        self.db_results = DatabaseResults(self)
+        self.selected_patient_id = None
+        self.patient_generation = 0
+
+        # Decoded series stay in memory so flipping between prior and current scans is instant
+        self.series_cache = SeriesCache()
+        self.series_loader = None
+        self.preview_worker = None
+        self.current_folder = None
+        self.current_images = []
+        self.scans = []
+
+        main_layout = QVBoxLayout()
+        main_layout.setContentsMargins(5, 5, 5, 5)
+
+        # Top bar with close button (returns to main menu)
+        top_bar = QHBoxLayout()
+        top_bar.addStretch()
+        close_btn = QPushButton()
+        close_btn.setFixedSize(30, 30)
+        close_pixmap = QPixmap(16, 16)
+        close_pixmap.fill(Qt.transparent)
+        painter = QPainter(close_pixmap)
+        painter.setPen(QPen(Qt.white, 2))
+        painter.drawLine(2, 2, 13, 13)
+        painter.drawLine(13, 2, 2, 13)
+        painter.end()
+        close_btn.setIcon(QIcon(close_pixmap))
+        close_btn.setIconSize(QSize(16, 16))
+        close_btn.setStyleSheet("""
+            QPushButton { background-color: transparent; border: none; padding: 0px; }
+            QPushButton:hover { background-color: #ff0000; }
+            QPushButton:pressed { background-color: #cc0000; }
+        """)
+        close_btn.clicked.connect(self.go_back)
+        top_bar.addWidget(close_btn)
+        main_layout.addLayout(top_bar)
+
+        content_layout = QHBoxLayout()
+
+        # Left: patients, then the selected patient's scans as thumbnails
+        browser_layout = QVBoxLayout()
+        browser_layout.addWidget(QLabel("Patients"))
+        self.patient_search = QLineEdit()
+        self.patient_search.setPlaceholderText("Search name or IC")
+        self.patient_search.textChanged.connect(lambda: self.patient_search_timer.start(self.DEBOUNCE_MS))
+        browser_layout.addWidget(self.patient_search)
+        self.patient_search_timer = QTimer(self)
+        self.patient_search_timer.setSingleShot(True)
+        self.patient_search_timer.timeout.connect(self.load_patients)
+        self.patient_list = QListWidget()
+        self.patient_list.currentRowChanged.connect(self.patient_selected)
+        browser_layout.addWidget(self.patient_list, 1)
+        self.patient_status = QLabel("")
+        browser_layout.addWidget(self.patient_status)
+        browser_layout.addWidget(QLabel("Scans"))
+        self.scan_list = QListWidget()
+        self.scan_list.setViewMode(QListView.IconMode)
+        self.scan_list.setIconSize(QSize(THUMBNAIL_SIZE, THUMBNAIL_SIZE))
+        self.scan_list.setResizeMode(QListView.Adjust)
+        self.scan_list.setMovement(QListView.Static)
+        self.scan_list.currentRowChanged.connect(self.scan_selected)
+        browser_layout.addWidget(self.scan_list, 2)
+        browser_widget = QWidget()
+        browser_widget.setLayout(browser_layout)
+        browser_widget.setFixedWidth(320)
+        content_layout.addWidget(browser_widget)
+
+        # Right: the selected series
+        viewer_layout = QVBoxLayout()
+        self.series_info = QLabel("Select a patient and a scan")
+        viewer_layout.addWidget(self.series_info)
+        self.label = ImageLabel("Select a scan to view", self, show_lines=False)
+        self.label.setAlignment(Qt.AlignCenter)
+        self.label.setMinimumSize(400, 400)
+        self.label.setStyleSheet("border: 1px solid #555555; background-color: #1a1a1a;")
+        viewer_layout.addWidget(self.label, 1)
+        self.slice_slider = QSlider(Qt.Horizontal)
+        self.slice_slider.setEnabled(False)
+        self.slice_slider.valueChanged.connect(self.show_slice)
+        viewer_layout.addWidget(self.slice_slider)
+        content_layout.addLayout(viewer_layout, 1)
+
+        main_layout.addLayout(content_layout)
+        self.setLayout(main_layout)
+
+    def showEvent(self, event):
+        """Refresh the patient list whenever the module is opened"""
+        super().showEvent(event)
+        self.load_patients()
+
+    def load_patients(self):
+        """List up to PATIENT_LIMIT patients matching the search box, through the patient search index"""
+        # Results of an earlier search that arrive late are dropped
+        self.patient_generation += 1
+        generation, text = self.patient_generation, self.patient_search.text()
+        future = self.db.submit_read(lambda conn: search_patients(conn, text, self.PATIENT_LIMIT).fetchall())
+        self.db_results.watch(future, lambda patients: self.set_patients(generation, patients))
+
+    def set_patients(self, generation, patients):
+        if generation != self.patient_generation:
+            return
+        if len(patients) >= self.PATIENT_LIMIT:
+            self.patient_status.setText(f"First {len(patients)} patients shown; search to narrow")
+        else:
+            self.patient_status.setText(f"{len(patients)} patient(s)" if patients else "No matching patients")
+        selected = self.patient_list.currentItem()
+        selected_id = selected.data(Qt.UserRole) if selected is not None else None
+        self.patient_list.blockSignals(True)
+        self.patient_list.clear()
+        for patient_id, name, ic in patients:
+            item = QListWidgetItem(f"{name} ({ic})")
+            item.setData(Qt.UserRole, patient_id)
+            self.patient_list.addItem(item)
+            if patient_id == selected_id:
+                self.patient_list.setCurrentItem(item)
+        self.patient_list.blockSignals(False)
+
+    def patient_selected(self, row):
+        """Query the patient's scans, newest first"""
+        item = self.patient_list.item(row)
+        self.selected_patient_id = item.data(Qt.UserRole) if item is not None else None
+        if self.selected_patient_id is None:
+            self.set_scans(None, [])
+            return
+        future = self.db.read_async(
+            'SELECT id, scan_date, folder_path, notes FROM mri_scans '
+            'WHERE patient_id = ? ORDER BY scan_date DESC, id DESC',
+            (self.selected_patient_id,)
+        )
+        patient_id = self.selected_patient_id
+        self.db_results.watch(future, lambda scans: self.set_scans(patient_id, scans))
+
+    def set_scans(self, patient_id, scans):
+        """Show a patient's scans with cached thumbnails"""
+        if patient_id != self.selected_patient_id:
+            # The selection moved on while the query ran
+            return
+        self.stop_preview_worker()
+        self.scan_list.blockSignals(True)
+        self.scan_list.clear()
+        self.scans = scans
+
+        placeholder = QPixmap(THUMBNAIL_SIZE, THUMBNAIL_SIZE)
+        placeholder.fill(QColor(40, 40, 40))
+        for scan_id, scan_date, folder_path, notes in self.scans:
+            scan_item = QListWidgetItem(QIcon(placeholder), scan_date)
+            scan_item.setToolTip(f"Scan {scan_id}: {folder_path}" + (f"\n{notes}" if notes else ""))
+            self.scan_list.addItem(scan_item)
+        self.scan_list.blockSignals(False)
+
+        if self.scans:
+            self.preview_worker = ScanPreviewWorker([scan[2] for scan in self.scans])
+            self.preview_worker.thumbnail_ready.connect(self.set_scan_preview)
+            self.preview_worker.start()
+
+    def set_scan_preview(self, index, q_image):
+        item = self.scan_list.item(index)
+        if item is not None:
+            item.setIcon(QIcon(QPixmap.fromImage(q_image)))
+
+    def stop_preview_worker(self):
+        if self.preview_worker is not None:
+            self.preview_worker.cancel()
+            self.preview_worker.thumbnail_ready.disconnect(self.set_scan_preview)
+            self.preview_worker.wait()
+            self.preview_worker = None
+
+    def scan_selected(self, row):
+        """Show a scan from the series cache, or decode it in the background"""
+        if row < 0 or row >= len(self.scans):
+            return
+        scan_id, scan_date, folder_path, _ = self.scans[row]
+        self.stop_series_loader()
+        self.current_folder = folder_path
+        self.series_info.setText(f"Scan {scan_id} - {scan_date} - {folder_path}")
+
+        images = self.series_cache.get(folder_path)
+        if images is not None:
+            self.set_series(images)
+            return
+
+        self.set_series([])
+        self.label.clear()
+        # The saved image list comes from one indexed query; the folder is only listed for older scans
+        self.db_results.watch(self.db.submit_read(lambda conn: scan_images(conn, scan_id)),
+                              lambda images: self.start_series_loader(folder_path, images))
+
+    def start_series_loader(self, folder_path, images):
+        if folder_path != self.current_folder or self.series_loader is not None:
+            # Another scan was selected while the query ran
+            return
+        self.series_loader = SeriesLoader(folder_path, images)
+        self.series_loader.slice_ready.connect(self.series_slice_ready)
+        self.series_loader.series_loaded.connect(self.series_loaded)
+        self.series_loader.series_failed.connect(self.series_failed)
+        self.series_loader.stale_images.connect(self.series_stale)
+        self.series_loader.start()
+
+    def series_stale(self, folder, count):
+        if folder == self.current_folder:
+            self.series_info.setText(f"{self.series_info.text()} - {count} image(s) changed or missing since saved")
+
+    def stop_series_loader(self):
+        if self.series_loader is not None:
+            self.series_loader.cancel()
+            self.series_loader.slice_ready.disconnect(self.series_slice_ready)
+            self.series_loader.series_loaded.disconnect(self.series_loaded)
+            self.series_loader.series_failed.disconnect(self.series_failed)
+            self.series_loader.stale_images.disconnect(self.series_stale)
+            self.series_loader.wait()
+            self.series_loader = None
+
+    def series_slice_ready(self, folder, index, total, q_image):
+        """Show slices as they are decoded so the first one appears right away"""
+        if folder != self.current_folder:
+            return
+        self.current_images.append(q_image)
+        self.slice_slider.setMaximum(total - 1)
+        self.slice_slider.setEnabled(total > 1)
+        if index == self.slice_slider.value():
+            self.show_slice(index)
+
+    def series_loaded(self, folder, images):
+        self.series_cache.put(folder, images)
+        self.series_loader.wait()
+        self.series_loader = None
+
+    def series_failed(self, folder, error):
+        self.series_loader.wait()
+        self.series_loader = None
+        self.label.setText(f"Cannot open {folder}: {error}")
+
+    def set_series(self, images):
+        self.current_images = list(images)
+        self.slice_slider.blockSignals(True)
+        self.slice_slider.setMaximum(max(0, len(images) - 1))
+        self.slice_slider.setValue(0)
+        self.slice_slider.blockSignals(False)
+        self.slice_slider.setEnabled(len(images) > 1)
+        self.show_slice(0)
+
+    def show_slice(self, index):
+        if 0 <= index < len(self.current_images) and not self.current_images[index].isNull():
+            self.label.set_image(self.current_images[index])
+
+    def go_back(self):
+        """Return to front page"""
+        if self.parent_window:
+            self.parent_window.show()
+        self.hide()
+
+    def closeEvent(self, event):
+        self.stop_preview_worker()
+        self.stop_series_loader()
+        event.accept()
 
 if __name__ == "__main__":
     app = QApplication(sys.argv)
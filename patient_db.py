@@ -0,0 +1,395 @@
+#!/usr/bin/env python3
+"""
+Patient database access shared by the GUI and background workers.
+
+The database runs in WAL mode, so readers never wait for the writer. Each
+thread reads through its own connection. All writes go through one writer
+thread that groups queued writes into a single transaction, each write in
+its own savepoint so one failure does not undo the others. Writes and
+asynchronous reads return concurrent.futures.Future objects.
+"""
+
+import atexit
+import os
+import queue
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from sqlite_config import configure_connection
+
+DB_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "patient_data.db")
+
+def connect(path=DB_PATH, readonly=False, autocommit=False):
+    """
+    Open a configured connection.
+
+    Args:
+        path (str): Database file
+        readonly (bool): Reject writes on this connection
+        autocommit (bool): Leave transactions to the caller (isolation_level=None)
+    """
+    conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None if autocommit else "")
+    configure_connection(conn)
+    if readonly:
+        conn.execute("PRAGMA query_only = ON")
+    return conn
+
+def _create_base_tables(cursor):
+    # Create patients table if it doesn't exist
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS patients (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            ic TEXT UNIQUE NOT NULL,
+            dob TEXT NOT NULL,
+            sex TEXT NOT NULL,
+            height REAL,
+            weight REAL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+    # Create MRI scans table to store image paths
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS mri_scans (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            patient_id INTEGER NOT NULL,
+            scan_date TEXT NOT NULL,
+            folder_path TEXT NOT NULL,
+            notes TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (patient_id) REFERENCES patients(id)
+        )
+    ''')
+
+def _add_lookup_indexes(cursor):
+    # A patient's scan history is read newest first; the index also serves plain patient_id lookups
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_mri_scans_patient_date ON mri_scans(patient_id, scan_date)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_patients_name ON patients(name)')
+
+def _add_patient_search(cursor):
+    # External-content FTS5 index over name and IC, kept in step with patients by triggers
+    try:
+        cursor.execute('''
+            CREATE VIRTUAL TABLE IF NOT EXISTS patients_fts USING fts5(
+                name, ic, content='patients', content_rowid='id', prefix='1 2 3'
+            )
+        ''')
+    except sqlite3.OperationalError as e:
+        # SQLite built without FTS5: search falls back to the name index
+        print(f"Patient search index not created: {str(e)}")
+        return
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS patients_fts_insert AFTER INSERT ON patients BEGIN
+            INSERT INTO patients_fts(rowid, name, ic) VALUES (new.id, new.name, new.ic);
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS patients_fts_delete AFTER DELETE ON patients BEGIN
+            INSERT INTO patients_fts(patients_fts, rowid, name, ic) VALUES ('delete', old.id, old.name, old.ic);
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS patients_fts_update AFTER UPDATE OF name, ic ON patients BEGIN
+            INSERT INTO patients_fts(patients_fts, rowid, name, ic) VALUES ('delete', old.id, old.name, old.ic);
+            INSERT INTO patients_fts(rowid, name, ic) VALUES (new.id, new.name, new.ic);
+        END
+    ''')
+    cursor.execute("INSERT INTO patients_fts(patients_fts) VALUES ('rebuild')")
+
+def _add_scan_images(cursor):
+    # One row per image of a saved scan, so a scan reopens without listing or decoding its folder
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS scan_images (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            scan_id INTEGER NOT NULL,
+            path TEXT NOT NULL,
+            instance_number INTEGER,
+            position_x REAL,
+            position_y REAL,
+            position_z REAL,
+            rows INTEGER,
+            cols INTEGER,
+            window_center REAL,
+            window_width REAL,
+            checksum TEXT,
+            mtime REAL,
+            FOREIGN KEY (scan_id) REFERENCES mri_scans(id) ON DELETE CASCADE
+        )
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_scan_images_scan ON scan_images(scan_id, instance_number)')
+
+def _add_scan_store(cursor):
+    # Objects of the content-addressed scan store, keyed by their BLAKE2b digest
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS store_objects (
+            digest TEXT PRIMARY KEY,
+            size INTEGER NOT NULL,
+            path TEXT NOT NULL,
+            created_at TEXT NOT NULL,
+            verified_at TEXT,
+            status TEXT NOT NULL DEFAULT 'ok'
+        )
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_store_objects_verified ON store_objects(verified_at)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_scan_images_checksum ON scan_images(checksum)')
+
+def _add_maintenance_log(cursor):
+    # When each db_maintenance task last ran, so the schedule survives restarts
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS maintenance_runs (
+            task TEXT PRIMARY KEY,
+            last_run REAL NOT NULL,
+            seconds REAL,
+            detail TEXT
+        )
+    ''')
+
+def _add_annotations(cursor):
+    # Stored images point into the scan store; keep the file they were saved from
+    columns = [row[1] for row in cursor.execute('PRAGMA table_info(scan_images)')]
+    if "source_path" not in columns:
+        cursor.execute('ALTER TABLE scan_images ADD COLUMN source_path TEXT')
+    # Line annotation parameters of one image
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS annotations (
+            image_id INTEGER PRIMARY KEY,
+            scan_id INTEGER NOT NULL,
+            angle REAL NOT NULL,
+            spacing INTEGER NOT NULL,
+            num_lines INTEGER NOT NULL,
+            origin_x INTEGER NOT NULL,
+            origin_y INTEGER NOT NULL,
+            length INTEGER NOT NULL,
+            updated_at TEXT NOT NULL,
+            FOREIGN KEY (image_id) REFERENCES scan_images(id) ON DELETE CASCADE,
+            FOREIGN KEY (scan_id) REFERENCES mri_scans(id) ON DELETE CASCADE
+        )
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_annotations_scan ON annotations(scan_id)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_mri_scans_folder ON mri_scans(folder_path)')
+
+# Applied in order; PRAGMA user_version records how many have run
+SCHEMA_MIGRATIONS = [
+    _create_base_tables,
+    _add_lookup_indexes,
+    _add_patient_search,
+    _add_scan_images,
+    _add_scan_store,
+    _add_maintenance_log,
+    _add_annotations,
+]
+
+def create_patient_schema(conn):
+    """Bring the patient database up to the current schema version"""
+    cursor = conn.cursor()
+    version = cursor.execute('PRAGMA user_version').fetchone()[0]
+    for number, migration in enumerate(SCHEMA_MIGRATIONS[version:], start=version + 1):
+        try:
+            migration(cursor)
+        except sqlite3.OperationalError as e:
+            # Later migrations wait until this one can run
+            conn.rollback()
+            print(f"Schema migration {number} not applied: {str(e)}")
+            break
+        # PRAGMA cannot take parameters; number is an int from enumerate
+        cursor.execute(f'PRAGMA user_version = {number}')
+        conn.commit()
+
+def has_patient_search(conn):
+    """True if the FTS5 patient index exists"""
+    return conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'patients_fts'").fetchone() is not None
+
+def patient_search_query(text):
+    """
+    Build an FTS5 query matching every typed word as a prefix.
+
+    Returns:
+        str: Query for patients_fts, or "" if nothing searchable was typed
+    """
+    terms = [term.replace('"', '""') for term in text.split()]
+    return " ".join(f'"{term}"*' for term in terms if term)
+
+def search_patients(conn, text, limit=200):
+    """
+    Cursor over patients matching a search-as-you-type text.
+
+    Every word has to prefix-match the name or IC. Without FTS5 the name
+    index is used for a prefix match on the whole text.
+
+    Returns:
+        sqlite3.Cursor: Rows of (id, name, ic)
+    """
+    query = patient_search_query(text)
+    if not query:
+        return conn.execute('SELECT id, name, ic FROM patients ORDER BY name LIMIT ?', (limit,))
+    if has_patient_search(conn):
+        # No ranking: LIMIT can then stop at the first matches, which keeps short prefixes fast
+        return conn.execute('''
+            SELECT p.id, p.name, p.ic FROM patients_fts f JOIN patients p ON p.id = f.rowid
+            WHERE patients_fts MATCH ? LIMIT ?
+        ''', (query, limit))
+    prefix = text.strip()
+    return conn.execute('''
+        SELECT id, name, ic FROM patients
+        WHERE (name >= ? AND name < ?) OR ic = ? ORDER BY name LIMIT ?
+    ''', (prefix, prefix + '\uffff', prefix, limit))
+
+class PatientDatabase:
+    """Per-thread readers and a single batching writer over one database file"""
+    def __init__(self, path=DB_PATH, readers=2, batch_window=0.005, max_batch=256):
+        self.path = os.path.abspath(path)
+        self.batch_window = batch_window
+        self.max_batch = max_batch
+
+        conn = connect(self.path)
+        try:
+            create_patient_schema(conn)
+        finally:
+            conn.close()
+
+        self.local = threading.local()
+        self.readers_lock = threading.Lock()
+        self.readers = []
+        self.read_pool = ThreadPoolExecutor(max_workers=readers, thread_name_prefix="patient-db-read")
+
+        self.write_queue = queue.Queue()
+        self.writer = threading.Thread(target=self._write_loop, name="patient-db-writer", daemon=True)
+        self.writer.start()
+        self.closed = False
+
+    def reader(self):
+        """The calling thread's read-only connection"""
+        conn = getattr(self.local, "conn", None)
+        if conn is None:
+            conn = connect(self.path, readonly=True, autocommit=True)
+            self.local.conn = conn
+            with self.readers_lock:
+                self.readers.append(conn)
+        return conn
+
+    def read(self, sql, params=()):
+        """Run a query on the calling thread and return all rows"""
+        return self.reader().execute(sql, params).fetchall()
+
+    def read_async(self, sql, params=()):
+        """Run a query on the read pool; the future resolves to the rows"""
+        return self.read_pool.submit(self.read, sql, params)
+
+    def submit_read(self, fn):
+        """Run fn(connection) on the read pool"""
+        return self.read_pool.submit(lambda: fn(self.reader()))
+
+    def transaction(self, fn):
+        """
+        Queue fn(connection) for the writer thread.
+
+        fn runs inside a savepoint of the current batch; if it raises, only
+        its own changes are rolled back.
+
+        Returns:
+            Future: fn's return value once the batch has committed
+        """
+        future = Future()
+        self.write_queue.put((fn, future))
+        return future
+
+    def write(self, sql, params=()):
+        """Queue one statement; the future resolves to the new row id"""
+        return self.transaction(lambda conn: conn.execute(sql, params).lastrowid)
+
+    def write_many(self, sql, rows):
+        """Queue executemany; the future resolves to the number of rows changed"""
+        return self.transaction(lambda conn: conn.executemany(sql, rows).rowcount)
+
+    def flush(self):
+        """Wait until every write queued so far has been committed"""
+        self.transaction(lambda conn: None).result()
+
+    def _next_batch(self):
+        """Block for one write, then gather whatever else arrives within the batch window"""
+        batch = [self.write_queue.get()]
+        deadline = time.monotonic() + self.batch_window
+        while batch[-1] is not None and len(batch) < self.max_batch:
+            timeout = deadline - time.monotonic()
+            try:
+                batch.append(self.write_queue.get(timeout=timeout) if timeout > 0 else self.write_queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _write_loop(self):
+        conn = connect(self.path, autocommit=True)
+        try:
+            while True:
+                batch = self._next_batch()
+                stop = batch[-1] is None
+                if stop:
+                    batch.pop()
+                if batch:
+                    self._run_batch(conn, batch)
+                if stop:
+                    return
+        finally:
+            conn.close()
+
+    def _run_batch(self, conn, batch):
+        outcomes = []
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            for fn, future in batch:
+                if not future.set_running_or_notify_cancel():
+                    continue
+                conn.execute("SAVEPOINT write_op")
+                try:
+                    result = fn(conn)
+                except BaseException as e:
+                    conn.execute("ROLLBACK TO write_op")
+                    conn.execute("RELEASE write_op")
+                    outcomes.append((future, None, e))
+                else:
+                    conn.execute("RELEASE write_op")
+                    outcomes.append((future, result, None))
+            conn.execute("COMMIT")
+        except sqlite3.Error as e:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            # Nothing in the batch was committed
+            for fn, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        # Results are only reported once they are durable
+        for future, result, error in outcomes:
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
+
+    def close(self):
+        """Commit pending writes and close every connection"""
+        if self.closed:
+            return
+        self.closed = True
+        self.write_queue.put(None)
+        self.writer.join()
+        self.read_pool.shutdown(wait=True)
+        with self.readers_lock:
+            for conn in self.readers:
+                conn.close()
+            self.readers.clear()
+
+_shared_database = None
+_shared_lock = threading.Lock()
+
+def get_database():
+    """The process-wide PatientDatabase, opened on first use"""
+    global _shared_database
+    with _shared_lock:
+        if _shared_database is None:
+            _shared_database = PatientDatabase()
+            atexit.register(_shared_database.close)
+        return _shared_database
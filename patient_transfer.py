@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+"""Bulk import and export of patients and their scans as CSV or JSON lines."""
+
+import argparse
+import csv
+import json
+import sys
+import time
+from pathlib import Path
+
+from patient_db import get_database, connect, DB_PATH
+
+PATIENT_FIELDS = ["ic", "name", "dob", "sex", "height", "weight"]
+SCAN_FIELDS = ["scan_date", "folder_path", "notes"]
+EXPORT_FIELDS = PATIENT_FIELDS + ["created_at", "scan_id"] + SCAN_FIELDS
+
+# What to do when an imported IC already exists
+CONFLICT_SQL = {
+    # Keep the stored patient untouched
+    "skip": "ON CONFLICT(ic) DO NOTHING",
+    # Overwrite the stored details in place; the id, and so the patient's scans, are kept
+    "update": ("ON CONFLICT(ic) DO UPDATE SET name = excluded.name, dob = excluded.dob, sex = excluded.sex, "
+               "height = COALESCE(excluded.height, height), weight = COALESCE(excluded.weight, weight)"),
+    # Import nothing if any IC is already stored; checked before the first write
+    "fail": "",
+}
+
+INSERT_SCAN_SQL = '''
+    INSERT INTO mri_scans (patient_id, scan_date, folder_path, notes)
+    SELECT p.id, ?, ?, ? FROM patients p
+    WHERE p.ic = ? AND NOT EXISTS (
+        SELECT 1 FROM mri_scans s WHERE s.patient_id = p.id AND s.scan_date = ? AND s.folder_path = ?
+    )
+'''
+
+def detect_format(path):
+    """'csv' or 'jsonl' from the file extension"""
+    return "jsonl" if Path(path).suffix.lower() in (".jsonl", ".ndjson", ".json") else "csv"
+
+def read_records(path, fmt=None):
+    """Stream records from a CSV file (with header) or a JSON lines file as dicts"""
+    fmt = fmt or detect_format(path)
+    with open(path, newline="", encoding="utf-8") as f:
+        if fmt == "csv":
+            yield from csv.DictReader(f)
+        else:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+def _number(value):
+    if value is None or value == "":
+        return None
+    return float(value)
+
+def _text(value):
+    if value is None:
+        return None
+    value = str(value).strip()
+    return value or None
+
+def split_record(record):
+    """
+    Validate one record.
+
+    Returns:
+        tuple: (patient row, scan row or None), or None if a required field is missing
+    """
+    ic, name, dob, sex = (_text(record.get(field)) for field in ("ic", "name", "dob", "sex"))
+    if not (ic and name and dob and sex):
+        return None
+    try:
+        patient = (name, ic, dob, sex, _number(record.get("height")), _number(record.get("weight")))
+    except (TypeError, ValueError):
+        return None
+
+    scan = None
+    scan_date, folder_path = _text(record.get("scan_date")), _text(record.get("folder_path"))
+    if scan_date and folder_path:
+        scan = (scan_date, folder_path, _text(record.get("notes")), ic, scan_date, folder_path)
+    return patient, scan
+
+def _batches(records, batch_size):
+    batch = []
+    for record in records:
+        batch.append(record)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def find_stored_ics(db, path, fmt=None, batch_size=5000, chunk_size=500):
+    """ICs in a file that the database already holds; stops at the first batch that has any"""
+    for batch in _batches(read_records(path, fmt), batch_size):
+        ics = list({parsed[0][1] for parsed in map(split_record, batch) if parsed is not None})
+        for i in range(0, len(ics), chunk_size):
+            chunk = ics[i:i + chunk_size]
+            rows = db.read(f"SELECT ic FROM patients WHERE ic IN ({', '.join('?' * len(chunk))})", chunk)
+            if rows:
+                return sorted(row[0] for row in rows)
+    return []
+
+def import_records(path, db=None, on_conflict="skip", batch_size=5000, fmt=None, progress=None):
+    """
+    Stream patients (and optionally their scans) from a file into the database.
+
+    Records carry the patient fields and may carry scan_date/folder_path/notes;
+    the export format can be imported as is. A patient with several scans
+    appears once per scan, so only the first record of each IC writes the
+    patient and the rest only add scans; on_conflict applies to ICs that
+    were stored before the import. Each batch is written with executemany
+    in one transaction on the database writer thread, with at most two
+    batches in flight. With "fail", the whole file is checked first and
+    nothing is written if any IC is already stored.
+
+    Args:
+        path (str): CSV or JSON lines file
+        db (PatientDatabase): Target database; defaults to the shared one
+        on_conflict (str): "skip", "update" or "fail" for ICs already stored
+        batch_size (int): Records per transaction
+        fmt (str): "csv" or "jsonl"; detected from the extension by default
+        progress (callable): Called with the running stats after each batch
+
+    Returns:
+        dict: records, rejected, patients_written, scans_written, seconds, records_per_sec
+
+    Raises:
+        ValueError: With "fail", if the file holds an IC that is already stored
+    """
+    if on_conflict not in CONFLICT_SQL:
+        raise ValueError(f"Unknown conflict mode: {on_conflict}")
+    db = db or get_database()
+    if on_conflict == "fail":
+        stored = find_stored_ics(db, path, fmt, batch_size)
+        if stored:
+            raise ValueError(f"{len(stored)} IC(s) already stored, e.g. {stored[0]}; nothing was imported")
+    insert_patient_sql = ('INSERT INTO patients (name, ic, dob, sex, height, weight) VALUES (?, ?, ?, ?, ?, ?) '
+                          + CONFLICT_SQL[on_conflict])
+
+    stats = dict(records=0, rejected=0, patients_written=0, scans_written=0, seconds=0.0, records_per_sec=0.0)
+    start = time.perf_counter()
+
+    def write_batch(patients, scans):
+        def run(conn):
+            written = conn.executemany(insert_patient_sql, patients).rowcount
+            return written, conn.executemany(INSERT_SCAN_SQL, scans).rowcount if scans else 0
+        return db.transaction(run)
+
+    def collect(future):
+        patients_written, scans_written = future.result()
+        stats["patients_written"] += patients_written
+        stats["scans_written"] += scans_written
+        stats["seconds"] = time.perf_counter() - start
+        stats["records_per_sec"] = stats["records"] / stats["seconds"] if stats["seconds"] > 0 else 0.0
+        if progress is not None:
+            progress(dict(stats))
+
+    in_flight = []
+    # ICs written by this import; their later records (one per further scan) only add scans
+    imported = set()
+    for batch in _batches(read_records(path, fmt), batch_size):
+        patients, scans = [], []
+        for record in batch:
+            parsed = split_record(record)
+            if parsed is None:
+                stats["rejected"] += 1
+                continue
+            if parsed[0][1] not in imported:
+                imported.add(parsed[0][1])
+                patients.append(parsed[0])
+            if parsed[1] is not None:
+                scans.append(parsed[1])
+        stats["records"] += len(batch)
+
+        # Parse the next batch while the writer commits this one
+        in_flight.append(write_batch(patients, scans))
+        if len(in_flight) >= 2:
+            collect(in_flight.pop(0))
+    for future in in_flight:
+        collect(future)
+
+    stats["seconds"] = time.perf_counter() - start
+    stats["records_per_sec"] = stats["records"] / stats["seconds"] if stats["seconds"] > 0 else 0.0
+    return stats
+
+def export_records(path, db_path=DB_PATH, fmt=None, fetch_size=2000):
+    """
+    Stream every patient joined with their scans to a file.
+
+    Patients without scans get one row with empty scan fields. Rows are read
+    with fetchmany from a read-only connection, so memory stays flat.
+
+    Returns:
+        dict: rows, seconds, rows_per_sec
+    """
+    fmt = fmt or detect_format(path)
+    start = time.perf_counter()
+    rows = 0
+    conn = connect(db_path, readonly=True)
+    try:
+        cursor = conn.execute('''
+            SELECT p.ic, p.name, p.dob, p.sex, p.height, p.weight, p.created_at,
+                   s.id, s.scan_date, s.folder_path, s.notes
+            FROM patients p LEFT JOIN mri_scans s ON s.patient_id = p.id
+            ORDER BY p.id, s.scan_date, s.id
+        ''')
+        with open(path, "w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f) if fmt == "csv" else None
+            if writer is not None:
+                writer.writerow(EXPORT_FIELDS)
+            while True:
+                batch = cursor.fetchmany(fetch_size)
+                if not batch:
+                    break
+                if writer is not None:
+                    writer.writerows(batch)
+                else:
+                    f.writelines(json.dumps(dict(zip(EXPORT_FIELDS, row))) + "\n" for row in batch)
+                rows += len(batch)
+    finally:
+        conn.close()
+
+    seconds = time.perf_counter() - start
+    return dict(rows=rows, seconds=seconds, rows_per_sec=rows / seconds if seconds > 0 else 0.0)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Bulk import/export of patients and scans")
+    sub = parser.add_subparsers(dest="command", required=True)
+    imp = sub.add_parser("import", help="Import a CSV or JSON lines file")
+    imp.add_argument("path")
+    imp.add_argument("--on-conflict", choices=sorted(CONFLICT_SQL), default="skip")
+    imp.add_argument("--batch-size", type=int, default=5000)
+    exp = sub.add_parser("export", help="Export patients joined with their scans")
+    exp.add_argument("path")
+    args = parser.parse_args(argv)
+
+    if args.command == "import":
+        stats = import_records(args.path, on_conflict=args.on_conflict, batch_size=args.batch_size,
+                               progress=lambda s: print(f"\r{s['records']} records, "
+                                                        f"{s['records_per_sec']:.0f}/s", end="", file=sys.stderr))
+        print(file=sys.stderr)
+        print(f"{stats['records']} records ({stats['rejected']} rejected): {stats['patients_written']} patients "
+              f"and {stats['scans_written']} scans written in {stats['seconds']:.1f} s "
+              f"({stats['records_per_sec']:.0f} records/s)")
+    else:
+        stats = export_records(args.path)
+        print(f"{stats['rows']} rows exported in {stats['seconds']:.1f} s ({stats['rows_per_sec']:.0f} rows/s)")
+
+if __name__ == "__main__":
+    main()
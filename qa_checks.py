@@ -0,0 +1,267 @@
+#!/usr/bin/env python3
+"""Phantom image-quality checks for every channel and slice, stored for trending."""
+
+import os
+import sqlite3
+import sys
+import threading
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+
+from dataprocessingpython import read_raw_firtech, kspace_to_image
+from raw_catalog import parse_raw_filename
+from sqlite_config import configure_connection
+
+QA_DB_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "qa_results.db")
+
+# Assumed ADC dwell time of the QA protocol; turns k-space phase slope into Hz
+DEFAULT_DWELL_TIME = 10e-6  # seconds
+
+# Pass limits; ghosting and uniformity follow the ACR phantom guidance
+QA_LIMITS = dict(
+    snr_min=20.0,
+    ghosting_max=0.025,
+    uniformity_min=87.5,  # percent integral uniformity
+    drift_max=50.0,  # Hz from the baseline run
+)
+
+# Rician background noise in magnitude images reads low by this factor (NEMA MS 1)
+RAYLEIGH_FACTOR = 0.655
+
+def qa_masks(shape):
+    """
+    ROI masks for a centred disc phantom.
+
+    Returns:
+        dict: Boolean (rows, cols) masks "signal", "noise" (corners),
+            "phase" (bands above and below the phantom, where ghosts land)
+            and "read" (bands left and right of it)
+    """
+    rows, cols = shape
+    y, x = np.mgrid[-1:1:rows * 1j, -1:1:cols * 1j]
+    radius = np.sqrt(x ** 2 + y ** 2)
+    return dict(
+        signal=radius < 0.5,
+        noise=(np.abs(x) > 0.85) & (np.abs(y) > 0.85),
+        phase=(np.abs(y) > 0.8) & (np.abs(x) < 0.4),
+        read=(np.abs(x) > 0.8) & (np.abs(y) < 0.4),
+    )
+
+def frequency_offsets(kspace, dwell_time=DEFAULT_DWELL_TIME):
+    """
+    Centre frequency offset per image from the readout phase slope.
+
+    Off-resonance adds a phase ramp of 2*pi*df*t along each readout, so the
+    mean phase step between neighbouring samples gives df.
+
+    Args:
+        kspace (np.ndarray): (images, views, samples) k-space
+        dwell_time (float): Seconds between readout samples
+
+    Returns:
+        np.ndarray: (images,) offsets in Hz
+    """
+    steps = np.sum(kspace[..., 1:] * np.conj(kspace[..., :-1]), axis=(-2, -1))
+    return np.angle(steps) / (2 * np.pi * dwell_time)
+
+def compute_metrics(images, kspace=None, dwell_time=DEFAULT_DWELL_TIME):
+    """
+    SNR, ghosting ratio and uniformity of a stack of images in one pass.
+
+    Args:
+        images (np.ndarray): (images, rows, cols) magnitude images
+        kspace (np.ndarray): Matching (images, views, samples) k-space for the
+            centre frequency; optional
+        dwell_time (float): Readout dwell time in seconds
+
+    Returns:
+        dict: (images,) arrays "snr", "ghosting", "uniformity" and, with
+            k-space, "frequency"
+    """
+    masks = qa_masks(images.shape[-2:])
+    signal = images[:, masks["signal"]]
+    noise = images[:, masks["noise"]]
+    signal_mean = signal.mean(axis=1)
+    noise_std = noise.std(axis=1) / RAYLEIGH_FACTOR
+
+    phase_mean = images[:, masks["phase"]].mean(axis=1)
+    read_mean = images[:, masks["read"]].mean(axis=1)
+
+    # Percentiles instead of extremes, so single hot pixels do not fail the check
+    low, high = np.percentile(signal, [1, 99], axis=1)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        metrics = dict(
+            snr=np.where(noise_std > 0, signal_mean / noise_std, np.inf),
+            ghosting=np.abs(phase_mean - read_mean) / (2 * signal_mean),
+            uniformity=100 * (1 - (high - low) / (high + low)),
+        )
+    if kspace is not None:
+        metrics["frequency"] = frequency_offsets(kspace, dwell_time)
+    return metrics
+
+def evaluate(metrics, baseline_frequency=None, limits=QA_LIMITS):
+    """
+    Pass/fail per image.
+
+    Args:
+        metrics (dict): Output of compute_metrics
+        baseline_frequency (np.ndarray or float): Reference centre frequency;
+            drift is only checked when given
+
+    Returns:
+        tuple: ((images,) drift array or None, (images,) boolean pass array)
+    """
+    passed = ((metrics["snr"] >= limits["snr_min"]) &
+              (metrics["ghosting"] <= limits["ghosting_max"]) &
+              (metrics["uniformity"] >= limits["uniformity_min"]))
+    drift = None
+    if baseline_frequency is not None and "frequency" in metrics:
+        drift = metrics["frequency"] - baseline_frequency
+        passed &= np.abs(drift) <= limits["drift_max"]
+    return drift, passed
+
+def load_qa_scan(raw_files):
+    """
+    Stack every channel and slice of a phantom scan.
+
+    Returns:
+        tuple: ((images, views, samples) k-space, list of (channel, slice) labels)
+    """
+    blocks, labels = [], []
+    for raw_file in raw_files:
+        raw_file = Path(raw_file)
+        fields = parse_raw_filename(raw_file.name)
+        channel = fields["channel"] if fields is not None else len(blocks)
+        data, params = read_raw_firtech(raw_file)
+        # First experiment, echo and views segment of every slice
+        blocks.append(data[0, 0, :, 0])
+        labels.extend((channel, slc) for slc in range(params["noSlices"]))
+    return np.concatenate(blocks).astype(np.complex64), labels
+
+class QAStore:
+    """SQLite history of QA runs for trending"""
+    def __init__(self, path=QA_DB_PATH):
+        # Runs are written from a worker thread and read from the GUI
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        # WAL lets readers continue while the background thread writes
+        configure_connection(self.conn)
+        self.conn.row_factory = sqlite3.Row
+        self.lock = threading.Lock()
+        with self.lock, self.conn:
+            self.conn.execute('''
+                CREATE TABLE IF NOT EXISTS qa_runs (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    run_at TEXT NOT NULL,
+                    source TEXT,
+                    passed INTEGER NOT NULL
+                )
+            ''')
+            self.conn.execute('''
+                CREATE TABLE IF NOT EXISTS qa_results (
+                    run_id INTEGER NOT NULL REFERENCES qa_runs(id),
+                    channel INTEGER NOT NULL,
+                    slice INTEGER NOT NULL,
+                    snr REAL,
+                    ghosting REAL,
+                    uniformity REAL,
+                    frequency REAL,
+                    drift REAL,
+                    passed INTEGER NOT NULL
+                )
+            ''')
+            self.conn.execute('CREATE INDEX IF NOT EXISTS idx_qa_results_run ON qa_results(run_id)')
+            self.conn.execute('CREATE INDEX IF NOT EXISTS idx_qa_results_channel ON qa_results(channel, slice, run_id)')
+
+    def baseline_frequency(self, labels):
+        """Centre frequency of the first stored run for each (channel, slice), NaN if unknown"""
+        with self.lock:
+            rows = self.conn.execute('''
+                SELECT r.channel, r.slice, r.frequency FROM qa_results r
+                JOIN (SELECT channel, slice, MIN(run_id) AS run_id FROM qa_results GROUP BY channel, slice) first
+                  ON r.channel = first.channel AND r.slice = first.slice AND r.run_id = first.run_id
+            ''').fetchall()
+        known = {(row["channel"], row["slice"]): row["frequency"] for row in rows}
+        return np.array([known.get(label, np.nan) for label in labels], dtype=np.float64)
+
+    def save_run(self, source, labels, metrics, drift, passed):
+        """Store one run and its per-image results in a single transaction"""
+        frequency = metrics.get("frequency", [None] * len(labels))
+        drift = drift if drift is not None else [None] * len(labels)
+        # Metrics are inf or NaN when the noise or signal region is empty; those are stored as NULL
+        rows = [(channel, slc, _to_float(metrics["snr"][i]), _to_float(metrics["ghosting"][i]),
+                 _to_float(metrics["uniformity"][i]), _to_float(frequency[i]), _to_float(drift[i]),
+                 int(passed[i])) for i, (channel, slc) in enumerate(labels)]
+        with self.lock, self.conn:
+            cursor = self.conn.execute('INSERT INTO qa_runs (run_at, source, passed) VALUES (?, ?, ?)',
+                                       (datetime.now().isoformat(timespec="seconds"), source, int(all(passed))))
+            run_id = cursor.lastrowid
+            self.conn.executemany('INSERT INTO qa_results VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                                  [(run_id,) + row for row in rows])
+        return run_id
+
+    def trend(self, limit=30):
+        """Per-run averages of the most recent runs, newest first"""
+        with self.lock:
+            return [dict(row) for row in self.conn.execute('''
+                SELECT q.id, q.run_at, q.source, q.passed,
+                       AVG(r.snr) AS snr, MAX(r.ghosting) AS ghosting,
+                       MIN(r.uniformity) AS uniformity, MAX(ABS(r.drift)) AS drift
+                FROM qa_runs q JOIN qa_results r ON r.run_id = q.id
+                GROUP BY q.id ORDER BY q.id DESC LIMIT ?
+            ''', (limit,))]
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+def _to_float(value):
+    if value is None or not np.isfinite(value):
+        return None
+    return float(value)
+
+def run_phantom_qa(raw_files, store=None, dwell_time=DEFAULT_DWELL_TIME, limits=QA_LIMITS):
+    """
+    Check a phantom scan across all channels and slices.
+
+    Args:
+        raw_files (list): Raw files of the scan, one per channel
+        store (QAStore): Where to record the run; None skips storing and drift
+        dwell_time (float): Readout dwell time in seconds
+        limits (dict): Pass limits, see QA_LIMITS
+
+    Returns:
+        dict: labels, metrics, drift, passed (per image) and overall "all_passed"
+    """
+    kspace, labels = load_qa_scan(raw_files)
+    # One batched FFT and one metric pass over every channel and slice
+    images = np.abs(kspace_to_image(kspace))
+    metrics = compute_metrics(images, kspace, dwell_time)
+
+    baseline = store.baseline_frequency(labels) if store is not None else None
+    if baseline is not None:
+        # Images without history set their own baseline
+        baseline = np.where(np.isnan(baseline), metrics["frequency"], baseline)
+    drift, passed = evaluate(metrics, baseline, limits)
+
+    if store is not None:
+        source = os.path.commonpath([str(Path(f).parent) for f in raw_files]) if raw_files else ""
+        store.save_run(source, labels, metrics, drift, passed)
+    return dict(labels=labels, metrics=metrics, drift=drift, passed=passed, all_passed=bool(np.all(passed)))
+
+if __name__ == "__main__":
+    # Usage: python qa_checks.py <raw file or folder> ...
+    files = []
+    for arg in sys.argv[1:] or ["Raw Data"]:
+        path = Path(arg)
+        files.extend(sorted(path.glob("*.raw")) if path.is_dir() else [path])
+    store = QAStore()
+    result = run_phantom_qa(files, store)
+    m = result["metrics"]
+    for i, (channel, slc) in enumerate(result["labels"]):
+        print(f"ch{channel} slice{slc}: SNR {m['snr'][i]:.1f}, ghosting {m['ghosting'][i]:.2%}, "
+              f"uniformity {m['uniformity'][i]:.1f}%, {'PASS' if result['passed'][i] else 'FAIL'}")
+    print("Overall:", "PASS" if result["all_passed"] else "FAIL")
+    store.close()
@@ -0,0 +1,205 @@
+# -*- coding: utf-8 -*-
+"""
+Compact archival format for FIRTECH raw k-space files.
+
+The 24-bit I/Q samples that the raw layout keeps in 4-byte slots are packed
+into 3 bytes and stored in one zlib-compressed chunk per
+(experiment, echo, slice). A JSON chunk index at the end of the archive lets
+a single slice be read with one seek. The original header and trailing bytes
+are kept, so an archive can be restored to the exact original file.
+
+Layout:
+    MAGIC | chunk 0 | chunk 1 | ... | JSON index | index offset (u64) | index length (u32) | MAGIC
+"""
+import json
+import struct
+import sys
+import zlib
+from pathlib import Path
+
+import numpy as np
+
+from dataprocessingpython import parse_params, sign_extend_24, DATA_START
+
+MAGIC = b"MRIQTARC"
+FORMAT_VERSION = 1
+ARCHIVE_SUFFIX = ".rawa"
+FOOTER = struct.Struct("<QI8s")
+
+def pack_int24(iq_u32):
+    """Keep the low 3 bytes of each little-endian 32-bit word"""
+    as_bytes = np.ascontiguousarray(iq_u32, dtype='<u4').view(np.uint8).reshape(-1, 4)
+    return as_bytes[:, :3].tobytes()
+
+def unpack_int24(buffer):
+    """Expand packed 3-byte words back to sign-extended int32"""
+    packed = np.frombuffer(buffer, dtype=np.uint8).reshape(-1, 3)
+    padded = np.zeros((packed.shape[0], 4), dtype=np.uint8)
+    padded[:, :3] = packed
+    return sign_extend_24(padded.view('<u4').ravel())
+
+def is_sign_extended(iq_u32):
+    """True if every slot's top byte is just the sign extension of bit 23"""
+    top = iq_u32 >> 24
+    return bool(np.all(top == np.where(iq_u32 & 0x00800000, 0xFF, 0x00)))
+
+def archive_raw_file(src, dst=None, compress_level=6):
+    """
+    Convert a raw file to the archival format.
+
+    Args:
+        src (str or Path): FIRTECH raw file
+        dst (str or Path): Archive path; defaults to src with ARCHIVE_SUFFIX
+        compress_level (int): zlib level 0-9; 0 stores the packed bytes only
+
+    Returns:
+        dict: Source and archive sizes in bytes and their ratio
+    """
+    src = Path(src)
+    dst = Path(dst) if dst is not None else src.with_suffix(ARCHIVE_SUFFIX)
+
+    with src.open('rb') as f:
+        params = parse_params(f)
+        f.seek(0)
+        header = f.read(DATA_START)
+        P = params
+        chunk_points = P["noViewsSec"] * P["noViews"] * P["noSamples"]
+        dt = P["dataTypeCode"]
+        if dt in (0x00, 0x02):
+            chunk_words = chunk_points * 2  # I & Q
+            word_dtype = '<u4'
+        elif dt == 0x01:
+            chunk_words = chunk_points
+            word_dtype = '<i2'
+        else:
+            raise ValueError(f"Unknown DataTypeCode: 0x{dt:02X}")
+
+        index = dict(version=FORMAT_VERSION, params=params, compress_level=compress_level,
+                     header=zlib.compress(header).hex(), chunks=[])
+
+        with dst.open('wb') as out:
+            out.write(MAGIC)
+            for exp in range(P["noExperiments"]):
+                for echo in range(P["noEchoes"]):
+                    for slc in range(P["noSlices"]):
+                        words = np.fromfile(f, dtype=word_dtype, count=chunk_words)
+                        if words.size != chunk_words:
+                            raise ValueError("File too short for declared dimensions.")
+
+                        # 24-bit I/Q loses its padding byte; anything unusual is kept verbatim
+                        if dt != 0x01 and is_sign_extended(words):
+                            encoding, payload = "int24", pack_int24(words)
+                        else:
+                            encoding, payload = "raw", words.tobytes()
+                        if compress_level > 0:
+                            payload = zlib.compress(payload, compress_level)
+
+                        index["chunks"].append(dict(key=[exp, echo, slc], offset=out.tell(),
+                                                    length=len(payload), encoding=encoding))
+                        out.write(payload)
+
+            # Bytes after the declared data (e.g. an end marker)
+            index["tail"] = f.read().hex()
+
+            index_bytes = json.dumps(index).encode("utf-8")
+            index_offset = out.tell()
+            out.write(index_bytes)
+            out.write(FOOTER.pack(index_offset, len(index_bytes), MAGIC))
+
+    src_size = src.stat().st_size
+    dst_size = dst.stat().st_size
+    return dict(source_bytes=src_size, archive_bytes=dst_size, ratio=dst_size / src_size)
+
+class RawArchive:
+    """Random-access reader for archived raw files"""
+    def __init__(self, path):
+        self.path = Path(path)
+        self.file = self.path.open('rb')
+        if self.file.read(len(MAGIC)) != MAGIC:
+            self.file.close()
+            raise ValueError(f"{self.path.name} is not a raw archive")
+
+        self.file.seek(-FOOTER.size, 2)
+        index_offset, index_length, magic = FOOTER.unpack(self.file.read(FOOTER.size))
+        if magic != MAGIC:
+            self.file.close()
+            raise ValueError(f"{self.path.name} is truncated")
+        self.file.seek(index_offset)
+        self.index = json.loads(self.file.read(index_length).decode("utf-8"))
+        self.params = self.index["params"]
+        self.chunks = {tuple(chunk["key"]): chunk for chunk in self.index["chunks"]}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.file.close()
+
+    def _chunk_words(self, key):
+        """Stored words of one chunk: int32 for packed chunks, the original dtype otherwise"""
+        chunk = self.chunks[key]
+        self.file.seek(chunk["offset"])
+        payload = self.file.read(chunk["length"])
+        if self.index["compress_level"] > 0:
+            payload = zlib.decompress(payload)
+        if chunk["encoding"] == "int24":
+            return unpack_int24(payload)
+        if self.params["dataTypeCode"] == 0x01:
+            return np.frombuffer(payload, dtype='<i2')
+        return np.frombuffer(payload, dtype='<u4')
+
+    def read_chunk(self, experiment=0, echo=0, slice_index=0):
+        """
+        Decode one (experiment, echo, slice) block.
+
+        Returns:
+            np.ndarray: (viewsSec, views, samples), complex64 for I/Q data or
+                float32 for ADC data, matching read_raw_firtech
+        """
+        P = self.params
+        key = (experiment, echo, slice_index)
+        words = self._chunk_words(key)
+        if P["dataTypeCode"] == 0x01:
+            data = words.astype(np.float32)
+        else:
+            if self.chunks[key]["encoding"] == "raw":
+                words = sign_extend_24(words)
+            data = words[0::2].astype(np.float32) + 1j * words[1::2].astype(np.float32)
+        return data.reshape(P["noViewsSec"], P["noViews"], P["noSamples"])
+
+    def read_all(self):
+        """Decode the whole archive into the read_raw_firtech layout"""
+        P = self.params
+        blocks = [self.read_chunk(*key) for key in sorted(self.chunks)]
+        data = np.stack(blocks).reshape(P["noExperiments"], P["noEchoes"], P["noSlices"],
+                                        P["noViewsSec"], P["noViews"], P["noSamples"])
+        return data, dict(P)
+
+    def restore(self, dst):
+        """Write the original raw file back out byte for byte"""
+        with Path(dst).open('wb') as out:
+            out.write(zlib.decompress(bytes.fromhex(self.index["header"])))
+            for key in sorted(self.chunks):
+                words = self._chunk_words(key)
+                if self.chunks[key]["encoding"] == "int24":
+                    # Sign extension recreates the padding byte exactly
+                    words = words.astype('<i4')
+                out.write(words.tobytes())
+            out.write(bytes.fromhex(self.index["tail"]))
+
+if __name__ == "__main__":
+    # Usage: python raw_archive.py <raw folder> [archive folder]
+    src_folder = Path(sys.argv[1] if len(sys.argv) > 1 else "Raw Data")
+    dst_folder = Path(sys.argv[2]) if len(sys.argv) > 2 else src_folder
+    dst_folder.mkdir(parents=True, exist_ok=True)
+    total_src = total_dst = 0
+    for raw_file in sorted(src_folder.glob("*.raw")):
+        stats = archive_raw_file(raw_file, dst_folder / (raw_file.stem + ARCHIVE_SUFFIX))
+        total_src += stats["source_bytes"]
+        total_dst += stats["archive_bytes"]
+        print(f"{raw_file.name}: {stats['source_bytes']} -> {stats['archive_bytes']} bytes ({stats['ratio']:.1%})")
+    if total_src:
+        print(f"Total: {total_src} -> {total_dst} bytes ({total_dst / total_src:.1%})")
@@ -0,0 +1,318 @@
+#!/usr/bin/env python3
+"""Indexed catalog of raw k-space files, kept current by a directory watcher."""
+
+import ctypes
+import ctypes.util
+import os
+import re
+import select
+import sqlite3
+import struct
+import sys
+import threading
+from datetime import datetime
+from pathlib import Path
+
+from dataprocessingpython import parse_params
+from sqlite_config import configure_connection
+
+CATALOG_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "raw_catalog.db")
+
+# e.g. M_board0_ch1_2025.12.3.10.32.20.539.raw
+RAW_NAME_PATTERN = re.compile(
+    r"^M_board(?P<board>\d+)_ch(?P<channel>\d+)_"
+    r"(?P<stamp>(\d+)\.(\d+)\.(\d+)\.(\d+)\.(\d+)\.(\d+)\.(\d+))\.raw$"
+)
+
+HEADER_FIELDS = ["noSamples", "noViews", "noViewsSec", "noSlices", "noEchoes",
+                 "noExperiments", "dataTypeCode"]
+
+def parse_raw_filename(name):
+    """
+    Parse board, channel and acquisition time from a raw file name.
+
+    Returns:
+        dict: board, channel, acquired_at (ISO string) and scan_key, or None
+            if the name does not follow the M_board<b>_ch<c>_<timestamp> layout
+    """
+    match = RAW_NAME_PATTERN.match(name)
+    if match is None:
+        return None
+    year, month, day, hour, minute, second, ms = (int(v) for v in match.group("stamp").split("."))
+    try:
+        acquired_at = datetime(year, month, day, hour, minute, second, ms * 1000)
+    except ValueError:
+        return None
+    return dict(
+        board=int(match.group("board")),
+        channel=int(match.group("channel")),
+        acquired_at=acquired_at.isoformat(timespec="milliseconds"),
+        # Every channel of one scan shares the same timestamp
+        scan_key=match.group("stamp"),
+    )
+
+class RawCatalog:
+    """SQLite table of raw files with parsed name fields and header parameters"""
+    def __init__(self, path=CATALOG_PATH):
+        # Shared by the GUI thread and the watcher thread
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        # WAL lets readers continue while the background thread writes
+        configure_connection(self.conn)
+        self.conn.row_factory = sqlite3.Row
+        self.lock = threading.Lock()
+        with self.lock, self.conn:
+            self.conn.execute('''
+                CREATE TABLE IF NOT EXISTS raw_files (
+                    path TEXT PRIMARY KEY,
+                    directory TEXT NOT NULL,
+                    board INTEGER,
+                    channel INTEGER,
+                    acquired_at TEXT,
+                    scan_key TEXT,
+                    size INTEGER NOT NULL,
+                    mtime REAL NOT NULL,
+                    noSamples INTEGER,
+                    noViews INTEGER,
+                    noViewsSec INTEGER,
+                    noSlices INTEGER,
+                    noEchoes INTEGER,
+                    noExperiments INTEGER,
+                    dataTypeCode INTEGER
+                )
+            ''')
+            self.conn.execute('CREATE INDEX IF NOT EXISTS idx_raw_files_dir_time ON raw_files(directory, acquired_at)')
+            self.conn.execute('CREATE INDEX IF NOT EXISTS idx_raw_files_time ON raw_files(acquired_at)')
+            self.conn.execute('CREATE INDEX IF NOT EXISTS idx_raw_files_scan ON raw_files(scan_key, channel)')
+
+    @staticmethod
+    def _describe(path, stat):
+        """Build a catalog row, reading only the file header"""
+        fields = parse_raw_filename(path.name) or dict(board=None, channel=None, acquired_at=None, scan_key=None)
+        try:
+            with path.open('rb') as f:
+                params = parse_params(f)
+        except OSError:
+            params = dict.fromkeys(HEADER_FIELDS)
+        return (str(path), str(path.parent), fields["board"], fields["channel"], fields["acquired_at"],
+                fields["scan_key"], stat.st_size, stat.st_mtime) + tuple(params[k] for k in HEADER_FIELDS)
+
+    def add_files(self, paths):
+        """Insert or refresh catalog entries for the given files in one transaction"""
+        rows = []
+        for path in paths:
+            path = Path(path).resolve()
+            try:
+                rows.append(self._describe(path, path.stat()))
+            except OSError:
+                continue
+        with self.lock, self.conn:
+            self.conn.executemany(
+                'INSERT OR REPLACE INTO raw_files VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)', rows
+            )
+
+    def remove_files(self, paths):
+        with self.lock, self.conn:
+            self.conn.executemany('DELETE FROM raw_files WHERE path = ?',
+                                  [(str(Path(p).resolve()),) for p in paths])
+
+    def sync_directory(self, directory):
+        """
+        Bring the catalog in line with a directory.
+
+        Only files whose size or mtime changed have their headers re-read.
+
+        Returns:
+            tuple: (added or updated count, removed count)
+        """
+        directory = Path(directory).resolve()
+        on_disk = {}
+        if directory.is_dir():
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    if entry.name.endswith('.raw') and entry.is_file():
+                        on_disk[str(directory / entry.name)] = entry.stat()
+
+        with self.lock:
+            known = {row["path"]: (row["size"], row["mtime"]) for row in self.conn.execute(
+                'SELECT path, size, mtime FROM raw_files WHERE directory = ?', (str(directory),))}
+
+        changed = [path for path, stat in on_disk.items()
+                   if known.get(path) != (stat.st_size, stat.st_mtime)]
+        removed = [path for path in known if path not in on_disk]
+        if changed:
+            self.add_files(changed)
+        if removed:
+            self.remove_files(removed)
+        return len(changed), len(removed)
+
+    def _query(self, sql, params=()):
+        with self.lock:
+            return [dict(row) for row in self.conn.execute(sql, params)]
+
+    def files_in_directory(self, directory):
+        """All cataloged raw files of a directory, oldest first"""
+        return self._query('SELECT * FROM raw_files WHERE directory = ? ORDER BY acquired_at, channel',
+                           (str(Path(directory).resolve()),))
+
+    def latest_scan(self, directory=None):
+        """All channels of the most recent scan, optionally within one directory"""
+        if directory is None:
+            where, params = 'acquired_at IS NOT NULL', ()
+        else:
+            where, params = 'directory = ? AND acquired_at IS NOT NULL', (str(Path(directory).resolve()),)
+        latest = self._query(f'SELECT scan_key FROM raw_files WHERE {where} ORDER BY acquired_at DESC LIMIT 1', params)
+        if not latest:
+            return []
+        return self.scan_files(latest[0]["scan_key"])
+
+    def scan_files(self, scan_key):
+        """All channels recorded for one scan"""
+        return self._query('SELECT * FROM raw_files WHERE scan_key = ? ORDER BY board, channel', (scan_key,))
+
+    def files_between(self, start, end):
+        """
+        Files acquired in [start, end).
+
+        Args:
+            start, end (datetime or str): Range bounds; strings use ISO format
+        """
+        if isinstance(start, datetime):
+            start = start.isoformat(timespec="milliseconds")
+        if isinstance(end, datetime):
+            end = end.isoformat(timespec="milliseconds")
+        return self._query('SELECT * FROM raw_files WHERE acquired_at >= ? AND acquired_at < ? '
+                           'ORDER BY acquired_at, channel', (start, end))
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+# inotify event masks (linux/inotify.h)
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_DELETE = 0x00000200
+IN_NONBLOCK = 0o4000
+INOTIFY_EVENT = struct.Struct("iIII")
+
+class RawDirectoryWatcher:
+    """
+    Keeps a RawCatalog in sync with a set of directories.
+
+    On Linux, inotify reports finished writes, renames and deletes, so only
+    the affected files are touched. Elsewhere, or if inotify is unavailable,
+    the directories are re-synced every poll_interval seconds.
+
+    Listeners are called on the watcher thread with the files inotify
+    reports as written; they are not called in polling mode.
+    """
+    def __init__(self, catalog, directories, poll_interval=2.0):
+        self.catalog = catalog
+        self.directories = [Path(d).resolve() for d in directories]
+        self.poll_interval = poll_interval
+        self.stop_event = threading.Event()
+        self.synced = threading.Event()  # set once the first full sync is done
+        self.thread = None
+        self.mode = None
+        self.listeners = []
+
+    def add_listener(self, callback):
+        """Call callback(paths) with every batch of raw files reported as written"""
+        self.listeners.append(callback)
+
+    def remove_listener(self, callback):
+        if callback in self.listeners:
+            self.listeners.remove(callback)
+
+    def watches(self, directory):
+        """True if finished writes in directory are reported to listeners"""
+        return self.mode == "inotify" and Path(directory).resolve() in self.directories
+
+    def start(self):
+        """Sync once, then watch in a background thread"""
+        for directory in self.directories:
+            directory.mkdir(parents=True, exist_ok=True)
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self._run, name="raw-catalog-watcher", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+
+    def _sync_all(self):
+        for directory in self.directories:
+            try:
+                self.catalog.sync_directory(directory)
+            except Exception as e:
+                print(f"Error cataloguing {directory}: {str(e)}")
+
+    def _run(self):
+        self._sync_all()
+        self.synced.set()
+        if sys.platform.startswith("linux") and self._watch_inotify():
+            return
+        self.mode = "polling"
+        while not self.stop_event.wait(self.poll_interval):
+            self._sync_all()
+
+    def _watch_inotify(self):
+        """Watch with inotify; returns False if it could not be set up"""
+        try:
+            libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+            fd = libc.inotify_init1(IN_NONBLOCK)
+        except (OSError, AttributeError):
+            return False
+        if fd < 0:
+            return False
+
+        mask = IN_CLOSE_WRITE | IN_MOVED_TO | IN_MOVED_FROM | IN_DELETE
+        watches = {}
+        for directory in self.directories:
+            wd = libc.inotify_add_watch(fd, os.fsencode(directory), mask)
+            if wd < 0:
+                os.close(fd)
+                return False
+            watches[wd] = directory
+
+        self.mode = "inotify"
+        try:
+            # Files written between the initial sync and the watches being added
+            self._sync_all()
+            while not self.stop_event.is_set():
+                ready, _, _ = select.select([fd], [], [], 0.5)
+                if not ready:
+                    continue
+                try:
+                    buffer = os.read(fd, 64 * 1024)
+                except BlockingIOError:
+                    continue
+
+                added, removed = set(), set()
+                offset = 0
+                while offset < len(buffer):
+                    wd, event_mask, _, length = INOTIFY_EVENT.unpack_from(buffer, offset)
+                    name = buffer[offset + INOTIFY_EVENT.size:offset + INOTIFY_EVENT.size + length]
+                    offset += INOTIFY_EVENT.size + length
+                    name = os.fsdecode(name.rstrip(b"\0"))
+                    if not name.endswith(".raw") or wd not in watches:
+                        continue
+                    path = watches[wd] / name
+                    if event_mask & (IN_CLOSE_WRITE | IN_MOVED_TO):
+                        added.add(path)
+                        removed.discard(path)
+                    else:
+                        removed.add(path)
+                        added.discard(path)
+
+                if added:
+                    self.catalog.add_files(added)
+                    for listener in list(self.listeners):
+                        listener(added)
+                if removed:
+                    self.catalog.remove_files(removed)
+        finally:
+            os.close(fd)
+        return True
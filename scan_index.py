@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""Per-image metadata of saved scans: collected once on save, read back with one query."""
+
+import hashlib
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import pydicom
+
+IMAGE_COLUMNS = ["path", "instance_number", "position_x", "position_y", "position_z",
+                 "rows", "cols", "window_center", "window_width", "checksum", "mtime"]
+
+def new_hasher():
+    """Hash object used for every file checksum and scan store digest"""
+    return hashlib.blake2b(digest_size=20)
+
+def file_checksum(path, chunk_size=1 << 20):
+    """BLAKE2b of a file, read in chunks"""
+    digest = new_hasher()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def _first_value(value):
+    """Window tags may be multi-valued; keep the first as a float"""
+    if value is None:
+        return None
+    if isinstance(value, pydicom.multival.MultiValue):
+        value = value[0] if len(value) else None
+    return float(value) if value is not None else None
+
+def read_image_metadata(path, checksum=None):
+    """
+    Header fields and checksum of one DICOM file, without decoding pixels.
+
+    Args:
+        path (str): DICOM file
+        checksum (str): Digest already computed, e.g. while storing the file
+
+    Returns:
+        tuple: Values in IMAGE_COLUMNS order
+    """
+    mtime = os.path.getmtime(path)
+    header = pydicom.dcmread(path, stop_before_pixels=True)
+    position = header.get("ImagePositionPatient")
+    position = [float(v) for v in position] if position is not None and len(position) == 3 else [None] * 3
+    instance = header.get("InstanceNumber")
+    return (
+        os.path.abspath(path),
+        int(instance) if instance is not None else None,
+        *position,
+        header.get("Rows"),
+        header.get("Columns"),
+        _first_value(header.get("WindowCenter")),
+        _first_value(header.get("WindowWidth")),
+        checksum or file_checksum(path),
+        mtime,
+    )
+
+def _read_all_metadata(files, workers=4, checksums=None):
+    """Metadata of every file in parallel, in file order; None for files that fail"""
+    checksums = checksums or {}
+
+    def read(path):
+        try:
+            return read_image_metadata(path, checksums.get(path))
+        except Exception as e:
+            print(f"Error reading metadata of {path}: {str(e)}")
+            return None
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(read, files))
+
+def collect_image_metadata(files, workers=4, checksums=None):
+    """Read metadata for every file in parallel; files that fail are skipped"""
+    return [row for row in _read_all_metadata(files, workers, checksums) if row is not None]
+
+def save_scan(db, patient_id, scan_date, folder_path, notes, files, store=None):
+    """
+    Register a scan and all of its images in one transaction.
+
+    With a store, the files are ingested first and the images point at the
+    stored objects, so the scan survives its source folder being moved or
+    edited. folder_path is kept as where the scan came from.
+
+    Blocks while files are stored and read, so call it off the GUI thread.
+
+    Returns:
+        tuple: (scan id, number of images recorded, number already in the store)
+    """
+    objects = store.ingest(files, store.suspect_digests(db.reader())) if store is not None else []
+    if objects:
+        rows = _read_all_metadata([obj["path"] for obj in objects],
+                                  checksums={obj["path"]: obj["digest"] for obj in objects})
+        # Identical files share one stored object, so each row takes its source from its own object
+        images = [row + (os.path.abspath(obj["source"]),) for row, obj in zip(rows, objects) if row is not None]
+    else:
+        images = [row + (row[0],) for row in collect_image_metadata(files)]
+
+    def insert(conn):
+        if objects:
+            store.register(conn, objects)
+        scan_id = conn.execute('''
+            INSERT INTO mri_scans (patient_id, scan_date, folder_path, notes)
+            VALUES (?, ?, ?, ?)
+        ''', (patient_id, scan_date, folder_path, notes)).lastrowid
+        conn.executemany(
+            f"INSERT INTO scan_images (scan_id, {', '.join(IMAGE_COLUMNS)}, source_path) "
+            f"VALUES (?, {', '.join('?' * len(IMAGE_COLUMNS))}, ?)",
+            [(scan_id,) + row for row in images]
+        )
+        return scan_id, len(images), sum(obj["deduplicated"] for obj in objects)
+
+    return db.transaction(insert).result()
+
+def scan_images(conn, scan_id):
+    """
+    Stored images of a scan in instance order.
+
+    Returns:
+        list: dicts with the IMAGE_COLUMNS fields
+    """
+    rows = conn.execute(
+        f"SELECT {', '.join(IMAGE_COLUMNS)} FROM scan_images WHERE scan_id = ? ORDER BY instance_number, path",
+        (scan_id,)
+    ).fetchall()
+    return [dict(zip(IMAGE_COLUMNS, row)) for row in rows]
+
+def is_stale(image):
+    """True if the file is gone or its mtime no longer matches the stored one"""
+    try:
+        return os.path.getmtime(image["path"]) != image["mtime"]
+    except OSError:
+        return True
@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+"""
+Content-addressed storage for scan files.
+
+Files are stored once under objects/<first 2 hex digits>/<digest>, named
+by the BLAKE2b digest of their content, so identical images exported
+several times take the space of one. Objects are written to a temporary
+name and renamed into place. Several consoles can therefore ingest into
+the same shared store at once. Digests are kept in the store_objects table
+and re-checked in the background by StoreVerifier.
+"""
+
+import os
+import sys
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+
+from scan_index import file_checksum, new_hasher
+
+STORE_ENV_VAR = "MRIQT_SCAN_STORE"
+DEFAULT_STORE_ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "Scan Store")
+
+class ScanStore:
+    """A content-addressed object directory, local or on shared storage"""
+    def __init__(self, root=None, mode="copy", workers=4):
+        """
+        Args:
+            root (str): Store directory; defaults to MRIQT_SCAN_STORE, then "Scan Store"
+            mode (str): "copy", or "link" to hard-link when source and store share a
+                filesystem. Linked objects change if the source is edited in place,
+                which verification then reports as corrupt.
+            workers (int): Files hashed and stored in parallel
+        """
+        self.root = Path(root or os.environ.get(STORE_ENV_VAR) or DEFAULT_STORE_ROOT).resolve()
+        self.mode = mode
+        self.workers = workers
+        (self.root / "objects").mkdir(parents=True, exist_ok=True)
+        (self.root / "tmp").mkdir(exist_ok=True)
+
+    def object_path(self, digest):
+        return self.root / "objects" / digest[:2] / digest
+
+    def _copy_hashing(self, source, tmp, chunk_size=1 << 20):
+        """Copy a file and hash the bytes copied, so the digest always matches the copy"""
+        digest, size = new_hasher(), 0
+        with open(source, "rb") as src, open(tmp, "wb") as dst:
+            for chunk in iter(lambda: src.read(chunk_size), b""):
+                digest.update(chunk)
+                dst.write(chunk)
+                size += len(chunk)
+        return digest.hexdigest(), size
+
+    def ingest_file(self, source, suspect=frozenset()):
+        """
+        Hash one file into a temporary object and keep it unless the store already has it.
+
+        Args:
+            source (str): File to ingest
+            suspect (set): Digests whose stored object is known to be missing or
+                corrupt; these are replaced instead of reused
+
+        Returns:
+            dict: source, digest, path (stored object), size, deduplicated
+        """
+        tmp = self.root / "tmp" / f"{os.getpid()}.{uuid.uuid4().hex}"
+        try:
+            linked = False
+            if self.mode == "link":
+                try:
+                    # Hash the link itself, so the name matches what was linked
+                    os.link(source, tmp)
+                    digest, size = file_checksum(tmp), os.path.getsize(tmp)
+                    linked = True
+                except OSError:
+                    # Different filesystem or no hard-link support: fall back to a copy
+                    tmp.unlink(missing_ok=True)
+            if not linked:
+                digest, size = self._copy_hashing(source, tmp)
+                os.chmod(tmp, 0o444)
+
+            target = self.object_path(digest)
+            reuse = digest not in suspect and target.exists() and target.stat().st_size == size
+            if not reuse:
+                target.parent.mkdir(exist_ok=True)
+                try:
+                    # Windows refuses to replace a read-only file, such as a suspect object being repaired
+                    os.chmod(target, 0o644)
+                except FileNotFoundError:
+                    pass
+                # Another console may store the same object meanwhile; the content is identical
+                os.replace(tmp, target)
+        finally:
+            tmp.unlink(missing_ok=True)
+        return dict(source=str(source), digest=digest, path=str(target), size=size, deduplicated=reuse)
+
+    def ingest(self, files, suspect=frozenset()):
+        """Hash and store files in parallel, keeping their order"""
+        suspect = frozenset(suspect)
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            return list(pool.map(lambda path: self.ingest_file(path, suspect), files))
+
+    def suspect_digests(self, conn):
+        """Digests the verifier found missing or corrupt"""
+        return {row[0] for row in conn.execute("SELECT digest FROM store_objects WHERE status != 'ok'")}
+
+    def register(self, conn, objects):
+        """Record ingested objects inside the caller's transaction"""
+        now = datetime.now().isoformat(timespec="seconds")
+        conn.executemany('''
+            INSERT OR IGNORE INTO store_objects (digest, size, path, created_at, status)
+            VALUES (?, ?, ?, ?, 'ok')
+        ''', [(obj["digest"], obj["size"], obj["path"], now) for obj in objects])
+        # Objects written by this ingest replace whatever was there, including bad copies
+        conn.executemany(
+            "UPDATE store_objects SET status = 'ok', verified_at = NULL, size = ? WHERE digest = ?",
+            [(obj["size"], obj["digest"]) for obj in objects if not obj["deduplicated"]]
+        )
+
+    def verify_object(self, digest):
+        """'ok', 'missing' or 'corrupt' for a stored object"""
+        path = self.object_path(digest)
+        try:
+            return "ok" if file_checksum(path) == digest else "corrupt"
+        except FileNotFoundError:
+            return "missing"
+
+class StoreVerifier:
+    """
+    Background thread that re-hashes stored objects, least recently verified first.
+
+    Work is done in small batches with a pause after each file, so
+    verification stays out of the way of scanning and viewing.
+    """
+    def __init__(self, db, store, interval=3600.0, batch_size=100, pause=0.05):
+        self.db = db
+        self.store = store
+        self.interval = interval
+        self.batch_size = batch_size
+        self.pause = pause
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    def start(self):
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self._run, name="scan-store-verifier", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+
+    def verify_batch(self, cutoff=None):
+        """
+        Check up to batch_size objects not verified since cutoff.
+
+        Args:
+            cutoff (str): ISO time; defaults to interval seconds ago
+
+        Returns:
+            dict: status -> count for this batch
+        """
+        if cutoff is None:
+            cutoff = datetime.fromtimestamp(time.time() - self.interval).isoformat(timespec="seconds")
+        rows = self.db.read('''
+            SELECT digest FROM store_objects
+            WHERE verified_at IS NULL OR verified_at < ?
+            ORDER BY verified_at LIMIT ?
+        ''', (cutoff, self.batch_size))
+        results, counts = [], {}
+        for (digest,) in rows:
+            if self.stop_event.is_set():
+                break
+            status = self.store.verify_object(digest)
+            results.append((status, datetime.now().isoformat(timespec="seconds"), digest))
+            counts[status] = counts.get(status, 0) + 1
+            if status != "ok":
+                print(f"Scan store object {digest} is {status}")
+            self.stop_event.wait(self.pause)
+        if results:
+            # Wait for the commit so the next batch moves on to other objects
+            self.db.write_many('UPDATE store_objects SET status = ?, verified_at = ? WHERE digest = ?', results).result()
+        return counts
+
+    def _run(self):
+        while not self.stop_event.is_set():
+            try:
+                counts = self.verify_batch()
+            except Exception as e:
+                print(f"Error verifying scan store: {str(e)}")
+                counts = {}
+            # A short batch means nothing else is due; check again later
+            if sum(counts.values()) < self.batch_size:
+                self.stop_event.wait(self.interval)
+
+if __name__ == "__main__":
+    # Usage: python scan_store.py <folder> ...  (ingest and register the files)
+    #        python scan_store.py --verify     (check every stored object once)
+    from patient_db import get_database
+    db = get_database()
+    store = ScanStore()
+    start = time.perf_counter()
+    if sys.argv[1:] == ["--verify"]:
+        verifier = StoreVerifier(db, store, pause=0)
+        cutoff = datetime.now().isoformat(timespec="seconds")
+        counts = {}
+        while True:
+            batch = verifier.verify_batch(cutoff)
+            for status, count in batch.items():
+                counts[status] = counts.get(status, 0) + count
+            if sum(batch.values()) < verifier.batch_size:
+                break
+        total = sum(counts.values())
+        db.flush()
+        print(f"{total} objects verified in {time.perf_counter() - start:.1f} s: {counts}")
+    else:
+        files = [p for arg in sys.argv[1:] for p in sorted(Path(arg).rglob("*")) if p.is_file()]
+        objects = store.ingest(files, store.suspect_digests(db.reader()))
+        db.transaction(lambda conn: store.register(conn, objects)).result()
+        deduplicated = [obj for obj in objects if obj["deduplicated"]]
+        print(f"{len(objects)} files, {len(deduplicated)} already stored "
+              f"({sum(obj['size'] for obj in deduplicated) / 1e6:.1f} MB saved) "
+              f"in {time.perf_counter() - start:.1f} s -> {store.root}")
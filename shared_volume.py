@@ -0,0 +1,216 @@
+# -*- coding: utf-8 -*-
+"""
+Shared-memory transport for reconstructed volumes.
+
+Reconstruction processes write k-space and images straight into
+multiprocessing.shared_memory segments and return only a small descriptor.
+The viewer adopts the segments through a SharedVolumeRegistry and wraps
+them as numpy arrays without copying. The registry reference-counts each
+segment and unlinks it when the last reference is released.
+
+Segments are named mriqt_<viewer pid>_<id>. If the viewer crashes, the next
+start removes its leftovers with cleanup_stale_segments().
+"""
+import atexit
+import os
+import threading
+import uuid
+from multiprocessing import shared_memory
+from pathlib import Path
+
+import numpy as np
+
+from dataprocessingpython import read_raw_firtech
+
+SEGMENT_PREFIX = "mriqt_"
+SHM_DIR = "/dev/shm"
+
+# On Windows a segment dies with its last handle, so workers keep theirs open until they exit
+_worker_handles = []
+
+def _open_segment(name, create=False, size=0):
+    """Open a segment without the resource tracker unlinking it behind our back"""
+    try:
+        return shared_memory.SharedMemory(name=name, create=create, size=size, track=False)
+    except TypeError:
+        # Python < 3.13 has no track argument; unregister by hand instead
+        shm = shared_memory.SharedMemory(name=name, create=create, size=size)
+        if os.name == "posix":
+            from multiprocessing import resource_tracker
+            resource_tracker.unregister(shm._name, "shared_memory")
+        return shm
+
+class SharedVolume:
+    """A numpy array living in a named shared-memory segment"""
+    def __init__(self, shm, shape, dtype):
+        self.shm = shm
+        self.name = shm.name
+        self.shape = tuple(shape)
+        self.dtype = np.dtype(dtype)
+        self.array = np.ndarray(self.shape, dtype=self.dtype, buffer=shm.buf)
+
+    @classmethod
+    def create(cls, shape, dtype, owner_pid=None):
+        """Allocate a new segment named after the process that will own it"""
+        owner_pid = owner_pid if owner_pid is not None else os.getpid()
+        name = f"{SEGMENT_PREFIX}{owner_pid}_{uuid.uuid4().hex[:12]}"
+        size = max(1, int(np.prod(shape)) * np.dtype(dtype).itemsize)
+        return cls(_open_segment(name, create=True, size=size), shape, dtype)
+
+    @classmethod
+    def attach(cls, descriptor):
+        """Map an existing segment from its descriptor"""
+        return cls(_open_segment(descriptor["name"]), descriptor["shape"], descriptor["dtype"])
+
+    def descriptor(self):
+        """Picklable description that another process can attach to"""
+        return dict(name=self.name, shape=self.shape, dtype=self.dtype.str)
+
+    def close(self):
+        """Drop this process's mapping; the segment itself stays"""
+        self.array = None
+        self.shm.close()
+
+    def unlink(self):
+        """Remove the segment once every process has closed it"""
+        try:
+            self.shm.unlink()
+        except FileNotFoundError:
+            pass
+
+class SharedVolumeRegistry:
+    """Reference-counted owner of shared volumes on the viewer side"""
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.volumes = {}
+        self.refcounts = {}
+        atexit.register(self.release_all)
+
+    def adopt(self, descriptor):
+        """Take ownership of a segment created by a worker; starts with one reference"""
+        volume = SharedVolume.attach(descriptor)
+        with self.lock:
+            self.volumes[volume.name] = volume
+            self.refcounts[volume.name] = 1
+        return volume
+
+    def acquire(self, name):
+        with self.lock:
+            self.refcounts[name] += 1
+            return self.volumes[name]
+
+    def release(self, name):
+        """Drop one reference; the segment is unlinked when none are left"""
+        with self.lock:
+            self.refcounts[name] -= 1
+            if self.refcounts[name] > 0:
+                return
+            del self.refcounts[name]
+            volume = self.volumes.pop(name)
+        try:
+            volume.close()
+        except BufferError:
+            # A numpy view is still alive; the mapping goes away with it
+            pass
+        volume.unlink()
+
+    def release_all(self):
+        """Unlink every owned segment, e.g. at exit"""
+        with self.lock:
+            volumes = list(self.volumes.values())
+            self.volumes.clear()
+            self.refcounts.clear()
+        for volume in volumes:
+            try:
+                volume.close()
+            except BufferError:
+                # Still exported somewhere; unlinking alone frees it once unmapped
+                pass
+            volume.unlink()
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+def cleanup_stale_segments():
+    """
+    Unlink segments left behind by viewers that are no longer running.
+
+    Only POSIX systems keep orphaned segments; on Windows they disappear
+    with the last handle.
+
+    Returns:
+        int: Number of segments removed
+    """
+    if not os.path.isdir(SHM_DIR):
+        return 0
+    removed = 0
+    for entry in os.listdir(SHM_DIR):
+        if not entry.startswith(SEGMENT_PREFIX):
+            continue
+        try:
+            pid = int(entry[len(SEGMENT_PREFIX):].split("_", 1)[0])
+        except ValueError:
+            continue
+        if pid != os.getpid() and not _pid_alive(pid):
+            try:
+                os.unlink(os.path.join(SHM_DIR, entry))
+                removed += 1
+            except OSError:
+                pass
+    return removed
+
+def reconstruct_to_shared(raw_file, owner_pid):
+    """
+    Reconstruct a raw file inside a worker process into shared memory.
+
+    Args:
+        raw_file (str): Path to a FIRTECH raw file
+        owner_pid (int): PID of the viewer that will adopt the segments
+
+    Returns:
+        dict: Descriptors for "kspace" (complex64), "image" (float32) and
+            "preview" (uint8, ready for display)
+    """
+    data, params = read_raw_firtech(Path(raw_file))
+    views = data[0, 0, 0, 0, :, :]
+    created = []
+    try:
+        kspace = SharedVolume.create(views.shape, np.complex64, owner_pid)
+        created.append(kspace)
+        kspace.array[...] = views
+
+        # Same steps as reconstruct_raw_file, writing the magnitude straight into shared memory
+        image = SharedVolume.create(views.shape, np.float32, owner_pid)
+        created.append(image)
+        np.abs(np.fft.ifftshift(np.fft.ifft2(np.flipud(views))), out=image.array, casting="same_kind")
+
+        preview = SharedVolume.create(views.shape, np.uint8, owner_pid)
+        created.append(preview)
+        image_min = image.array.min()
+        image_range = image.array.max() - image_min
+        if image_range > 0:
+            np.multiply(image.array - image_min, 255 / image_range, out=preview.array, casting="unsafe")
+        else:
+            preview.array[...] = 0
+
+        return dict(kspace=kspace.descriptor(), image=image.descriptor(), preview=preview.descriptor())
+    except BaseException:
+        for volume in created:
+            volume.close()
+            volume.unlink()
+        raise
+    finally:
+        # The viewer maps the segments itself; this process only needs to let go
+        for volume in created:
+            if volume.array is None:
+                continue
+            if os.name == "nt":
+                _worker_handles.append(volume)
+            else:
+                volume.close()
@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""Long-lived spectrometer session that initializes once and monitors health."""
+
+import threading
+import time
+
+DEFAULT_INIT_FILE = "C:\\Users\\bysu\\Downloads\\SpectrometerIDE\\dll\\hw_cfg\\init.ini"
+DEFAULT_CONFIG_FILE = "./hw_cfg/init.ini"
+
+class SpectrometerSession:
+    """
+    Keeps the spectrometer initialized and configured between connection checks.
+
+    Init and configuration happen once; afterwards a background thread runs a
+    cheap GetTotalCh query every health_interval seconds. Only when that fails
+    is the system re-initialized, with exponential backoff between attempts.
+    """
+    def __init__(self, module, init_file=DEFAULT_INIT_FILE, config_file=DEFAULT_CONFIG_FILE,
+                 total_channels=16, channel_selection="255", save_mode=1,
+                 output_path="./output", health_interval=5.0, max_backoff=60.0,
+                 on_state_change=None):
+        self.module = module
+        self.init_file = init_file
+        self.config_file = config_file
+        self.total_channels = total_channels
+        self.channel_selection = channel_selection
+        self.save_mode = save_mode
+        self.output_path = output_path
+        self.health_interval = health_interval
+        self.max_backoff = max_backoff
+        self.on_state_change = on_state_change
+
+        self.connected = False
+        self.last_error = None
+        self.last_health_check = None
+        self.consecutive_failures = 0
+
+        # The hardware library is not re-entrant, so every call goes through this lock
+        self.lock = threading.RLock()
+        self.stop_event = threading.Event()
+        self.monitor_thread = None
+
+    def _set_state(self, state):
+        if self.on_state_change is not None:
+            self.on_state_change(state)
+
+    def connect(self):
+        """
+        Make sure the system is initialized and configured.
+
+        Returns:
+            int: 0 on success, otherwise the Init error code
+        """
+        with self.lock:
+            if self.connected and self.check_health():
+                return 0
+
+            self._set_state("connecting")
+            ret = self._initialize()
+            self._set_state("connected" if ret == 0 else "failed")
+
+        if ret == 0:
+            self.start_monitor()
+        return ret
+
+    def _initialize(self):
+        """Run the full Init/configuration sequence once"""
+        self.module.SetSystemSel(2)
+        self.module.SetVerboseLevel(0)
+
+        ret = self.module.Init(self.init_file)
+        if ret != 0:
+            self.connected = False
+            self.last_error = f"Init returned {ret}"
+            return ret
+
+        self.module.ConfigFile(self.config_file)
+        self.module.SetTotalCh(self.total_channels, 0)
+        self.module.SetChSel(self.channel_selection, 0)
+        self.module.SetSaveMode(self.save_mode)
+        self.module.SetOutputPath(self.output_path)
+
+        self.connected = True
+        self.last_error = None
+        self.consecutive_failures = 0
+        return 0
+
+    def check_health(self):
+        """Cheap liveness probe; marks the session disconnected when it fails"""
+        with self.lock:
+            try:
+                healthy = self.module.GetTotalCh(0) == self.total_channels
+                if not healthy:
+                    self.last_error = "Channel count changed"
+            except Exception as e:
+                healthy = False
+                self.last_error = str(e)
+            self.last_health_check = time.time()
+            if not healthy:
+                self.connected = False
+            return healthy
+
+    def start_monitor(self):
+        """Start the background health monitor if it is not already running"""
+        if self.monitor_thread is not None and self.monitor_thread.is_alive():
+            return
+        self.stop_event.clear()
+        self.monitor_thread = threading.Thread(target=self._monitor, name="spectrometer-health", daemon=True)
+        self.monitor_thread.start()
+
+    def _monitor(self):
+        delay = self.health_interval
+        while not self.stop_event.wait(delay):
+            with self.lock:
+                if self.connected and self.check_health():
+                    delay = self.health_interval
+                    continue
+
+                # Unhealthy: try to bring the system back, backing off after each failure
+                self._set_state("connecting")
+                try:
+                    ret = self._initialize()
+                except Exception as e:
+                    self.last_error = str(e)
+                    ret = -1
+
+                if ret == 0:
+                    self._set_state("connected")
+                    delay = self.health_interval
+                else:
+                    self.consecutive_failures += 1
+                    self._set_state("failed")
+                    delay = min(self.health_interval * (2 ** self.consecutive_failures), self.max_backoff)
+
+    def close(self):
+        """Stop monitoring and release the hardware"""
+        self.stop_event.set()
+        if self.monitor_thread is not None:
+            self.monitor_thread.join()
+            self.monitor_thread = None
+        with self.lock:
+            if self.connected:
+                self.module.CloseSys()
+                self.connected = False
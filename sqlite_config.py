@@ -0,0 +1,22 @@
+#!/usr/bin/env python3
+"""Connection settings shared by every SQLite database of the application."""
+
+# Applied to every connection. WAL and synchronous=NORMAL trade a little durability on power
+# loss for writes that do not fsync on every commit
+PRAGMAS = [
+    # Only takes effect on a new file, so it must come before journal_mode
+    "PRAGMA auto_vacuum = INCREMENTAL",
+    "PRAGMA journal_mode = WAL",
+    "PRAGMA synchronous = NORMAL",
+    "PRAGMA foreign_keys = ON",
+    "PRAGMA busy_timeout = 5000",
+    "PRAGMA cache_size = -16000",  # 16 MB page cache
+    "PRAGMA temp_store = MEMORY",
+    "PRAGMA mmap_size = 268435456",
+]
+
+def configure_connection(conn):
+    """Apply the shared pragmas to an open connection"""
+    for pragma in PRAGMAS:
+        conn.execute(pragma)
+    return conn
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""Tests for the background workers and connection check of mriQt that need no hardware or files (run with pytest)."""
+
+import os
+import threading
+import time
+
+import pytest
+
+pytest.importorskip("numpy")
+pytest.importorskip("pydicom")
+pytest.importorskip("PyQt5")
+
+import mriQt
+from PyQt5.QtGui import QImage
+from PyQt5.QtWidgets import QApplication
+
+def wait_until(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+@pytest.fixture(scope="module")
+def qapp():
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    return QApplication.instance() or QApplication([])
+
+def process_events_until(app, condition, timeout=5.0):
+    """Like wait_until, but keeps delivering queued signals to GUI-thread objects"""
+    return wait_until(lambda: app.processEvents() or condition(), timeout)
+
+@pytest.fixture
+def decoded(monkeypatch):
+    """Record every frame the prefetcher decodes instead of reading DICOM files"""
+    calls = []
+    def decode(path):
+        calls.append(path)
+        return QImage(4, 4, QImage.Format_Grayscale8)
+    monkeypatch.setattr(mriQt, "dicom_to_qimage", decode)
+    return calls
+
+def test_prefetcher_goes_idle_when_window_wraps(decoded):
+    # 10 frames do not divide into windows of 4; the window 8, 9, 0, 1 crosses the end of the series
+    prefetcher = mriQt.FramePrefetcher([f"IM{i}" for i in range(10)], capacity=4)
+    prefetcher.set_playhead(8)
+    prefetcher.start()
+    try:
+        assert wait_until(lambda: prefetcher.buffered_count() == 4)
+        time.sleep(0.2)
+        assert decoded == ["IM8", "IM9", "IM0", "IM1"]
+        assert all(prefetcher.get_frame(index) is not None for index in (8, 9, 0, 1))
+
+        # Moving on by one decodes exactly the one frame that entered the window
+        prefetcher.set_playhead(9)
+        assert wait_until(lambda: prefetcher.buffered_count() == 4)
+        time.sleep(0.2)
+        assert decoded[4:] == ["IM2"]
+        assert prefetcher.get_frame(8) is None
+    finally:
+        prefetcher.stop()
+
+class FakeMaintenance:
+    """Stands in for MaintenanceService so the tests never open the real patient database"""
+    def start(self):
+        pass
+
+    def stop(self):
+        pass
+
+@pytest.fixture
+def front_page(qapp, monkeypatch):
+    """Build a FrontPage around a fake connection check; returns the page and the messages it shows"""
+    monkeypatch.setattr(mriQt, "MaintenanceService", FakeMaintenance)
+    pages, messages = [], []
+    def build(check, timeout=5.0):
+        page = mriQt.FrontPage(check_connection=check, connection_timeout=timeout)
+        page.show_auto_close_message = lambda title, text, duration=5000: messages.append((title, text))
+        pages.append(page)
+        return page, messages
+    yield build
+    for page in pages:
+        page.close()
+
+def raise_error():
+    raise RuntimeError("spectrometer not found")
+
+@pytest.mark.parametrize("check, states, finished, failed", [
+    (lambda: 0, ["connecting", "connected"], [0], []),
+    (lambda: 3, ["connecting", "failed"], [3], []),
+    (raise_error, ["connecting", "error"], [], ["spectrometer not found"]),
+])
+def test_connection_worker_reports_outcome(qapp, check, states, finished, failed):
+    worker = mriQt.ConnectionWorker(check)
+    seen = {"states": [], "finished": [], "failed": []}
+    worker.state_changed.connect(seen["states"].append)
+    worker.check_finished.connect(seen["finished"].append)
+    worker.check_failed.connect(seen["failed"].append)
+    worker.start()
+    assert worker.wait(5000)
+    assert process_events_until(qapp, lambda: len(seen["states"]) == 2)
+    assert seen == {"states": states, "finished": finished, "failed": failed}
+
+@pytest.mark.parametrize("check, title, text", [
+    (lambda: 0, "Connection", "Connection successful!\nReturn code: 0"),
+    (lambda: 3, "Connection", "Connection failed!\nReturn code: 3"),
+    (raise_error, "Connection Error", "Error during connection:\nspectrometer not found"),
+])
+def test_front_page_reports_connection_check(qapp, front_page, check, title, text):
+    page, messages = front_page(check)
+    page.open_connection()
+    assert process_events_until(qapp, lambda: messages)
+    assert messages == [(title, text)]
+    assert page.connection_worker is None
+
+def test_front_page_times_out_blocked_check(qapp, front_page):
+    release = threading.Event()
+    page, messages = front_page(lambda: 0 if release.wait(5) else 1, timeout=0.05)
+    page.open_connection()
+    try:
+        assert process_events_until(qapp, lambda: messages)
+        assert messages == [("Connection", "Connection timed out after 0 s")]
+        assert page.connection_worker is None
+        assert len(page.abandoned_connection_workers) == 1
+        assert page.connection_btn.toolTip() == "Connection (timeout)"
+    finally:
+        release.set()
+    # The abandoned check is kept alive until it returns, and its late result is not reported
+    assert process_events_until(qapp, lambda: not page.abandoned_connection_workers)
+    assert messages == [("Connection", "Connection timed out after 0 s")]
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""Tests for the batching writer and schema migrations of patient_db (run with pytest)."""
+
+import sqlite3
+import threading
+
+import pytest
+
+from patient_db import PatientDatabase, SCHEMA_MIGRATIONS, connect, create_patient_schema
+
+def add_patient(ic, name="Test Patient"):
+    """Transaction function inserting one patient"""
+    def insert(conn):
+        return conn.execute('INSERT INTO patients (name, ic, dob, sex) VALUES (?, ?, ?, ?)',
+                            (name, ic, "1980-01-01", "Other")).lastrowid
+    return insert
+
+def patient_ics(path):
+    conn = sqlite3.connect(path)
+    try:
+        return {row[0] for row in conn.execute('SELECT ic FROM patients')}
+    finally:
+        conn.close()
+
+@pytest.fixture
+def db(tmp_path):
+    database = PatientDatabase(tmp_path / "patients.db", batch_window=0.05)
+    yield database
+    database.close()
+
+def hold_writer(db):
+    """Keep the writer busy until the returned event is set, so later writes queue into one batch"""
+    started, release = threading.Event(), threading.Event()
+    def wait(conn):
+        started.set()
+        release.wait(5)
+    blocker = db.transaction(wait)
+    started.wait(5)
+    return blocker, release
+
+def test_failing_write_rolls_back_only_its_savepoint(db):
+    blocker, release = hold_writer(db)
+
+    def insert_then_fail(conn):
+        add_patient("FAIL-1")(conn)
+        raise ValueError("rejected")
+
+    before = db.transaction(add_patient("OK-1"))
+    failing = db.transaction(insert_then_fail)
+    duplicate = db.transaction(add_patient("OK-1"))  # violates the unique IC
+    after = db.transaction(add_patient("OK-2"))
+    release.set()
+    blocker.result(5)
+
+    assert before.result(5) > 0
+    assert after.result(5) > 0
+    with pytest.raises(ValueError):
+        failing.result(5)
+    with pytest.raises(sqlite3.IntegrityError):
+        duplicate.result(5)
+    assert patient_ics(db.path) == {"OK-1", "OK-2"}
+
+def test_flush_waits_for_earlier_writes(db):
+    blocker, release = hold_writer(db)
+    futures = [db.write('INSERT INTO patients (name, ic, dob, sex) VALUES (?, ?, ?, ?)',
+                        (f"Patient {i}", f"IC-{i}", "1980-01-01", "Other")) for i in range(20)]
+    release.set()
+    db.flush()
+
+    assert all(future.done() for future in futures)
+    # Row ids follow the order the writes were queued in
+    assert [future.result() for future in futures] == sorted(future.result() for future in futures)
+    assert db.read('SELECT COUNT(*) FROM patients')[0][0] == 20
+
+def test_close_commits_queued_writes(tmp_path):
+    db = PatientDatabase(tmp_path / "patients.db")
+    blocker, release = hold_writer(db)
+    futures = [db.transaction(add_patient(f"IC-{i}")) for i in range(10)]
+    release.set()
+    db.close()
+
+    assert all(future.done() and future.exception() is None for future in futures + [blocker])
+    assert patient_ics(db.path) == {f"IC-{i}" for i in range(10)}
+
+def test_migrations_upgrade_version_0_database(tmp_path):
+    path = tmp_path / "legacy.db"
+    # The original schema, before user_version was used
+    conn = sqlite3.connect(path)
+    conn.executescript('''
+        CREATE TABLE patients (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            ic TEXT UNIQUE NOT NULL,
+            dob TEXT NOT NULL,
+            sex TEXT NOT NULL,
+            height REAL,
+            weight REAL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        );
+        CREATE TABLE mri_scans (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            patient_id INTEGER NOT NULL,
+            scan_date TEXT NOT NULL,
+            folder_path TEXT NOT NULL,
+            notes TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (patient_id) REFERENCES patients (id)
+        );
+        INSERT INTO patients (name, ic, dob, sex) VALUES ('Legacy Patient', 'LEGACY-1', '1970-05-05', 'Female');
+        INSERT INTO mri_scans (patient_id, scan_date, folder_path) VALUES (1, '2024-01-01', '/scans/old');
+    ''')
+    conn.close()
+
+    conn = connect(path)
+    try:
+        assert conn.execute('PRAGMA user_version').fetchone()[0] == 0
+        create_patient_schema(conn)
+        assert conn.execute('PRAGMA user_version').fetchone()[0] == len(SCHEMA_MIGRATIONS)
+
+        tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        assert {"patients", "mri_scans", "scan_images", "store_objects", "maintenance_runs",
+                "annotations"} <= tables
+        columns = {row[1] for row in conn.execute('PRAGMA table_info(scan_images)')}
+        assert "source_path" in columns
+        # Existing rows survive the upgrade
+        assert conn.execute('SELECT name FROM patients').fetchall() == [("Legacy Patient",)]
+        assert conn.execute('SELECT folder_path FROM mri_scans').fetchall() == [("/scans/old",)]
+
+        # Running again is a no-op
+        create_patient_schema(conn)
+        assert conn.execute('PRAGMA user_version').fetchone()[0] == len(SCHEMA_MIGRATIONS)
+    finally:
+        conn.close()
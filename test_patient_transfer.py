@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""Round-trip tests for patient_transfer export and import (run with pytest)."""
+
+import csv
+
+import pytest
+
+from patient_db import PatientDatabase
+from patient_transfer import export_records, import_records, read_records
+
+@pytest.fixture
+def source(tmp_path):
+    """A database with one patient holding two scans and one without scans"""
+    db = PatientDatabase(tmp_path / "source.db")
+    first = db.write('INSERT INTO patients (name, ic, dob, sex, height, weight) VALUES (?, ?, ?, ?, ?, ?)',
+                     ("Alice Tan", "IC-1", "1980-01-01", "Female", 160.0, 55.0)).result()
+    db.write('INSERT INTO patients (name, ic, dob, sex) VALUES (?, ?, ?, ?)',
+             ("Bob Lim", "IC-2", "1975-06-30", "Male")).result()
+    db.write_many('INSERT INTO mri_scans (patient_id, scan_date, folder_path, notes) VALUES (?, ?, ?, ?)',
+                  [(first, "2024-01-01", "/scans/a1", "baseline"), (first, "2024-06-01", "/scans/a2", None)]).result()
+    yield db
+    db.close()
+
+def contents(db):
+    patients = db.read('SELECT ic, name, dob, sex, height, weight FROM patients ORDER BY ic')
+    scans = db.read('SELECT p.ic, s.scan_date, s.folder_path FROM mri_scans s '
+                    'JOIN patients p ON p.id = s.patient_id ORDER BY s.folder_path')
+    return patients, scans
+
+def import_rows(path):
+    """Exported records with None as empty strings, ready to write back as CSV"""
+    return [{key: "" if value is None else value for key, value in record.items()}
+            for record in read_records(path)]
+
+@pytest.fixture(params=["csv", "jsonl"])
+def exported(request, source, tmp_path):
+    path = tmp_path / f"export.{request.param}"
+    assert export_records(path, db_path=source.path)["rows"] == 3
+    return path
+
+@pytest.mark.parametrize("mode", ["skip", "update", "fail"])
+def test_export_imports_into_empty_database(mode, source, exported, tmp_path):
+    target = PatientDatabase(tmp_path / f"target-{mode}.db")
+    try:
+        stats = import_records(exported, db=target, on_conflict=mode, batch_size=2)
+        assert stats["records"] == 3 and stats["rejected"] == 0
+        assert stats["patients_written"] == 2 and stats["scans_written"] == 2
+        assert contents(target) == contents(source)
+    finally:
+        target.close()
+
+def test_reimport_with_skip_changes_nothing(source, exported):
+    before = contents(source)
+    stats = import_records(exported, db=source, on_conflict="skip")
+    assert stats["patients_written"] == 0 and stats["scans_written"] == 0
+    assert contents(source) == before
+
+def test_reimport_with_update_overwrites_details(source, exported, tmp_path):
+    edited = tmp_path / "edited.csv"
+    rows = [dict(row) for row in import_rows(exported)]
+    for row in rows:
+        if row["ic"] == "IC-1":
+            row["name"] = "Alice Tan-Lee"
+    with open(edited, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=list(rows[0]))
+        writer.writeheader()
+        writer.writerows(rows)
+
+    import_records(edited, db=source, on_conflict="update")
+    patients, scans = contents(source)
+    assert [name for ic, name, *_ in patients] == ["Alice Tan-Lee", "Bob Lim"]
+    # Scans are neither lost nor duplicated
+    assert len(scans) == 2
+
+def test_reimport_with_fail_writes_nothing(source, exported, tmp_path):
+    # A new patient ahead of the conflicting ones must not be written either
+    mixed = tmp_path / "mixed.csv"
+    rows = [dict(row) for row in import_rows(exported)]
+    new = dict(rows[0], ic="IC-3", name="Chen Wei", scan_date="", folder_path="", notes="")
+    with open(mixed, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=list(rows[0]))
+        writer.writeheader()
+        writer.writerows([new] + rows)
+
+    before = contents(source)
+    with pytest.raises(ValueError):
+        import_records(mixed, db=source, on_conflict="fail", batch_size=1)
+    assert contents(source) == before
@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+"""Downsampled slice previews and their on-disk cache."""
+import os
+import sqlite3
+import numpy as np
+
+THUMBNAIL_SIZE = 96
+CACHE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "thumbnail_cache.db")
+
+def block_mean_downsample(pixel_array, max_size=THUMBNAIL_SIZE):
+    """
+    Downsample a 2D image by averaging non-overlapping blocks.
+
+    Blocks are square unless one side is shorter than the block size; that
+    side then becomes a single block, so the result is never empty.
+
+    Args:
+        pixel_array (np.ndarray): 2D image of any numeric dtype
+        max_size (int): Largest allowed side of the result in pixels
+
+    Returns:
+        np.ndarray: float32 image whose longest side is at most max_size
+    """
+    height, width = pixel_array.shape
+    factor = max(1, -(-max(height, width) // max_size))  # ceil division
+    if factor == 1:
+        return pixel_array.astype(np.float32)
+
+    # A side shorter than the factor would give no whole block; average all of it into one
+    factor_h, factor_w = min(factor, height), min(factor, width)
+
+    # Crop to a whole number of blocks, then average each block in one reshape
+    out_h, out_w = height // factor_h, width // factor_w
+    cropped = pixel_array[:out_h * factor_h, :out_w * factor_w].astype(np.float32)
+    return cropped.reshape(out_h, factor_h, out_w, factor_w).mean(axis=(1, 3))
+
+def make_thumbnail(pixel_array, max_size=THUMBNAIL_SIZE):
+    """Downsample and scale a full-resolution slice to a uint8 thumbnail"""
+    small = block_mean_downsample(pixel_array, max_size)
+    small_min = small.min()
+    small_range = small.max() - small_min
+    if small_range == 0:
+        return np.zeros(small.shape, dtype=np.uint8)
+    return ((small - small_min) / small_range * 255).astype(np.uint8)
+
+class ThumbnailCache:
+    """SQLite-backed thumbnail store keyed by file path and modification time"""
+    def __init__(self, path=CACHE_PATH):
+        # One connection per instance; create the cache on the thread that uses it
+        self.conn = sqlite3.connect(path)
+        self.conn.execute('''
+            CREATE TABLE IF NOT EXISTS thumbnails (
+                path TEXT PRIMARY KEY,
+                mtime REAL NOT NULL,
+                height INTEGER NOT NULL,
+                width INTEGER NOT NULL,
+                pixels BLOB NOT NULL
+            )
+        ''')
+        self.conn.commit()
+
+    def get_many(self, paths):
+        """
+        Look up cached thumbnails that are still current.
+
+        Args:
+            paths (list): Image file paths
+
+        Returns:
+            dict: path -> uint8 thumbnail for entries whose mtime still matches
+        """
+        mtimes = {}
+        for path in paths:
+            try:
+                mtimes[path] = os.path.getmtime(path)
+            except OSError:
+                continue
+
+        found = {}
+        paths = list(mtimes)
+        # Stay below SQLite's bound-parameter limit
+        for start in range(0, len(paths), 500):
+            chunk = paths[start:start + 500]
+            placeholders = ",".join("?" * len(chunk))
+            rows = self.conn.execute(
+                f"SELECT path, mtime, height, width, pixels FROM thumbnails WHERE path IN ({placeholders})",
+                chunk
+            )
+            for path, mtime, height, width, pixels in rows:
+                if mtime == mtimes[path]:
+                    found[path] = np.frombuffer(pixels, dtype=np.uint8).reshape(height, width)
+        return found
+
+    def put_many(self, entries):
+        """Store (path, mtime, thumbnail) entries in a single transaction"""
+        with self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO thumbnails (path, mtime, height, width, pixels) VALUES (?, ?, ?, ?, ?)",
+                [(path, mtime, thumb.shape[0], thumb.shape[1], np.ascontiguousarray(thumb).tobytes())
+                 for path, mtime, thumb in entries]
+            )
+
+    def close(self):
+        self.conn.close()